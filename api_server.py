@@ -1,7 +1,7 @@
 import os
 import uuid
 import json
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.responses import FileResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
@@ -10,6 +10,10 @@ import dotenv
 
 # Import the existing flow and modules
 from flow import create_tutorial_flow
+from utils.telemetry import start_run
+from utils.checkpoint import RunCheckpoint, is_valid_run_id, new_run_id, run_directory
+from utils.profiler import FlowProfiler
+from utils.token_budget import TokenBudget, TokenBudgetExceeded
 
 dotenv.load_dotenv()
 
@@ -43,21 +47,54 @@ DEFAULT_EXCLUDE_PATTERNS = {
 }
 
 # Pydantic models for request/response
+# Same values as the choices of the matching command line options in main.py
+MinifyMode = Literal["none", "whitespace", "comments", "all"]
+
 class TutorialRequest(BaseModel):
     repo_url: Optional[str] = Field(None, description="URL of the public GitHub or GitLab repository")
     local_dir: Optional[str] = Field(None, description="Path to local directory")
     project_name: Optional[str] = Field(None, description="Project name")
     github_token: Optional[str] = Field(None, description="GitHub personal access token")
     gitlab_token: Optional[str] = Field(None, description="GitLab personal access token")
-    repo_type: Optional[str] = Field(None, description="Explicit repository type (github or gitlab). If not provided, will auto-detect from URL.")
+    repo_type: Optional[Literal["github", "gitlab"]] = Field(None, description="Explicit repository type (github or gitlab). If not provided, will auto-detect from URL.")
     ref: Optional[str] = Field(None, description="Specific branch, tag, or commit reference for GitLab repositories")
     output_dir: str = Field("output", description="Base directory for output")
     include_patterns: Optional[List[str]] = Field(None, description="Include file patterns")
     exclude_patterns: Optional[List[str]] = Field(None, description="Exclude file patterns")
     max_file_size: int = Field(100000, description="Maximum file size in bytes")
     language: str = Field("english", description="Language for the generated tutorial")
+    languages: Optional[List[str]] = Field(None, description="Generate the tutorial once in the first language and translate it into the others, each written to its own subdirectory. Overrides language.")
     use_cache: bool = Field(True, description="Enable LLM response caching")
+    use_memo: bool = Field(True, description="Reuse the planning results (abstractions, relationships, chapter order) of earlier runs with the same inputs")
     max_abstractions: int = Field(10, description="Maximum number of abstractions to identify")
+    chapter_max_tokens: Optional[int] = Field(None, description="Maximum number of tokens generated per chapter")
+    token_budget: Optional[int] = Field(None, description="Maximum number of prompt and completion tokens for the job; the context, number of abstractions and chapter length are scaled down to fit, and chapters are skipped once it is spent")
+    parallel_chapters: bool = Field(False, description="Write chapters concurrently, using the chapter plan instead of earlier chapter text as context")
+    llm_workers: int = Field(4, description="Maximum number of concurrent LLM calls in parallel modes")
+    chapter_context: Literal["digest", "full"] = Field("digest", description="Context from previous chapters: rolling digests (digest) or full chapter text (full)")
+    previous_context_tokens: int = Field(1500, description="Token budget for the rolling digest of previous chapters")
+    chapter_context_tokens: int = Field(16000, description="Token budget for the source files of each chapter; the largest files are shortened to fit, 0 keeps every file whole")
+    large_file_mode: Literal["excerpt", "relevant"] = Field("excerpt", description="How oversized files are shortened: symbol outline with the first and last lines (excerpt) or outline with the parts most relevant to the chapter (relevant)")
+    retrieval: Literal["files", "embedding", "bm25"] = Field("files", description="Source code given to each chapter and to relationship analysis: the files of each abstraction (files) or the code chunks that best match the abstraction, retrieved from the whole codebase with OLLAMA_EMBED_MODEL (embedding) or with a keyword index that needs no model (bm25)")
+    retrieval_top_k: int = Field(12, description="Maximum number of retrieved chunks per chapter, within chapter_context_tokens")
+    shard_tokens: Optional[int] = Field(None, description="Identify abstractions per shard of about this many tokens when the codebase is larger, then merge the results")
+    summarize_files: bool = Field(False, description="Summarize large files (cached by content hash and model) and use the summaries in planning prompts")
+    summary_min_tokens: int = Field(300, description="Only summarize files of at least this many tokens")
+    planning_context: Literal["full", "skeleton"] = Field("full", description="File content used by the planning prompts: full text (full) or code skeletons with imports, signatures and docstrings (skeleton)")
+    max_context_tokens: Optional[int] = Field(None, description="Token budget for file content in planning prompts; files are included in importance order and the rest are listed by path only")
+    max_symbol_files: int = Field(3, description="Add up to this many files per abstraction that define the classes and functions it names or its files use, from a symbol index of the repository; 0 disables")
+    planner: Literal["staged", "fused"] = Field("staged", description="How the tutorial is planned: abstractions, relationships and chapter order in three LLM calls (staged) or in a single call that sends the file context once (fused)")
+    chapter_generation: Literal["single", "sections"] = Field("single", description="How each chapter is written: in one LLM call (single) or as a short outline whose sections are written concurrently and assembled (sections)")
+    keep_low_value: bool = Field(False, description="Keep lockfiles, generated and minified code, high-entropy blobs, notebook outputs and large data files, which are skipped or shortened while crawling by default")
+    minify_planning: MinifyMode = Field("none", description="Minify source files in the planning prompts: none, whitespace (license headers, banners, blank lines), comments (also comments) or all (also docstrings)")
+    minify_chapters: MinifyMode = Field("none", description="Minify source files in the chapter prompts, with the same modes as minify_planning")
+    relationships_mode: Literal["llm", "hints", "static"] = Field("llm", description="How relationships are found: inferred by the LLM (llm), LLM with static import dependencies as hints (hints), or static dependencies labeled by the LLM (static)")
+    order_strategy: Literal["llm", "graph", "hybrid"] = Field("llm", description="How chapters are ordered: by the LLM (llm), by a topological sort of the relationships (graph), or by the sort with the LLM only breaking ties (hybrid)")
+    incremental: bool = Field(False, description="Reuse the plan and unchanged chapters of the previous tutorial in the output directory, rewriting only chapters whose source files changed")
+    patch_chapters: bool = Field(False, description="With incremental, update slightly changed chapters from a unified diff of their source files instead of rewriting them")
+    patch_max_diff_tokens: int = Field(2000, description="Rewrite a chapter from scratch when the diff of its files exceeds this many tokens")
+    profile: bool = Field(False, description="Profile every step (wall, CPU and LLM time, size of the shared store) and write a Chrome trace and a text summary to the output directory")
+    resume_run_id: Optional[str] = Field(None, description="Resume an interrupted run from its checkpoint in <output_dir>/.runs/<run_id>, skipping the completed steps and chapters")
 
 class TutorialResponse(BaseModel):
     job_id: str
@@ -109,9 +146,37 @@ def run_tutorial_generation(job_id: str, request: TutorialRequest):
             "include_patterns": set(request.include_patterns) if request.include_patterns else DEFAULT_INCLUDE_PATTERNS,
             "exclude_patterns": set(request.exclude_patterns) if request.exclude_patterns else DEFAULT_EXCLUDE_PATTERNS,
             "max_file_size": request.max_file_size,
-            "language": request.language,
+            "language": request.languages[0] if request.languages else request.language,
+            "languages": request.languages or [],
             "use_cache": request.use_cache,
+            "use_memo": request.use_memo,
             "max_abstraction_num": request.max_abstractions,
+            "chapter_max_tokens": request.chapter_max_tokens,
+            "token_budget": request.token_budget,
+            "parallel_chapters": request.parallel_chapters,
+            "llm_workers": request.llm_workers,
+            "chapter_context": request.chapter_context,
+            "previous_context_tokens": request.previous_context_tokens,
+            "chapter_context_tokens": request.chapter_context_tokens,
+            "large_file_mode": request.large_file_mode,
+            "retrieval": request.retrieval,
+            "retrieval_top_k": request.retrieval_top_k,
+            "shard_tokens": request.shard_tokens,
+            "summarize_files": request.summarize_files,
+            "summary_min_tokens": request.summary_min_tokens,
+            "planning_context": request.planning_context,
+            "max_context_tokens": request.max_context_tokens,
+            "max_symbol_files": request.max_symbol_files,
+            "planner": request.planner,
+            "chapter_generation": request.chapter_generation,
+            "filter_low_value": not request.keep_low_value,
+            "minify_planning": request.minify_planning,
+            "minify_chapters": request.minify_chapters,
+            "relationships_mode": request.relationships_mode,
+            "order_strategy": request.order_strategy,
+            "incremental": request.incremental,
+            "patch_chapters": request.patch_chapters,
+            "patch_max_diff_tokens": request.patch_max_diff_tokens,
             "files": [],
             "abstractions": [],
             "relationships": {},
@@ -120,16 +185,60 @@ def run_tutorial_generation(job_id: str, request: TutorialRequest):
             "final_output_dir": None
         }
 
-        # Create and run the flow
+        # Checkpoint the run after each step so a failed job can be resumed
+        if request.resume_run_id:
+            checkpoint = RunCheckpoint(run_directory(request.output_dir, request.resume_run_id))
+            shared.update(checkpoint.load())
+        else:
+            checkpoint = RunCheckpoint(run_directory(request.output_dir, new_run_id()))
+        shared["_checkpoint"] = checkpoint
+        jobs[job_id]["run_id"] = checkpoint.run_id
+
+        profiler = FlowProfiler() if request.profile else None
+        if profiler:
+            shared["_profiler"] = profiler
+
+        # Create and run the flow, collecting LLM telemetry for this job
         tutorial_flow = create_tutorial_flow()
-        result = tutorial_flow.run(shared)
+        telemetry = start_run()
+        if shared.get("token_budget"):
+            # A resumed job keeps counting from the spend saved with its checkpoint
+            shared["_token_budget"] = TokenBudget(
+                shared["token_budget"], telemetry, (shared.get("token_usage") or {}).get("spent", 0)
+            )
+        stopped = None
+        try:
+            result = tutorial_flow.run(shared)
+        except TokenBudgetExceeded as e:
+            # Planning has no partial result: the job stops, with its spend reported as usual
+            stopped = str(e)
+        finally:
+            if profiler:
+                profiler.write(shared.get("final_output_dir") or request.output_dir)
+
+        if not stopped:
+            # The checkpoint holds a copy of the codebase and is only needed to resume
+            checkpoint.discard()
 
         # Store the result
-        jobs[job_id]["status"] = "completed"
+        jobs[job_id]["status"] = "stopped" if stopped else "completed"
+        jobs[job_id]["error"] = stopped
         jobs[job_id]["result"] = {
+            "stopped_on_budget": stopped is not None,
             "output_dir": shared.get("final_output_dir"),
+            "run_id": checkpoint.run_id,
             "files_generated": len(shared.get("chapters", [])),
-            "abstractions_identified": len(shared.get("abstractions", []))
+            "abstractions_identified": len(shared.get("abstractions", [])),
+            "chapter_prompt_tokens": shared.get("chapter_prompt_tokens"),
+            "skeleton_savings": shared.get("skeleton_savings"),
+            "llm_usage": telemetry.summary(),
+            "chapter_cache": shared.get("chapter_cache_stats"),
+            "token_usage": (
+                {**shared["_token_budget"].usage(), "skipped_chapters": shared.get("skipped_chapters", [])}
+                if shared.get("_token_budget")
+                else None
+            ),
+            "profile": profiler.summary() if profiler else None
         }
         
     except Exception as e:
@@ -142,6 +251,8 @@ async def generate_tutorial(request: TutorialRequest, background_tasks: Backgrou
     # Validate that either repo_url or local_dir is provided
     if not request.repo_url and not request.local_dir:
         raise HTTPException(status_code=400, detail="Either repo_url or local_dir must be provided")
+    if request.resume_run_id and not is_valid_run_id(request.resume_run_id):
+        raise HTTPException(status_code=400, detail="Invalid resume_run_id")
     
     # Generate a unique job ID
     job_id = str(uuid.uuid4())
@@ -176,7 +287,9 @@ async def get_job_status(job_id: str):
         status=job["status"],
         progress={
             "step": "generating" if job["status"] == "running" else job["status"],
-            "details": "Processing tutorial generation" if job["status"] == "running" else job["status"]
+            "details": "Processing tutorial generation" if job["status"] == "running" else job["status"],
+            # Pass as resume_run_id to continue a failed job
+            "run_id": job.get("run_id")
         },
         result=job.get("result"),
         error=job.get("error")
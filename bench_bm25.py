@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+BM25检索基准测试：测量建立索引和查询的耗时
+
+默认生成20000个合成源文件；使用 --dir 可以对真实代码库进行测试。
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import time
+
+from utils.bm25 import BM25Index
+
+SOURCE_EXTENSIONS = (".py", ".js", ".ts", ".go", ".java", ".c", ".cc", ".cpp", ".h", ".rs", ".rb", ".md")
+
+
+def synthetic_files(num_files, seed=0, num_identifiers=50000):
+    """
+    Generate Python-like files. Identifiers come from a shared pool and are picked
+    with a Zipf-like skew, as in real code where a few names are everywhere.
+    """
+    rng = random.Random(seed)
+    syllables = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "zu", "pe", "si", "do", "fa"]
+    words = sorted({"".join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(6000)})
+    pool = [rng.sample(words, rng.randint(1, 3)) for _ in range(num_identifiers)]
+    cumulative_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(num_identifiers)))
+
+    def identifier(style):
+        parts = rng.choices(pool, cum_weights=cumulative_weights)[0]
+        if style == "camel":
+            return parts[0] + "".join(part.capitalize() for part in parts[1:])
+        return "_".join(parts)
+
+    files = []
+    for i in range(num_files):
+        lines = [f'"""Module {i}: {" ".join(rng.sample(words, 8))}."""', "import os", ""]
+        for _ in range(rng.randint(3, 8)):
+            lines.append(f"class {identifier('camel').capitalize()}:")
+            for _ in range(rng.randint(2, 5)):
+                args = ", ".join(identifier("snake") for _ in range(rng.randint(0, 3)))
+                lines.append(f"    def {identifier('snake')}(self{', ' + args if args else ''}):")
+                for _ in range(rng.randint(2, 6)):
+                    lines.append(f"        {identifier('snake')} = {identifier('camel')}({identifier('snake')})")
+                lines.append(f"        return {identifier('snake')}")
+                lines.append("")
+            lines.append("")
+        files.append((f"pkg{i % 50}/module_{i}.py", "\n".join(lines)))
+    return files, words
+
+
+def directory_files(root):
+    files = []
+    for directory, _, names in os.walk(root):
+        if "/." in directory or "node_modules" in directory:
+            continue
+        for name in names:
+            if name.endswith(SOURCE_EXTENSIONS):
+                path = os.path.join(directory, name)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        files.append((os.path.relpath(path, root), f.read()))
+                except (OSError, UnicodeDecodeError):
+                    continue
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark building and querying the BM25 code index.")
+    parser.add_argument("--files", type=int, default=20000, help="Number of synthetic files (default: 20000)")
+    parser.add_argument("--dir", help="Benchmark the source files of a directory instead")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries (default: 200)")
+    parser.add_argument("--top-k", type=int, default=12, help="Chunks returned per query (default: 12)")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    if args.dir:
+        files = directory_files(args.dir)
+        words = sorted({w for _, content in files[:200] for w in content.split() if w.isidentifier()})
+    else:
+        files, words = synthetic_files(args.files)
+    total_mb = sum(len(content) for _, content in files) / 1e6
+    print(f"Corpus: {len(files)} files, {total_mb:.1f} MB")
+
+    start = time.perf_counter()
+    index = BM25Index.build(files)
+    build_seconds = time.perf_counter() - start
+    print(
+        f"Build: {build_seconds:.2f}s for {len(index.chunks)} chunks, "
+        f"{len(index.vocabulary)} terms, {len(index.postings)} postings"
+    )
+
+    queries = [" ".join(rng.sample(words, min(6, len(words)))) for _ in range(args.queries)]
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search([query], args.top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(
+        f"Query: median {statistics.median(latencies):.2f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms, max {latencies[-1]:.2f} ms "
+        f"({args.queries} queries, top {args.top_k})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,104 @@
+import copy
 from pocketflow import Flow
 # Import all node classes from nodes.py
 from nodes import (
     FetchRepo,
+    RankFiles,
+    PlanTokenBudget,
+    ReusePreviousPlan,
+    SummarizeFiles,
+    ExtractSkeletons,
     IdentifyAbstractions,
     AnalyzeRelationships,
     OrderChapters,
+    FusedPlanner,
     WriteChapters,
-    CombineTutorial
+    CombineTutorial,
+    TranslateTutorial
 )
 
+class CheckpointFlow(Flow):
+    """
+    Flow that saves the shared store after every node when shared["_checkpoint"]
+    holds a RunCheckpoint, and skips the nodes a resumed checkpoint already completed.
+    When shared["_profiler"] holds a FlowProfiler, every node is also profiled.
+    When shared["_token_budget"] holds a TokenBudget, its spend is saved with each
+    checkpoint as shared["token_usage"], so a resumed run keeps counting from there.
+    """
+
+    def _orch(self, shared, params=None):
+        checkpoint = shared.get("_checkpoint")
+        profiler = shared.get("_profiler")
+        if checkpoint is None and profiler is None:
+            return super()._orch(shared, params)
+
+        curr, p, last_action = copy.copy(self.start_node), (params or {**self.params}), None
+        if checkpoint is not None:
+            # Replay the completed nodes, following the actions they returned
+            replayed = 0
+            for step in checkpoint.completed:
+                if curr is None or type(curr).__name__ != step["node"]:
+                    break
+                print(f"Resuming: skipping completed step {step['node']}")
+                last_action = step["action"]
+                curr = copy.copy(self.get_next_node(curr, last_action))
+                replayed += 1
+            checkpoint.completed = checkpoint.completed[:replayed]
+
+        while curr:
+            if profiler is not None:
+                profiler.instrument(curr)
+            curr.set_params(p)
+            last_action = curr._run(shared)
+            if shared.get("_token_budget") is not None:
+                shared["token_usage"] = shared["_token_budget"].usage()
+            if checkpoint is not None:
+                checkpoint.mark_completed(type(curr).__name__, last_action)
+                if profiler is not None:
+                    profiler.measure("Checkpoint", "save", lambda: checkpoint.save(shared))
+                else:
+                    checkpoint.save(shared)
+            curr = copy.copy(self.get_next_node(curr, last_action))
+        return last_action
+
+
 def create_tutorial_flow():
     """Creates and returns the codebase tutorial generation flow."""
 
     # Instantiate nodes
     fetch_repo = FetchRepo()
+    rank_files = RankFiles()
+    plan_token_budget = PlanTokenBudget()  # Skipped unless a token budget is set
+    reuse_previous_plan = ReusePreviousPlan()  # Incremental mode, skipped unless enabled
+    summarize_files = SummarizeFiles()  # Optional pre-pass, skipped unless enabled
+    extract_skeletons = ExtractSkeletons()  # Optional pre-pass, skipped unless enabled
+    fused_planner = FusedPlanner(max_retries=5, wait=20)  # Single-call planning, skipped unless enabled
     identify_abstractions = IdentifyAbstractions(max_retries=5, wait=20)
     analyze_relationships = AnalyzeRelationships(max_retries=5, wait=20)
     order_chapters = OrderChapters(max_retries=5, wait=20)
     write_chapters = WriteChapters(max_retries=5, wait=20) # This is a BatchNode
     combine_tutorial = CombineTutorial()
+    translate_tutorial = TranslateTutorial(max_retries=5, wait=20)  # Skipped unless several languages
 
     # Connect nodes in sequence based on the design
-    fetch_repo >> identify_abstractions
+    fetch_repo >> rank_files
+    rank_files >> plan_token_budget
+    plan_token_budget >> reuse_previous_plan
+    reuse_previous_plan >> summarize_files
+    # Incremental runs with a reusable plan go straight to writing the changed chapters
+    reuse_previous_plan - "reuse" >> write_chapters
+    summarize_files >> extract_skeletons
+    extract_skeletons >> fused_planner
+    fused_planner >> identify_abstractions
+    # The fused planner produces the abstractions, relationships and order in one call
+    fused_planner - "fused" >> write_chapters
     identify_abstractions >> analyze_relationships
     analyze_relationships >> order_chapters
     order_chapters >> write_chapters
     write_chapters >> combine_tutorial
+    combine_tutorial >> translate_tutorial
 
     # Create the flow starting with FetchRepo
-    tutorial_flow = Flow(start=fetch_repo)
+    tutorial_flow = CheckpointFlow(start=fetch_repo)
 
     return tutorial_flow
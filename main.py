@@ -3,6 +3,10 @@ import os
 import argparse
 # Import the function that creates the flow
 from flow import create_tutorial_flow
+from utils.telemetry import start_run
+from utils.checkpoint import RunCheckpoint, new_run_id, run_directory
+from utils.profiler import FlowProfiler
+from utils.token_budget import TokenBudget, TokenBudgetExceeded
 
 dotenv.load_dotenv()
 
@@ -53,14 +57,64 @@ def main():
     parser.add_argument("-s", "--max-size", type=int, default=100000, help="Maximum file size in bytes (default: 100000, about 100KB).")
     # Add language parameter for multi-language support
     parser.add_argument("--language", default="english", help="Language for the generated tutorial (default: english)")
+    parser.add_argument("--languages", nargs="+", help="Generate the tutorial once in the first language and translate it into the others (e.g. 'english' 'chinese'). Each language is written to its own subdirectory. Overrides --language.")
     # Add use_cache parameter to control LLM caching
     parser.add_argument("--no-cache", action="store_true", help="Disable LLM response caching (default: caching enabled)")
+    parser.add_argument("--no-memo", action="store_true", help="Recompute the planning stages instead of reusing results memoized by earlier runs with the same inputs")
     # Add max_abstraction_num parameter to control the number of abstractions
     parser.add_argument("--max-abstractions", type=int, default=10, help="Maximum number of abstractions to identify (default: 10)")
     # Add repository type parameter to explicitly specify GitHub or GitLab
     parser.add_argument("--repo-type", choices=["github", "gitlab"], help="Explicitly specify repository type (github or gitlab). If not provided, will auto-detect from URL.")
     # Add ref parameter for GitLab repositories
     parser.add_argument("--ref", help="Specific branch, tag, or commit reference for GitLab repositories")
+    # Add chapter_max_tokens parameter to cap the length of each generated chapter
+    parser.add_argument("--chapter-max-tokens", type=int, help="Maximum number of tokens generated per chapter (default: 8192)")
+    # Add token_budget parameter to cap the tokens one run may spend
+    parser.add_argument("--token-budget", type=int, help="Maximum number of prompt and completion tokens for the run; the context, number of abstractions and chapter length are scaled down to fit, and chapters are skipped once it is spent (default: no limit)")
+    # Add parallel chapter generation parameters
+    parser.add_argument("--parallel-chapters", action="store_true", help="Write chapters concurrently, using the chapter plan instead of earlier chapter text as context")
+    parser.add_argument("--llm-workers", type=int, default=4, help="Maximum number of concurrent LLM calls in parallel modes (default: 4)")
+    # Add previous-chapter context parameters
+    parser.add_argument("--chapter-context", choices=["digest", "full"], default="digest", help="Context from previous chapters: rolling digests (default) or full chapter text")
+    parser.add_argument("--previous-context-tokens", type=int, default=1500, help="Token budget for the rolling digest of previous chapters (default: 1500)")
+    parser.add_argument("--chapter-context-tokens", type=int, default=16000, help="Token budget for the source files of each chapter; the largest files are shortened to fit, 0 keeps every file whole (default: 16000)")
+    parser.add_argument("--large-file-mode", choices=["excerpt", "relevant"], default="excerpt", help="How oversized files are shortened: symbol outline with the first and last lines (excerpt) or outline with the parts most relevant to the chapter (relevant) (default: excerpt)")
+    parser.add_argument("--retrieval", choices=["files", "embedding", "bm25"], default="files", help="Source code given to each chapter and to relationship analysis: the files of each abstraction (files) or the code chunks that best match the abstraction, retrieved from the whole codebase with OLLAMA_EMBED_MODEL (embedding) or with a keyword index that needs no model (bm25) (default: files)")
+    parser.add_argument("--retrieval-top-k", type=int, default=12, help="Maximum number of retrieved chunks per chapter, within --chapter-context-tokens (default: 12)")
+    # Add shard_tokens parameter for map-reduce abstraction identification on large repositories
+    parser.add_argument("--shard-tokens", type=int, help="Identify abstractions per shard of about this many tokens when the codebase is larger, then merge the results (default: disabled)")
+    # Add file summarization pre-pass parameters
+    parser.add_argument("--summarize-files", action="store_true", help="Summarize large files (cached by content hash and model) and use the summaries in planning prompts")
+    parser.add_argument("--summary-min-tokens", type=int, default=300, help="Only summarize files of at least this many tokens (default: 300)")
+    # Add planning_context parameter to send code skeletons instead of full files to planning prompts
+    parser.add_argument("--planning-context", choices=["full", "skeleton"], default="full", help="File content used by IdentifyAbstractions and AnalyzeRelationships: full text (default) or code skeletons (imports, signatures, docstrings)")
+    # Add max_context_tokens parameter to cap the file content sent to planning prompts
+    parser.add_argument("--max-context-tokens", type=int, help="Token budget for file content in planning prompts; files are included in importance order and the rest are listed by path only (default: no limit)")
+    # Add max_symbol_files parameter to complete the abstractions' files from the symbol index
+    parser.add_argument("--max-symbol-files", type=int, default=3, help="Add up to this many files per abstraction that define the classes and functions it names or its files use, from a symbol index of the repository; 0 disables (default: 3)")
+    # Add planner parameter to plan the tutorial in one LLM call
+    parser.add_argument("--planner", choices=["staged", "fused"], default="staged", help="How the tutorial is planned: abstractions, relationships and chapter order in three LLM calls (staged, default) or in a single call that sends the file context once (fused)")
+    # Add chapter generation parameter to write chapters as concurrent sections
+    parser.add_argument("--chapter-generation", choices=["single", "sections"], default="single", help="How each chapter is written: in one LLM call (single, default) or as a short outline whose sections are written concurrently and assembled (sections)")
+    # Add keep-low-value parameter to disable the low-value file filter
+    parser.add_argument("--keep-low-value", action="store_true", help="Keep lockfiles, generated and minified code, high-entropy blobs, notebook outputs and large data files, which are skipped or shortened while crawling by default")
+    # Add minify parameters to shrink source files in the planning and chapter prompts
+    minify_modes = ["none", "whitespace", "comments", "all"]
+    parser.add_argument("--minify-planning", choices=minify_modes, default="none", help="Minify source files in the planning prompts: drop license headers, banners and blank lines (whitespace), also comments (comments), also docstrings (all). Default: none")
+    parser.add_argument("--minify-chapters", choices=minify_modes, default="none", help="Minify source files in the chapter prompts, with the same modes as --minify-planning; comments keeps the docstrings. Default: none")
+    # Add relationships_mode parameter to use static import dependencies between abstractions
+    parser.add_argument("--relationships-mode", choices=["llm", "hints", "static"], default="llm", help="How AnalyzeRelationships finds relationships: inferred by the LLM (default), LLM with static import dependencies as hints, or static dependencies labeled by the LLM")
+    # Add order_strategy parameter to order chapters from the relationship graph
+    parser.add_argument("--order-strategy", choices=["llm", "graph", "hybrid"], default="llm", help="How OrderChapters orders chapters: by the LLM (default), by a topological sort of the relationships, or by the sort with the LLM only breaking ties")
+    # Add incremental parameter to only rewrite the chapters whose source files changed
+    parser.add_argument("--incremental", action="store_true", help="Reuse the plan and unchanged chapters of the previous tutorial in the output directory, rewriting only chapters whose source files changed")
+    # Add chapter patch mode parameters for incremental runs
+    parser.add_argument("--patch-chapters", action="store_true", help="With --incremental, update slightly changed chapters from a unified diff of their source files instead of rewriting them. Keeps a snapshot of the sources in the cache directory (CACHE_DIR), so it must also be on for the run that is diffed against")
+    parser.add_argument("--patch-max-diff-tokens", type=int, default=2000, help="Rewrite a chapter from scratch when the diff of its files exceeds this many tokens (default: 2000)")
+    # Add profile parameter to time every step of the flow
+    parser.add_argument("--profile", action="store_true", help="Profile every step (wall, CPU and LLM time, size of the shared store) and write a Chrome trace and a text summary to the output directory")
+    # Add resume parameter to continue an interrupted run from its checkpoint
+    parser.add_argument("--resume", metavar="RUN_ID", help="Resume an interrupted run from its checkpoint in <output>/.runs/RUN_ID, skipping the completed steps and chapters. Checkpoints hold a copy of the crawled files and are deleted when a run succeeds")
     # Add debug parameter for troubleshooting
     parser.add_argument("--debug", action="store_true", help="Enable debug mode for detailed logging, useful for troubleshooting API errors")
 
@@ -106,14 +160,75 @@ def main():
         "max_file_size": args.max_size,
 
         # Add language for multi-language support
-        "language": args.language,
+        "language": args.languages[0] if args.languages else args.language,
+        # Other languages the finished tutorial is translated into
+        "languages": args.languages or [],
         
         # Add use_cache flag (inverse of no-cache flag)
         "use_cache": not args.no_cache,
+        # Reuse planning results of earlier runs with the same inputs
+        "use_memo": not args.no_memo,
         
         # Add max_abstraction_num parameter
         "max_abstraction_num": args.max_abstractions,
         
+        # Add per-chapter length budget (None uses the WriteChapters default)
+        "chapter_max_tokens": args.chapter_max_tokens,
+
+        # Add the token budget of the run (None for no limit)
+        "token_budget": args.token_budget,
+
+        # Add parallel chapter generation settings
+        "parallel_chapters": args.parallel_chapters,
+        "llm_workers": args.llm_workers,
+
+        # Add previous-chapter context settings
+        "chapter_context": args.chapter_context,
+        "previous_context_tokens": args.previous_context_tokens,
+        "chapter_context_tokens": args.chapter_context_tokens,
+        "large_file_mode": args.large_file_mode,
+        "retrieval": args.retrieval,
+        "retrieval_top_k": args.retrieval_top_k,
+
+        # Add shard token budget for map-reduce IdentifyAbstractions (None disables sharding)
+        "shard_tokens": args.shard_tokens,
+
+        # Add file summarization pre-pass settings
+        "summarize_files": args.summarize_files,
+        "summary_min_tokens": args.summary_min_tokens,
+
+        # Add planning context mode ("full" or "skeleton")
+        "planning_context": args.planning_context,
+
+        # Add planning context budget (None for no limit)
+        "max_context_tokens": args.max_context_tokens,
+
+        # Add the number of defining files added per abstraction (0 disables)
+        "max_symbol_files": args.max_symbol_files,
+
+        # Add planner mode ("staged" or "fused")
+        "planner": args.planner,
+        # Add chapter generation mode ("single" or "sections")
+        "chapter_generation": args.chapter_generation,
+        # Skip or shorten low-value files while crawling
+        "filter_low_value": not args.keep_low_value,
+        # Add minification modes per stage
+        "minify_planning": args.minify_planning,
+        "minify_chapters": args.minify_chapters,
+
+        # Add relationship analysis mode ("llm", "hints" or "static")
+        "relationships_mode": args.relationships_mode,
+
+        # Add chapter ordering strategy ("llm", "graph" or "hybrid")
+        "order_strategy": args.order_strategy,
+
+        # Add incremental regeneration flag
+        "incremental": args.incremental,
+
+        # Add chapter patch mode settings (used with incremental)
+        "patch_chapters": args.patch_chapters,
+        "patch_max_diff_tokens": args.patch_max_diff_tokens,
+
         # Add debug flag
         "debug": args.debug,
 
@@ -127,16 +242,64 @@ def main():
     }
 
     # Display starting message with repository/directory and language
-    print(f"Starting tutorial generation for: {args.repo or args.dir} in {args.language.capitalize()} language")
+    languages = args.languages or [args.language]
+    print(f"Starting tutorial generation for: {args.repo or args.dir} in {', '.join(language.capitalize() for language in languages)} language")
     print(f"LLM caching: {'Disabled' if args.no_cache else 'Enabled'}")
     if args.debug:
         print(f"Debug mode: Enabled - detailed API logging will be shown")
 
+    # Checkpoint the run after each step so it can be resumed with --resume
+    if args.resume:
+        try:
+            checkpoint = RunCheckpoint(run_directory(args.output, args.resume))
+            # The saved options and progress replace the fresh ones; tokens are never saved
+            shared.update(checkpoint.load())
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not load checkpoint for run {args.resume}: {e}")
+            return
+        print(f"Resuming run {args.resume} after {len(checkpoint.completed)} completed steps")
+    else:
+        checkpoint = RunCheckpoint(run_directory(args.output, new_run_id()))
+        print(f"Run ID: {checkpoint.run_id} (resume with --resume {checkpoint.run_id} if interrupted)")
+    shared["_checkpoint"] = checkpoint
+
     # Create the flow instance
     tutorial_flow = create_tutorial_flow()
 
-    # Run the flow
-    tutorial_flow.run(shared)
+    # Optionally profile each step; the profile is written even when the run fails
+    profiler = FlowProfiler() if args.profile else None
+    if profiler:
+        shared["_profiler"] = profiler
+
+    # Run the flow, collecting LLM telemetry along the way
+    telemetry = start_run()
+    if shared.get("token_budget"):
+        # A resumed run keeps counting from the spend saved with its checkpoint
+        shared["_token_budget"] = TokenBudget(
+            shared["token_budget"], telemetry, (shared.get("token_usage") or {}).get("spent", 0)
+        )
+    stopped = None
+    try:
+        tutorial_flow.run(shared)
+    except TokenBudgetExceeded as e:
+        # Planning has no partial result: stop, but still report the spend below
+        stopped = e
+    finally:
+        if profiler:
+            trace_path, summary_path = profiler.write(shared.get("final_output_dir") or args.output)
+            print(profiler.format_summary())
+            print(f"Profile written to {trace_path} and {summary_path}")
+    print(telemetry.format_summary())
+    if shared.get("_token_budget"):
+        usage = shared["_token_budget"].usage()
+        print(f"Token budget: spent {usage['spent']} of {usage['budget']} tokens.")
+        if shared.get("skipped_chapters"):
+            print(f"Chapters left unwritten: {', '.join(map(str, shared['skipped_chapters']))}")
+    if stopped:
+        print(f"Stopped on the token budget: {stopped}. No tutorial was written.")
+    else:
+        # The checkpoint holds a copy of the codebase and is only needed to resume
+        checkpoint.discard()
 
 if __name__ == "__main__":
     main()
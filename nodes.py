@@ -1,25 +1,354 @@
 import os
 import re
+import json
+import copy
+import time
 import yaml
 from pocketflow import Node, BatchNode
 from utils.crawl_github_files import crawl_github_files
 from utils.crawl_gitlab_files import crawl_gitlab_files
-from utils.call_llm import call_llm
+from utils.call_llm import call_llm, get_model_name
 from utils.crawl_local_files import crawl_local_files
+from utils.concurrency import map_concurrently
+from utils.chapter_digest import make_chapter_digest, build_rolling_context
+from utils.token_count import estimate_tokens, truncate_to_tokens
+from utils.file_shards import partition_files
+from utils.disk_cache import DiskCache, content_hash
+from utils.code_skeleton import extract_skeletons
+from utils.chunking import fit_files_to_budget
+from utils.vector_index import VectorIndex
+from utils.bm25 import BM25Index
+from utils.symbol_index import SymbolIndex
+from utils.chapter_order import order_by_dependencies
+from utils.tutorial_manifest import (
+    load_manifest,
+    write_manifest,
+    changed_paths,
+    load_source_snapshot,
+    write_source_snapshot,
+    unified_diff,
+)
+from utils.import_graph import build_import_graph, abstraction_edges
+from utils.file_ranking import rank_files
+from utils.token_budget import CHAPTER_OVERHEAD_TOKENS, plan_token_budget
+from utils.minify import MODES as MINIFY_MODES, minify_files
+
+# Attribution appended to every generated page by CombineTutorial
+TUTORIAL_FOOTER = "---\n\nGenerated by [AI代码助手]"
+
+# Body of the chapters left unwritten when the job's token budget runs out
+BUDGET_EXHAUSTED_NOTE = "> This chapter was not written because the token budget of the job ran out."
+
+# Token budget for the source files of one chapter (shared["chapter_context_tokens"])
+DEFAULT_CHAPTER_CONTEXT_TOKENS = 16000
+
+# Incremental runs keep the previous plan only while at most this share of files changed
+INCREMENTAL_MAX_CHANGED_FRACTION = 0.3
+
+# A chapter is patched from a diff only while the diff is at most this share of its files;
+# beyond that a full rewrite costs about the same and reads better
+PATCH_MAX_DIFF_FRACTION = 0.5
+
+# Planning nodes only need the text up to the closing fence of their YAML block.
+# The opening fence is "```yaml", so this sequence never matches it. It does match the
+# end of any fenced block the model writes before the YAML; extract_yaml_block then
+# raises ValueError and the node retries.
+YAML_BLOCK_STOP = ["\n```\n"]
+
+
+# Helper to get content for specific file indices. With max_tokens, the largest files are
+# shortened (outline plus head/tail excerpt, or the chunks most relevant to `query`) so
+# all of them fit in the budget together. With return_shortened, the number of shortened
+# files is returned along with the map.
+def get_content_for_indices(files_data, indices, max_tokens=None, query=None, return_shortened=False):
+    valid = [i for i in indices if 0 <= i < len(files_data)]
+    contents, shortened = fit_files_to_budget([files_data[i] for i in valid], max_tokens, query)
+    content_map = {}
+    for i, content in zip(valid, contents):
+        path = files_data[i][0]
+        content_map[f"{i} # {path}"] = (
+            content  # Use index + path as key for context
+        )
+    if return_shortened:
+        return content_map, shortened
+    return content_map
 
 
-# Helper to get content for specific file indices
-def get_content_for_indices(files_data, indices):
+# Planning calls have no partial result to fall back on, so once shared["_token_budget"]
+# is spent the run stops before them with TokenBudgetExceeded.
+def check_token_budget(shared, step):
+    if shared.get("_token_budget") is not None:
+        shared["_token_budget"].check(step)
+
+
+# Helper to get the files as a prompt stage ("planning" or "chapters") sees them, minified
+# with shared["minify_<stage>"] (see utils/minify.py). Minified copies are built on first
+# use and kept under runtime ("_") keys per mode; the savings per file type are printed
+# and kept in shared["minify_savings"] by stage.
+def get_stage_files(shared, stage):
+    mode = shared.get(f"minify_{stage}", "none")
+    if mode == "none":
+        return shared["files"]
+    if mode not in MINIFY_MODES:
+        raise ValueError(f"Unknown minify mode for {stage}: {mode}")
+    key = f"_minified_files_{mode}"
+    if key not in shared:
+        start = time.perf_counter()
+        shared[key] = minify_files(shared["files"], mode)
+        files, savings = shared[key]
+        raw = sum(stats["raw_tokens"] for stats in savings.values())
+        minified = sum(stats["minified_tokens"] for stats in savings.values())
+        print(
+            f"Minified {len(files)} files ({mode}) in {time.perf_counter() - start:.1f}s: "
+            f"~{minified} tokens instead of ~{raw} ({100 - minified * 100 // max(raw, 1)}% saved)."
+        )
+        for extension, stats in sorted(savings.items(), key=lambda item: -item[1]["raw_tokens"]):
+            if stats["raw_tokens"] > stats["minified_tokens"]:
+                print(
+                    f"  {extension}: {stats['files']} files, ~{stats['raw_tokens']} -> "
+                    f"~{stats['minified_tokens']} tokens "
+                    f"({100 - stats['minified_tokens'] * 100 // stats['raw_tokens']}% saved)"
+                )
+    files, savings = shared[key]
+    shared.setdefault("minify_savings", {})[stage] = {"mode": mode, "by_extension": savings}
+    return files
+
+
+# Helper to get the content planning prompts should see: the file summary when one
+# was produced by SummarizeFiles, else the code skeleton from ExtractSkeletons,
+# otherwise the file content (minified with shared["minify_planning"])
+def get_planning_content_for_indices(shared, indices):
+    files_data = get_stage_files(shared, "planning")
+    summaries = shared.get("file_summaries") or []
+    skeletons = shared.get("file_skeletons") or []
     content_map = {}
     for i in indices:
         if 0 <= i < len(files_data):
             path, content = files_data[i]
-            content_map[f"{i} # {path}"] = (
-                content  # Use index + path as key for context
-            )
+            if i < len(summaries) and summaries[i]:
+                content = f"(File summary) {summaries[i]}"
+            elif i < len(skeletons) and skeletons[i]:
+                content = f"(Code skeleton: imports, signatures and docstrings)\n{skeletons[i]}"
+            content_map[f"{i} # {path}"] = content
     return content_map
 
 
+# Helper to order file indices by importance (shared["file_ranking"] from RankFiles)
+def order_by_rank(shared, indices):
+    ranking = shared.get("file_ranking")
+    if not ranking:
+        return sorted(indices)
+    position = {file_index: pos for pos, file_index in enumerate(ranking)}
+    return sorted(indices, key=lambda i: position.get(i, len(position)))
+
+
+# Helper to get the directory a tutorial is written to. Multi-language runs
+# (shared["languages"]) put each language in its own subdirectory, the pivot included.
+def get_tutorial_output_path(shared, language=None):
+    output_path = os.path.join(shared.get("output_dir", "output"), shared["project_name"])
+    languages = shared.get("languages") or []
+    if len(languages) > 1:
+        output_path = os.path.join(output_path, language or languages[0])
+    return output_path
+
+
+# Helper to keep (index, path, content) entries within a token budget. Entries are expected
+# in rank order; once the budget is spent, later files are listed by path only.
+def apply_context_budget(entries, max_tokens):
+    if not max_tokens:
+        return entries, 0
+    budgeted = []
+    used = 0
+    omitted = 0
+    for i, path, content in entries:
+        tokens = estimate_tokens(content)
+        if used + tokens > max_tokens:
+            budgeted.append((i, path, "(content omitted: outside the context budget)"))
+            omitted += 1
+        else:
+            budgeted.append((i, path, content))
+            used += tokens
+    return budgeted, omitted
+
+
+# Helper to get the retrieval index of the run. It is built on first use and kept under a
+# runtime ("_") key, so it lasts for the run but is never checkpointed. None when it
+# could not be built (e.g. no embedding endpoint). "bm25" needs no model at all.
+def get_retrieval_index(shared, mode):
+    key = f"_retrieval_index_{mode}"
+    if key not in shared:
+        files_data = shared["files"]
+        file_hashes = shared.get("file_hashes") or [content_hash(c) for _, c in files_data]
+        index = None
+        try:
+            if mode == "embedding":
+                index, hits = VectorIndex.build(
+                    files_data, file_hashes, use_cache=shared.get("use_cache", True)
+                )
+                print(
+                    f"Built the embedding index: {len(index.chunks)} chunks from "
+                    f"{len(files_data)} files ({hits} files cached)."
+                )
+            elif mode == "bm25":
+                start = time.perf_counter()
+                index = BM25Index.build(files_data)
+                print(
+                    f"Built the BM25 index: {len(index.chunks)} chunks from {len(files_data)} files "
+                    f"in {time.perf_counter() - start:.1f}s."
+                )
+            else:
+                raise ValueError(f"Unknown retrieval mode: {mode}")
+        except Exception as e:
+            print(f"Warning: Could not build the {mode} index, using the abstractions' files instead: {e}")
+        shared[key] = index
+    return shared[key]
+
+
+# Helper to get the symbol table of the run, built the first time an abstraction's files are
+# extended (add_defining_files). Like the retrieval index it lives under a runtime ("_") key,
+# so a resumed run builds it again on first use.
+def get_symbol_index(shared):
+    if "_symbol_index" not in shared:
+        start = time.perf_counter()
+        shared["_symbol_index"] = SymbolIndex.build(shared["files"])
+        print(
+            f"Indexed {len(shared['_symbol_index'].definitions)} symbols in "
+            f"{time.perf_counter() - start:.1f}s."
+        )
+    return shared["_symbol_index"]
+
+
+# Helper to add the files defining the symbols an abstraction names or uses, within
+# max_files per abstraction. Returns the number of files added.
+def add_defining_files(shared, abstractions, max_files):
+    if not max_files:
+        return 0
+    symbol_index = get_symbol_index(shared)
+    added = 0
+    for abstraction in abstractions:
+        suggestions = symbol_index.suggest_files(
+            f"{abstraction['name']}\n{abstraction['description']}", abstraction["files"], max_files
+        )
+        for file_index, _ in suggestions:
+            abstraction["files"].append(file_index)
+        abstraction["files"].sort()
+        added += len(suggestions)
+    return added
+
+
+# Helper to retrieve the best chunks of the codebase for each abstraction, as content maps
+# like get_content_for_indices (one entry per chunk, in file and line order). Each map holds
+# at most top_k chunks within max_tokens. Returns None when the index is unavailable.
+def retrieve_chapter_context(shared, abstraction_indices, mode, top_k, max_tokens):
+    index = get_retrieval_index(shared, mode)
+    if index is None:
+        return None
+    files_data = shared["files"]
+    abstractions = [shared["abstractions"][i] for i in abstraction_indices]
+    try:
+        results = index.search(
+            [f"{a['name']}: {a['description']}" for a in abstractions],
+            top_k,
+            boost_files=[a.get("files", []) for a in abstractions],
+        )
+    except Exception as e:
+        print(f"Warning: Could not search the {mode} index, using the abstractions' files instead: {e}")
+        return None
+    retrieved = {}
+    for abstraction_index, hits in zip(abstraction_indices, results):
+        selected = []
+        used = 0
+        for chunk_index, _ in hits:
+            tokens = estimate_tokens(index.texts[chunk_index])
+            if max_tokens and used + tokens > max_tokens:
+                continue
+            selected.append(chunk_index)
+            used += tokens
+        content_map = {}
+        for chunk_index in sorted(selected, key=lambda c: index.chunks[c]):
+            file_index, first, last = index.chunks[chunk_index]
+            content_map[f"{file_index} # {files_data[file_index][0]} (lines {first}-{last})"] = (
+                index.texts[chunk_index]
+            )
+        retrieved[abstraction_index] = content_map
+    return retrieved
+
+
+# Helper to describe earlier chapters from the plan alone (used when chapters are written in parallel)
+def build_planned_chapter_context(previous_order, abstractions, chapter_filenames, next_chapter):
+    if not previous_order:
+        return ""
+    lines = ["Earlier chapters (written separately; link to them instead of repeating them):"]
+    for abstraction_index in previous_order:
+        if abstraction_index not in chapter_filenames:
+            continue
+        info = chapter_filenames[abstraction_index]
+        description = " ".join(abstractions[abstraction_index]["description"].split())
+        lines.append(
+            f"- Chapter {info['num']}: [{info['name'].strip()}]({info['filename']}) - {description}"
+        )
+    if next_chapter:
+        lines.append(
+            f"Next chapter: [{next_chapter['name'].strip()}]({next_chapter['filename']})"
+        )
+    return "\n".join(lines)
+
+
+class MemoizedPlanning:
+    """
+    Mixin for planning nodes whose result depends only on their inputs.
+
+    Before prep, the node's inputs are digested: path and content hash of every
+    file, project name, language, max_abstraction_num, model, the shared keys in
+    `memo_inputs` (earlier planning results and options). On a hit the stored,
+    already validated `memo_output` is put back in shared and the node is
+    skipped, prompt construction included. Results are stored after every run
+    unless the node set `partial_result` (the token budget cut it short). With
+    shared["use_memo"] or shared["use_cache"] set to False the memo is neither
+    read nor written.
+    """
+
+    memo_output = None  # Shared key the node's post writes, or a tuple of keys
+    memo_inputs = ()  # Other shared keys the result depends on
+    # Bump when a planning prompt or its validation changes so stale results are not reused
+    memo_version = "1"
+
+    def memo_key(self, shared):
+        files_data = shared.get("files", [])
+        file_hashes = shared.get("file_hashes") or [content_hash(c) for _, c in files_data]
+        inputs = {
+            "node": self.__class__.__name__,
+            "version": self.memo_version,
+            "model": get_model_name(),
+            "project_name": shared["project_name"],
+            "language": shared.get("language", "english"),
+            "max_abstraction_num": shared.get("max_abstraction_num", 10),
+            "files": [[path, file_hash] for (path, _), file_hash in zip(files_data, file_hashes)],
+            "options": {key: shared.get(key) for key in self.memo_inputs},
+            "outputs": list(self.memo_outputs()),
+        }
+        return content_hash(json.dumps(inputs, ensure_ascii=False, sort_keys=True, default=sorted))
+
+    def memo_outputs(self):
+        return self.memo_output if isinstance(self.memo_output, tuple) else (self.memo_output,)
+
+    def _run(self, shared):
+        if not (shared.get("use_memo", True) and shared.get("use_cache", True)):
+            return super()._run(shared)
+        memo = DiskCache("planning_memo")
+        key = self.memo_key(shared)
+        stored = memo.get(key)
+        if stored is not None:
+            print(f"{self.__class__.__name__}: reusing the memoized result of an earlier run.")
+            shared.update(stored["result"])
+            return stored["action"]
+        self.partial_result = False
+        action = super()._run(shared)
+        if not self.partial_result:
+            memo.set(key, {"result": {output: shared[output] for output in self.memo_outputs()}, "action": action})
+        return action
+
+
 class FetchRepo(Node):
     def prep(self, shared):
         repo_url = shared.get("repo_url")
@@ -74,6 +403,8 @@ class FetchRepo(Node):
             "use_relative_paths": True,
             "debug": debug,
             "ref": ref,  # Pass ref parameter to GitLab crawler
+            # Skip lockfiles, generated and minified code; shorten notebooks and large data files
+            "filter_low_value": shared.get("filter_low_value", True),
         }
 
     def exec(self, prep_res):
@@ -92,6 +423,7 @@ class FetchRepo(Node):
                     use_relative_paths=prep_res["use_relative_paths"],
                     debug=prep_res["debug"],
                     ref=prep_res.get("ref"),  # Pass ref parameter
+                    filter_low_value=prep_res["filter_low_value"],
                 )
             else:
                 # Use GitHub crawler for GitHub repositories
@@ -102,6 +434,7 @@ class FetchRepo(Node):
                     exclude_patterns=prep_res["exclude_patterns"],
                     max_file_size=prep_res["max_file_size"],
                     use_relative_paths=prep_res["use_relative_paths"],
+                    filter_low_value=prep_res["filter_low_value"],
                 )
         else:
             print(f"Crawling directory: {prep_res['local_dir']}...")
@@ -111,7 +444,8 @@ class FetchRepo(Node):
                 include_patterns=prep_res["include_patterns"],
                 exclude_patterns=prep_res["exclude_patterns"],
                 max_file_size=prep_res["max_file_size"],
-                use_relative_paths=prep_res["use_relative_paths"]
+                use_relative_paths=prep_res["use_relative_paths"],
+                filter_low_value=prep_res["filter_low_value"],
             )
 
         # Convert dict to list of tuples: [(path, content), ...]
@@ -119,36 +453,588 @@ class FetchRepo(Node):
         if len(files_list) == 0:
             raise (ValueError("Failed to fetch files"))
         print(f"Fetched {len(files_list)} files.")
-        return files_list
+        # Per-reason counts of the low-value filter
+        low_value_files = (result.get("stats") or {}).get("low_value_files") or {}
+        if low_value_files:
+            print(
+                "Low-value files skipped or shortened: "
+                + ", ".join(f"{reason} {count}" for reason, count in sorted(low_value_files.items()))
+            )
+        return files_list, low_value_files
 
     def post(self, shared, prep_res, exec_res):
-        shared["files"] = exec_res  # List of (path, content) tuples
+        files_list, low_value_files = exec_res
+        shared["files"] = files_list  # List of (path, content) tuples
+        shared["low_value_files"] = low_value_files
+        # Content hashes aligned with shared["files"], used to key caches
+        shared["file_hashes"] = [content_hash(content) for _, content in files_list]
+        # Minified copies and the symbol table belong to the files fetched before
+        for key in [key for key in shared if key.startswith("_minified_files_")]:
+            del shared[key]
+        shared.pop("_symbol_index", None)
+
+
+class RankFiles(Node):
+    """
+    Ranks the crawled files so the most useful ones reach the prompts first.
+
+    Builds the file-level import graph and scores every file by centrality,
+    path heuristics and size (see utils.file_ranking). Both steps are linear
+    in the number of files and imports, so this stays cheap on large repositories.
+    """
 
+    def prep(self, shared):
+        return shared["files"]
+
+    def exec(self, files_data):
+        import_graph = build_import_graph(files_data)
+        ranking, scores = rank_files(files_data, import_graph)
+        edge_count = sum(len(targets) for targets in import_graph)
+        top_files = ", ".join(files_data[i][0] for i in ranking[:5])
+        print(f"Ranked {len(files_data)} files ({edge_count} import edges). Top files: {top_files}")
+        return import_graph, ranking, scores
+
+    def post(self, shared, prep_res, exec_res):
+        import_graph, ranking, scores = exec_res
+        shared["import_graph"] = import_graph  # For each file index, the file indices it imports
+        shared["file_ranking"] = ranking  # File indices, most important first
+        shared["file_scores"] = scores  # Aligned with shared["files"]
+
+
+class PlanTokenBudget(Node):
+    """
+    Scales the run down to shared["token_budget"] before any LLM call.
+
+    From the size of the codebase it lowers the planning context, the number of
+    abstractions and the chapter context and length (see utils.token_budget), so
+    the expected spend fits the budget. While the job runs, WriteChapters and
+    TranslateTutorial check shared["_token_budget"] and stop with partial output
+    once it is spent; the planning nodes stop the run with TokenBudgetExceeded
+    (sharded IdentifyAbstractions plans from the shards read so far, and the
+    hybrid chapter order skips its LLM tie-break). Nothing happens without a budget.
+    """
+
+    def prep(self, shared):
+        budget = shared.get("token_budget")
+        if not budget:
+            return None
+        options = {
+            key: shared.get(key)
+            for key in (
+                "max_abstraction_num",
+                "max_context_tokens",
+                "chapter_max_tokens",
+                "summarize_files",
+                "shard_tokens",
+                "languages",
+            )
+        }
+        options["chapter_context_tokens"] = shared.get("chapter_context_tokens", DEFAULT_CHAPTER_CONTEXT_TOKENS)
+        options["chapter_max_tokens"] = options["chapter_max_tokens"] or WriteChapters.num_predict
+        codebase_tokens = sum(estimate_tokens(content) for _, content in shared["files"])
+        return budget, codebase_tokens, options
+
+    def exec(self, prep_res):
+        if prep_res is None:
+            return None
+        budget, codebase_tokens, options = prep_res
+        changes = plan_token_budget(budget, codebase_tokens, options)
+        print(f"Token budget: {budget} tokens for a codebase of ~{codebase_tokens} tokens.")
+        for key, value in changes.items():
+            print(f"  - {key}: {options.get(key)} -> {value}")
+        return changes
+
+    def post(self, shared, prep_res, exec_res):
+        if exec_res:
+            shared.update(exec_res)
+
+
+class ReusePreviousPlan(Node):
+    """
+    Incremental mode: reuses the plan and unchanged chapters of the previous tutorial.
+
+    CombineTutorial leaves a manifest with the content hash of every file, the plan
+    (abstractions, relationships, chapter order) and the files behind each chapter.
+    When shared["incremental"] is set, the language and model match, every file the
+    plan refers to still exists and only a small share of files changed, this node
+    restores the plan and returns "reuse" so the flow goes straight to WriteChapters.
+    Chapters whose files are unchanged are then reused verbatim and only the others
+    are rewritten; the index and diagram are regenerated by CombineTutorial.
+    With shared["patch_chapters"], a chapter whose files changed only slightly is
+    updated from a unified diff against the previous sources instead (see WriteChapters).
+    """
+
+    def prep(self, shared):
+        if not shared.get("incremental", False):
+            return None
+        output_path = get_tutorial_output_path(shared)
+        manifest = load_manifest(output_path)
+        if manifest is None:
+            print("Incremental mode: no previous tutorial found, generating from scratch.")
+            return None
+        current_hashes = {
+            path: file_hash
+            for (path, _), file_hash in zip(shared["files"], shared["file_hashes"])
+        }
+        patch_settings = None
+        if shared.get("patch_chapters", False):
+            patch_settings = {
+                "max_diff_tokens": shared.get("patch_max_diff_tokens", 2000),
+                "current_sources": dict(shared["files"]),
+            }
+        return (
+            manifest,
+            current_hashes,
+            output_path,
+            shared.get("language", "english"),
+            get_model_name(),
+            patch_settings,
+        )
+
+    def exec(self, prep_res):
+        if prep_res is None:
+            return None
+        manifest, current_hashes, output_path, language, model, patch_settings = prep_res
+
+        if manifest.get("language") != language or manifest.get("model") != model:
+            print("Incremental mode: language or model changed, generating from scratch.")
+            return None
+        changed = changed_paths(manifest["files"], current_hashes)
+        missing = {
+            path for abstraction in manifest["abstractions"] for path in abstraction["files"]
+        } - current_hashes.keys()
+        if missing:
+            print(f"Incremental mode: {len(missing)} planned files were removed, generating from scratch.")
+            return None
+        if len(changed) > INCREMENTAL_MAX_CHANGED_FRACTION * max(len(current_hashes), 1):
+            print(f"Incremental mode: {len(changed)} of {len(current_hashes)} files changed, generating from scratch.")
+            return None
+
+        previous_sources = load_source_snapshot(output_path) if patch_settings else {}
+        reusable_chapters = []
+        chapter_patches = []
+        for chapter in manifest["chapters"]:
+            try:
+                with open(os.path.join(output_path, chapter["filename"]), "r", encoding="utf-8") as f:
+                    content = f.read()
+            except OSError:
+                content = None
+            if content is not None and content.endswith(TUTORIAL_FOOTER):
+                content = content[: -len(TUTORIAL_FOOTER)]
+            else:
+                content = None
+            if content is not None and BUDGET_EXHAUSTED_NOTE in content:
+                content = None  # Left unwritten when an earlier run ran out of tokens
+
+            chapter_changes = sorted(changed & set(chapter["file_hashes"]))
+            patch = None
+            if content is not None and chapter_changes and patch_settings:
+                patch = self.build_patch(content, chapter, chapter_changes, previous_sources, patch_settings)
+            reusable_chapters.append(content if not chapter_changes else None)
+            chapter_patches.append(patch)
+
+        patched = sum(1 for p in chapter_patches if p)
+        print(
+            f"Incremental mode: {len(changed)} files changed, reusing the plan and "
+            f"{sum(1 for c in reusable_chapters if c is not None)} of {len(reusable_chapters)} chapters"
+            + (f", patching {patched} from diffs." if patch_settings else ".")
+        )
+        return manifest, reusable_chapters, chapter_patches
+
+    def build_patch(self, content, chapter, chapter_changes, previous_sources, patch_settings):
+        # Needs the previous version of every changed file, and a diff small enough to pay off
+        current_sources = patch_settings["current_sources"]
+        if any(path not in previous_sources for path in chapter_changes):
+            return None
+        diff = "".join(
+            unified_diff(path, previous_sources[path], current_sources[path])
+            for path in chapter_changes
+        )
+        diff_tokens = estimate_tokens(diff)
+        source_tokens = sum(estimate_tokens(current_sources[path]) for path in chapter["file_hashes"])
+        if diff_tokens > patch_settings["max_diff_tokens"] or diff_tokens > PATCH_MAX_DIFF_FRACTION * source_tokens:
+            return None
+        return {"previous_chapter": content, "diff": diff}
+
+    def post(self, shared, prep_res, exec_res):
+        if exec_res is None:
+            return None
+        manifest, reusable_chapters, chapter_patches = exec_res
+        file_index = {path: i for i, (path, _) in enumerate(shared["files"])}
+        shared["abstractions"] = [
+            {**abstraction, "files": [file_index[path] for path in abstraction["files"]]}
+            for abstraction in manifest["abstractions"]
+        ]
+        shared["relationships"] = manifest["relationships"]
+        shared["chapter_order"] = manifest["chapter_order"]
+        # WriteChapters only writes the chapters that are still None, patching those with a diff
+        shared["chapters_in_progress"] = reusable_chapters
+        if any(chapter_patches):
+            shared["chapter_patches"] = chapter_patches
+        return "reuse"
+
+
+class SummarizeFiles(Node):
+    """
+    Optional pre-pass that replaces large files with short summaries in the planning prompts.
+
+    Summaries are cached by file content hash and model, so unchanged files in
+    later runs (and identical files across repositories) are not summarized again.
+    Files below `summary_min_tokens` are cheaper to send as they are.
+    """
+
+    # Generation limits passed through to call_llm (num_predict includes thinking tokens)
+    stop_sequences = None
+    num_predict = 1024
+    # Bump when the summary prompt changes so stale cache entries are not reused
+    prompt_version = "1"
+
+    def prep(self, shared):
+        files_data = shared["files"]
+        summaries = [None] * len(files_data)
+        if not shared.get("summarize_files", False):
+            return None
+
+        min_tokens = shared.get("summary_min_tokens", 300)
+        use_cache = shared.get("use_cache", True)
+        file_hashes = shared.get("file_hashes") or [content_hash(c) for _, c in files_data]
+        self.cache = DiskCache("file_summaries")
+        self.max_workers = shared.get("llm_workers", 4)
+        model = get_model_name()
+
+        to_summarize = []
+        for i, (path, content) in enumerate(files_data):
+            if estimate_tokens(content) < min_tokens:
+                continue
+            cache_key = f"{model}:{self.prompt_version}:{file_hashes[i]}"
+            cached = self.cache.get(cache_key) if use_cache else None
+            if cached:
+                summaries[i] = cached
+            else:
+                to_summarize.append((i, path, content, cache_key))
+
+        print(
+            f"Summarizing files: {sum(1 for s in summaries if s)} cached, {len(to_summarize)} to summarize."
+        )
+        return summaries, to_summarize, shared["project_name"]
+
+    def exec(self, prep_res):
+        if prep_res is None:
+            return None
+        summaries, to_summarize, project_name = prep_res
+
+        def summarize(entry):
+            i, path, content, cache_key = entry
+            prompt = f"""
+Summarize the file `{path}` from the project `{project_name}` for someone deciding which parts of the codebase matter.
+In at most 5 short sentences, state the file's purpose, the main classes/functions it defines, and what other modules it uses or is used by.
+Mention identifiers exactly as written in the code. Output only the summary text.
+
+File content:
+{content}
+"""
+            try:
+                summary = call_llm(
+                    prompt,
+                    use_cache=False,
+                    stop=self.stop_sequences,
+                    num_predict=self.num_predict,
+                    node=self.__class__.__name__,
+                )
+            except Exception as e:
+                # A missing summary just means the raw file is used
+                print(f"Warning: Could not summarize {path}: {e}")
+                return i, None
+            if summary:
+                self.cache.set(cache_key, summary)
+            return i, summary
+
+        for i, summary in map_concurrently(summarize, to_summarize, self.max_workers):
+            summaries[i] = summary
+        return summaries
+
+    def post(self, shared, prep_res, exec_res):
+        if exec_res is None:
+            return
+        shared["file_summaries"] = exec_res  # Aligned with shared["files"], None where raw content is used
+        raw_tokens = sum(estimate_tokens(content) for _, content in shared["files"])
+        planning_tokens = sum(
+            estimate_tokens(summary) if summary else estimate_tokens(content)
+            for summary, (_, content) in zip(exec_res, shared["files"])
+        )
+        print(f"Planning context: ~{planning_tokens} tokens with summaries (~{raw_tokens} raw).")
+
+
+class ExtractSkeletons(Node):
+    """
+    Optional pre-pass that reduces source files to code skeletons for the planning prompts.
+
+    Enabled with shared["planning_context"] == "skeleton". Extraction runs in a
+    process pool and is cached by content hash; files without a supported
+    extractor (Markdown, YAML, ...) keep their raw content.
+    """
+
+    def prep(self, shared):
+        if shared.get("planning_context", "full") != "skeleton":
+            return None
+        return shared["files"], shared.get("file_hashes"), shared.get("use_cache", True)
+
+    def exec(self, prep_res):
+        if prep_res is None:
+            return None
+        files_data, file_hashes, use_cache = prep_res
+        print("Extracting code skeletons...")
+        skeletons, cache_hits = extract_skeletons(
+            files_data, file_hashes, use_cache=use_cache
+        )
+        print(
+            f"Extracted {sum(1 for s in skeletons if s)} skeletons ({cache_hits} from cache)."
+        )
+        return skeletons
+
+    def post(self, shared, prep_res, exec_res):
+        if exec_res is None:
+            return
+        shared["file_skeletons"] = exec_res  # Aligned with shared["files"], None where raw content is used
+        # Report the token savings for this repository
+        raw_tokens = 0
+        skeleton_tokens = 0
+        for skeleton, (_, content) in zip(exec_res, shared["files"]):
+            if skeleton:
+                raw_tokens += estimate_tokens(content)
+                skeleton_tokens += estimate_tokens(skeleton)
+        if raw_tokens:
+            print(
+                f"Code skeletons: ~{skeleton_tokens} tokens instead of ~{raw_tokens} "
+                f"({100 - skeleton_tokens * 100 // raw_tokens}% saved on source files)."
+            )
+        shared["skeleton_savings"] = {"raw_tokens": raw_tokens, "skeleton_tokens": skeleton_tokens}
+
+
+# Helper to build the IdentifyAbstractions context from (index, path, content) entries
+def create_identify_context(entries):
+    context = ""
+    file_info = []  # Store tuples of (index, path)
+    for i, path, content in entries:
+        entry = f"--- File Index {i}: {path} ---\n{content}\n\n"
+        context += entry
+        file_info.append((i, path))
+    # Format file info for the prompt (comment is just a hint for LLM)
+    file_listing_for_prompt = "\n".join(
+        [f"- {idx} # {path}" for idx, path in file_info]
+    )
+    return context, file_listing_for_prompt
+
+
+def build_identify_prompt(
+    project_name, context, file_listing_for_prompt, language, max_abstraction_num, scope_note=""
+):
+    # Add language instruction and hints only if not English
+    language_instruction = ""
+    name_lang_hint = ""
+    desc_lang_hint = ""
+    if language.lower() != "english":
+        language_instruction = f"IMPORTANT: Generate the `name` and `description` for each abstraction in **{language.capitalize()}** language. Do NOT use English for these fields.\n\n"
+        # Keep specific hints here as name/description are primary targets
+        name_lang_hint = f" (value in {language.capitalize()})"
+        desc_lang_hint = f" (value in {language.capitalize()})"
+
+    return f"""
+For the project `{project_name}`:
+{scope_note}
+Codebase Context:
+{context}
+
+{language_instruction}Analyze the codebase context.
+Identify the top 5-{max_abstraction_num} core most important abstractions to help those new to the codebase.
+
+For each abstraction, provide:
+1. A concise `name`{name_lang_hint}.
+2. A beginner-friendly `description` explaining what it is with a simple analogy, in around 100 words{desc_lang_hint}.
+3. A list of relevant `file_indices` (integers) using the format `idx # path/comment`.
+
+List of file indices and paths present in the context:
+{file_listing_for_prompt}
+
+Format the output as a YAML list of dictionaries:
+
+```yaml
+- name: |
+    Query Processing{name_lang_hint}
+  description: |
+    Explains what the abstraction does.
+    It's like a central dispatcher routing requests.{desc_lang_hint}
+  file_indices:
+    - 0 # path/to/file1.py
+    - 3 # path/to/related.py
+- name: |
+    Query Optimization{name_lang_hint}
+  description: |
+    Another core concept, similar to a blueprint for objects.{desc_lang_hint}
+  file_indices:
+    - 5 # path/to/another.js
+# ... up to {max_abstraction_num} abstractions
+```"""
+
+
+# Helper to parse a list of indices written as `idx # comment` entries
+def parse_index_list(entries, count, owner):
+    validated_indices = []
+    for idx_entry in entries:
+        try:
+            if isinstance(idx_entry, int):
+                idx = idx_entry
+            elif isinstance(idx_entry, str) and "#" in idx_entry:
+                idx = int(idx_entry.split("#")[0].strip())
+            else:
+                idx = int(str(idx_entry).strip())
+
+            if not (0 <= idx < count):
+                raise ValueError(
+                    f"Invalid index {idx} found in item {owner}. Max index is {count - 1}."
+                )
+            validated_indices.append(idx)
+        except (ValueError, TypeError):
+            raise ValueError(
+                f"Could not parse index from entry: {idx_entry} in item {owner}"
+            )
+    return sorted(list(set(validated_indices)))
+
+
+def extract_yaml_block(response):
+    """Return the text of the first ```yaml block in an LLM response."""
+    # YAML_BLOCK_STOP also ends generation at an earlier fenced block, before the YAML
+    if "```yaml" not in response:
+        raise ValueError("no ```yaml block in response")
+    return response.strip().split("```yaml")[1].split("```")[0].strip()
+
+
+def parse_abstractions_response(response, file_count):
+    """Validate the YAML abstraction list returned by the LLM."""
+    yaml_str = extract_yaml_block(response)
+    return validate_abstractions(yaml.safe_load(yaml_str), file_count)
+
+
+def validate_abstractions(abstractions, file_count):
+    """Validate a parsed abstraction list and keep name, description and file indices."""
+    if not isinstance(abstractions, list):
+        raise ValueError("LLM Output is not a list")
+
+    validated_abstractions = []
+    for item in abstractions:
+        if not isinstance(item, dict) or not all(
+            k in item for k in ["name", "description", "file_indices"]
+        ):
+            raise ValueError(f"Missing keys in abstraction item: {item}")
+        if not isinstance(item["name"], str):
+            raise ValueError(f"Name is not a string in item: {item}")
+        if not isinstance(item["description"], str):
+            raise ValueError(f"Description is not a string in item: {item}")
+        if not isinstance(item["file_indices"], list):
+            raise ValueError(f"file_indices is not a list in item: {item}")
+
+        # Validate indices
+        item["files"] = parse_index_list(item["file_indices"], file_count, item["name"])
+        # Store only the required fields
+        validated_abstractions.append(
+            {
+                "name": item["name"],  # Potentially translated name
+                "description": item[
+                    "description"
+                ],  # Potentially translated description
+                "files": item["files"],
+            }
+        )
+    return validated_abstractions
+
+
+def merge_candidate_abstractions(candidates):
+    """Merge candidate abstractions whose names match, combining their files."""
+    merged = {}
+    for candidate in candidates:
+        key = "".join(c for c in candidate["name"].lower() if c.isalnum())
+        if key in merged:
+            merged[key]["files"] = sorted(set(merged[key]["files"]) | set(candidate["files"]))
+        else:
+            merged[key] = dict(candidate)
+    return list(merged.values())
+
+
+class IdentifyAbstractions(MemoizedPlanning, Node):
+    memo_output = "abstractions"
+    memo_inputs = (
+        "summarize_files",
+        "summary_min_tokens",
+        "planning_context",
+        "shard_tokens",
+        "max_context_tokens",
+        "max_symbol_files",
+        "minify_planning",
+    )
+    # Generation limits passed through to call_llm (num_predict includes thinking tokens)
+    stop_sequences = YAML_BLOCK_STOP
+    num_predict = 8192
 
-class IdentifyAbstractions(Node):
     def prep(self, shared):
         files_data = shared["files"]
         project_name = shared["project_name"]  # Get project name
         language = shared.get("language", "english")  # Get language
         use_cache = shared.get("use_cache", True)  # Get use_cache flag, default to True
         max_abstraction_num = shared.get("max_abstraction_num", 10)  # Get max_abstraction_num, default to 10
+        shard_tokens = shared.get("shard_tokens")  # Token budget per shard, None disables sharding
+        max_context_tokens = shared.get("max_context_tokens")  # Token budget for file content, None for no limit
+        self.max_workers = shared.get("llm_workers", 4)
+        check_token_budget(shared, self.__class__.__name__)
+        # Shards are only started while the job's token budget lasts
+        self.token_budget = shared.get("_token_budget")
+
+        # Planning view of every file: its summary when available, otherwise the raw content
+        planning_files = [
+            (idx_path.split(" # ", 1)[1], content)
+            for idx_path, content in get_planning_content_for_indices(
+                shared, range(len(files_data))
+            ).items()
+        ]
+        entries = [(i, path, content) for i, (path, content) in enumerate(planning_files)]
+        total_tokens = sum(estimate_tokens(content) for _, _, content in entries)
+
+        if shard_tokens and total_tokens > shard_tokens:
+            # Map-reduce mode: each shard gets its own prompt with local file indices
+            shards = []
+            for shard_indices in partition_files(planning_files, shard_tokens):
+                shard_entries = []
+                for local_idx, global_idx in enumerate(shard_indices):
+                    path, content = planning_files[global_idx]
+                    if estimate_tokens(content) > shard_tokens:
+                        # A single oversized file gets truncated to fit its shard
+                        content = truncate_to_tokens(content, shard_tokens) + "\n... (truncated)"
+                    shard_entries.append((local_idx, path, content))
+                context, file_listing_for_prompt = create_identify_context(shard_entries)
+                shards.append(
+                    {
+                        "context": context,
+                        "file_listing": file_listing_for_prompt,
+                        "global_indices": shard_indices,
+                    }
+                )
+            # Shard results survive a retry of a failed shard or of the reduce step
+            self.shard_results = {}
+            print(
+                f"Codebase is ~{total_tokens} tokens, splitting it into {len(shards)} shards of up to ~{shard_tokens} tokens."
+            )
+            # Only the paths are needed to describe candidates in the reduce step
+            context, file_listing_for_prompt = None, [path for path, _ in files_data]
+        else:
+            shards = None
+            # Most important files first, so a budget only drops the least useful content
+            ranked_entries = [entries[i] for i in order_by_rank(shared, range(len(entries)))]
+            ranked_entries, omitted = apply_context_budget(ranked_entries, max_context_tokens)
+            if omitted:
+                print(
+                    f"Context budget of ~{max_context_tokens} tokens reached: {omitted} lower-ranked files are listed by path only."
+                )
+            context, file_listing_for_prompt = create_identify_context(ranked_entries)
 
-        # Helper to create context from files, respecting limits (basic example)
-        def create_llm_context(files_data):
-            context = ""
-            file_info = []  # Store tuples of (index, path)
-            for i, (path, content) in enumerate(files_data):
-                entry = f"--- File Index {i}: {path} ---\n{content}\n\n"
-                context += entry
-                file_info.append((i, path))
-
-            return context, file_info  # file_info is list of (index, path)
-
-        context, file_info = create_llm_context(files_data)
-        # Format file info for the prompt (comment is just a hint for LLM)
-        file_listing_for_prompt = "\n".join(
-            [f"- {idx} # {path}" for idx, path in file_info]
-        )
         return (
             context,
             file_listing_for_prompt,
@@ -157,6 +1043,7 @@ class IdentifyAbstractions(Node):
             language,
             use_cache,
             max_abstraction_num,
+            shards,
         )  # Return all parameters
 
     def exec(self, prep_res):
@@ -168,107 +1055,170 @@ class IdentifyAbstractions(Node):
             language,
             use_cache,
             max_abstraction_num,
+            shards,
         ) = prep_res  # Unpack all parameters
+
+        if shards:
+            return self.exec_sharded(prep_res)
+
         print(f"Identifying abstractions using LLM...")
 
-        # Add language instruction and hints only if not English
+        prompt = build_identify_prompt(
+            project_name, context, file_listing_for_prompt, language, max_abstraction_num
+        )
+        response = call_llm(
+            prompt,
+            use_cache=(use_cache and self.cur_retry == 0),  # Use cache only if enabled and not retrying
+            stop=self.stop_sequences,
+            num_predict=self.num_predict,
+            node=self.__class__.__name__,
+        )
+
+        # --- Validation ---
+        validated_abstractions = parse_abstractions_response(response, file_count)
+
+        print(f"Identified {len(validated_abstractions)} abstractions.")
+        return validated_abstractions
+
+    def exec_sharded(self, prep_res):
+        (
+            _,
+            paths,
+            file_count,
+            project_name,
+            language,
+            use_cache,
+            max_abstraction_num,
+            shards,
+        ) = prep_res
+
+        # --- Map: find candidate abstractions in every shard concurrently ---
+        def identify_shard(shard_num):
+            if shard_num in self.shard_results:
+                return self.shard_results[shard_num]
+            if self.token_budget is not None and self.token_budget.exhausted():
+                return None
+            shard = shards[shard_num]
+            scope_note = f"\n(This is part {shard_num + 1} of {len(shards)} of the codebase; file indices below are local to this part.)\n"
+            prompt = build_identify_prompt(
+                project_name,
+                shard["context"],
+                shard["file_listing"],
+                language,
+                max_abstraction_num,
+                scope_note=scope_note,
+            )
+            # A failure propagates to the node's retry, which only re-runs the shards without a result
+            response = call_llm(
+                prompt,
+                use_cache=(use_cache and self.cur_retry == 0),
+                stop=self.stop_sequences,
+                num_predict=self.num_predict,
+                node=self.__class__.__name__,
+            )
+            candidates = parse_abstractions_response(response, len(shard["global_indices"]))
+            # Map shard-local file indices back to global ones
+            for candidate in candidates:
+                candidate["files"] = sorted(
+                    shard["global_indices"][i] for i in candidate["files"]
+                )
+            self.shard_results[shard_num] = candidates
+            return candidates
+
+        print(f"Identifying candidate abstractions in {len(shards)} shards using LLM...")
+        shard_candidates = map_concurrently(
+            identify_shard, range(len(shards)), self.max_workers
+        )
+
+        skipped = sum(1 for candidates in shard_candidates if candidates is None)
+        if skipped:
+            # Plan from the shards read so far; the partial plan is not memoized
+            self.partial_result = True
+            print(f"Token budget exhausted: skipped {skipped} of {len(shards)} shards.")
+
+        # --- Reduce: merge duplicates across shards ---
+        candidates = merge_candidate_abstractions(
+            [candidate for candidates in shard_candidates if candidates for candidate in candidates]
+        )
+        print(f"Found {len(candidates)} candidate abstractions across shards.")
+        if len(candidates) <= max_abstraction_num:
+            return candidates
+        if self.token_budget is not None and self.token_budget.exhausted():
+            # No budget left for the reduce call: keep the candidates in the order found
+            self.partial_result = True
+            print(f"Token budget exhausted: keeping the first {max_abstraction_num} candidates without merging.")
+            return candidates[:max_abstraction_num]
+
+        candidate_listing = "\n".join(
+            f"- {i} # {c['name'].strip()}: {' '.join(c['description'].split())} (files: {', '.join(paths[f] for f in c['files'][:8])})"
+            for i, c in enumerate(candidates)
+        )
         language_instruction = ""
-        name_lang_hint = ""
-        desc_lang_hint = ""
+        lang_hint = ""
         if language.lower() != "english":
             language_instruction = f"IMPORTANT: Generate the `name` and `description` for each abstraction in **{language.capitalize()}** language. Do NOT use English for these fields.\n\n"
-            # Keep specific hints here as name/description are primary targets
-            name_lang_hint = f" (value in {language.capitalize()})"
-            desc_lang_hint = f" (value in {language.capitalize()})"
+            lang_hint = f" (value in {language.capitalize()})"
 
         prompt = f"""
-For the project `{project_name}`:
+For the project `{project_name}`, the codebase was analyzed in {len(shards)} parts. These candidate abstractions were found:
 
-Codebase Context:
-{context}
+{candidate_listing}
 
-{language_instruction}Analyze the codebase context.
-Identify the top 5-{max_abstraction_num} core most important abstractions to help those new to the codebase.
+{language_instruction}Merge candidates that describe the same concept and select the top 5-{max_abstraction_num} core most important abstractions to help those new to the codebase.
 
 For each abstraction, provide:
-1. A concise `name`{name_lang_hint}.
-2. A beginner-friendly `description` explaining what it is with a simple analogy, in around 100 words{desc_lang_hint}.
-3. A list of relevant `file_indices` (integers) using the format `idx # path/comment`.
-
-List of file indices and paths present in the context:
-{file_listing_for_prompt}
+1. A concise `name`{lang_hint}.
+2. A beginner-friendly `description` explaining what it is with a simple analogy, in around 100 words{lang_hint}.
+3. The list of `candidates` (indices) it combines, using the format `idx # name`.
 
 Format the output as a YAML list of dictionaries:
 
 ```yaml
 - name: |
-    Query Processing{name_lang_hint}
+    Query Processing{lang_hint}
   description: |
     Explains what the abstraction does.
-    It's like a central dispatcher routing requests.{desc_lang_hint}
-  file_indices:
-    - 0 # path/to/file1.py
-    - 3 # path/to/related.py
-- name: |
-    Query Optimization{name_lang_hint}
-  description: |
-    Another core concept, similar to a blueprint for objects.{desc_lang_hint}
-  file_indices:
-    - 5 # path/to/another.js
+    It's like a central dispatcher routing requests.{lang_hint}
+  candidates:
+    - 0 # Query Handler
+    - 4 # Request Router
 # ... up to {max_abstraction_num} abstractions
 ```"""
-        response = call_llm(prompt, use_cache=(use_cache and self.cur_retry == 0))  # Use cache only if enabled and not retrying
+        response = call_llm(
+            prompt,
+            use_cache=(use_cache and self.cur_retry == 0),  # Use cache only if enabled and not retrying
+            stop=self.stop_sequences,
+            num_predict=self.num_predict,
+            node=self.__class__.__name__,
+        )
 
         # --- Validation ---
-        yaml_str = response.strip().split("```yaml")[1].split("```")[0].strip()
-        abstractions = yaml.safe_load(yaml_str)
-
-        if not isinstance(abstractions, list):
+        yaml_str = extract_yaml_block(response)
+        merged = yaml.safe_load(yaml_str)
+        if not isinstance(merged, list):
             raise ValueError("LLM Output is not a list")
 
         validated_abstractions = []
-        for item in abstractions:
+        for item in merged:
             if not isinstance(item, dict) or not all(
-                k in item for k in ["name", "description", "file_indices"]
+                k in item for k in ["name", "description", "candidates"]
             ):
                 raise ValueError(f"Missing keys in abstraction item: {item}")
-            if not isinstance(item["name"], str):
-                raise ValueError(f"Name is not a string in item: {item}")
-            if not isinstance(item["description"], str):
-                raise ValueError(f"Description is not a string in item: {item}")
-            if not isinstance(item["file_indices"], list):
-                raise ValueError(f"file_indices is not a list in item: {item}")
-
-            # Validate indices
-            validated_indices = []
-            for idx_entry in item["file_indices"]:
-                try:
-                    if isinstance(idx_entry, int):
-                        idx = idx_entry
-                    elif isinstance(idx_entry, str) and "#" in idx_entry:
-                        idx = int(idx_entry.split("#")[0].strip())
-                    else:
-                        idx = int(str(idx_entry).strip())
-
-                    if not (0 <= idx < file_count):
-                        raise ValueError(
-                            f"Invalid file index {idx} found in item {item['name']}. Max index is {file_count - 1}."
-                        )
-                    validated_indices.append(idx)
-                except (ValueError, TypeError):
-                    raise ValueError(
-                        f"Could not parse index from entry: {idx_entry} in item {item['name']}"
-                    )
-
-            item["files"] = sorted(list(set(validated_indices)))
-            # Store only the required fields
+            if not isinstance(item["name"], str) or not isinstance(item["description"], str):
+                raise ValueError(f"Name or description is not a string in item: {item}")
+            if not isinstance(item["candidates"], list):
+                raise ValueError(f"candidates is not a list in item: {item}")
+            candidate_indices = parse_index_list(
+                item["candidates"], len(candidates), item["name"]
+            )
+            files = set()
+            for idx in candidate_indices:
+                files.update(candidates[idx]["files"])
             validated_abstractions.append(
                 {
-                    "name": item["name"],  # Potentially translated name
-                    "description": item[
-                        "description"
-                    ],  # Potentially translated description
-                    "files": item["files"],
+                    "name": item["name"],
+                    "description": item["description"],
+                    "files": sorted(files),
                 }
             )
 
@@ -276,12 +1226,92 @@ Format the output as a YAML list of dictionaries:
         return validated_abstractions
 
     def post(self, shared, prep_res, exec_res):
+        # The LLM often lists where a class is used but not where it is defined
+        added = add_defining_files(shared, exec_res, shared.get("max_symbol_files", 3))
+        if added:
+            print(f"Added {added} defining files to the abstractions from the symbol index.")
         shared["abstractions"] = (
             exec_res  # List of {"name": str, "description": str, "files": [int]}
         )
 
 
-class AnalyzeRelationships(Node):
+# Helper to parse and validate the relationships YAML (summary plus index-based relationships)
+def parse_relationships_response(response, num_abstractions):
+    yaml_str = extract_yaml_block(response)
+    return validate_relationships(yaml.safe_load(yaml_str), num_abstractions)
+
+
+# Helper to validate parsed relationships data ({"summary", "relationships"})
+def validate_relationships(relationships_data, num_abstractions):
+    if not isinstance(relationships_data, dict) or not all(
+        k in relationships_data for k in ["summary", "relationships"]
+    ):
+        raise ValueError(
+            "LLM output is not a dict or missing keys ('summary', 'relationships')"
+        )
+    if not isinstance(relationships_data["summary"], str):
+        raise ValueError("summary is not a string")
+    if not isinstance(relationships_data["relationships"], list):
+        raise ValueError("relationships is not a list")
+
+    # Validate relationships structure
+    validated_relationships = []
+    for rel in relationships_data["relationships"]:
+        # Check for 'label' key
+        if not isinstance(rel, dict) or not all(
+            k in rel for k in ["from_abstraction", "to_abstraction", "label"]
+        ):
+            raise ValueError(
+                f"Missing keys (expected from_abstraction, to_abstraction, label) in relationship item: {rel}"
+            )
+        # Validate 'label' is a string
+        if not isinstance(rel["label"], str):
+            raise ValueError(f"Relationship label is not a string: {rel}")
+
+        # Validate indices
+        try:
+            from_idx = int(str(rel["from_abstraction"]).split("#")[0].strip())
+            to_idx = int(str(rel["to_abstraction"]).split("#")[0].strip())
+            if not (
+                0 <= from_idx < num_abstractions and 0 <= to_idx < num_abstractions
+            ):
+                raise ValueError(
+                    f"Invalid index in relationship: from={from_idx}, to={to_idx}. Max index is {num_abstractions-1}."
+                )
+            validated_relationships.append(
+                {
+                    "from": from_idx,
+                    "to": to_idx,
+                    "label": rel["label"],  # Potentially translated label
+                }
+            )
+        except (ValueError, TypeError):
+            raise ValueError(f"Could not parse indices from relationship: {rel}")
+
+    return {
+        "summary": relationships_data["summary"],  # Potentially translated summary
+        "details": validated_relationships,  # Store validated, index-based relationships with potentially translated labels
+    }
+
+
+class AnalyzeRelationships(MemoizedPlanning, Node):
+    memo_output = "relationships"
+    memo_inputs = (
+        "abstractions",
+        "summarize_files",
+        "summary_min_tokens",
+        "planning_context",
+        "max_context_tokens",
+        "relationships_mode",
+        "retrieval",
+        "minify_planning",
+    )
+    # Chunks retrieved per abstraction when a retrieval index is used
+    retrieval_top_k = 3
+    # Generation limits passed through to call_llm (num_predict includes thinking tokens)
+    stop_sequences = YAML_BLOCK_STOP
+    num_predict = 6144
+
     def prep(self, shared):
         abstractions = shared[
             "abstractions"
@@ -290,10 +1320,25 @@ class AnalyzeRelationships(Node):
         project_name = shared["project_name"]  # Get project name
         language = shared.get("language", "english")  # Get language
         use_cache = shared.get("use_cache", True)  # Get use_cache flag, default to True
+        # "llm": infer relationships from code, "hints": also show the static import edges,
+        # "static": use the static edges as they are and only ask for the summary and labels
+        mode = shared.get("relationships_mode", "llm")
+        check_token_budget(shared, self.__class__.__name__)
 
         # Get the actual number of abstractions directly
         num_abstractions = len(abstractions)
 
+        static_edges = []
+        if mode in ("hints", "static"):
+            import_graph = shared.get("import_graph") or build_import_graph(files_data)
+            static_edges = abstraction_edges(
+                abstractions, import_graph, max_edges=3 * num_abstractions
+            )
+            print(f"Found {len(static_edges)} static dependencies between abstractions.")
+            if mode == "static" and not static_edges:
+                print("No static dependencies found, falling back to LLM relationship analysis.")
+                mode = "llm"
+
         # Create context with abstraction names, indices, descriptions, and relevant file snippets
         context = "Identified Abstractions:\\n"
         all_relevant_indices = set()
@@ -309,11 +1354,64 @@ class AnalyzeRelationships(Node):
             )  # Use potentially translated name here too
             all_relevant_indices.update(abstr["files"])
 
+        if static_edges:
+            edge_lines = []
+            for edge in static_edges:
+                source_file, target_file = edge["example"]
+                edge_lines.append(
+                    f"- {abstraction_info_for_prompt[edge['from']]} -> {abstraction_info_for_prompt[edge['to']]}"
+                    f" ({edge['weight']} import(s), e.g. `{files_data[source_file][0]}` imports `{files_data[target_file][0]}`)"
+                )
+            static_edges_text = "\n".join(edge_lines)
+        else:
+            static_edges_text = ""
+
+        if mode == "static":
+            # The edges are already known, so the code itself is not needed
+            return (
+                context.replace("\\n", "\n"),
+                "\n".join(abstraction_info_for_prompt),
+                num_abstractions,
+                project_name,
+                language,
+                use_cache,
+                mode,
+                static_edges,
+                static_edges_text,
+            )
+
         context += "\\nRelevant File Snippets (Referenced by Index and Path):\\n"
-        # Get content for relevant files using helper
-        relevant_files_content_map = get_content_for_indices(
-            files_data, sorted(list(all_relevant_indices))
+        retrieval = shared.get("retrieval", "files")
+        relevant_files_content_map = None
+        if retrieval != "files":
+            # The chunks that best match each abstraction instead of its whole files
+            max_context_tokens = shared.get("max_context_tokens")
+            retrieved = retrieve_chapter_context(
+                shared,
+                list(range(num_abstractions)),
+                retrieval,
+                top_k=self.retrieval_top_k,
+                max_tokens=max_context_tokens // max(num_abstractions, 1) if max_context_tokens else None,
+            )
+            if retrieved is not None:
+                relevant_files_content_map = {}
+                for content_map in retrieved.values():
+                    relevant_files_content_map.update(content_map)
+        if relevant_files_content_map is None:
+            # Get content for relevant files using helper
+            relevant_files_content_map = get_planning_content_for_indices(
+                shared, order_by_rank(shared, all_relevant_indices)
+            )
+        budgeted_entries, _ = apply_context_budget(
+            [
+                (idx_path, None, content)
+                for idx_path, content in relevant_files_content_map.items()
+            ],
+            shared.get("max_context_tokens"),
         )
+        relevant_files_content_map = {
+            idx_path: content for idx_path, _, content in budgeted_entries
+        }
         # Format file content for context
         file_context_str = "\\n\\n".join(
             f"--- File: {idx_path} ---\\n{content}"
@@ -328,6 +1426,9 @@ class AnalyzeRelationships(Node):
             project_name,
             language,
             use_cache,
+            mode,
+            static_edges,
+            static_edges_text,
         )  # Return use_cache
 
     def exec(self, prep_res):
@@ -338,7 +1439,12 @@ class AnalyzeRelationships(Node):
             project_name,
             language,
             use_cache,
+            mode,
+            _,
+            static_edges_text,
          ) = prep_res  # Unpack use_cache
+        if mode == "static":
+            return self.exec_static(prep_res)
         print(f"Analyzing relationships using LLM...")
 
         # Add language instruction and hints only if not English
@@ -350,6 +1456,14 @@ class AnalyzeRelationships(Node):
             lang_hint = f" (in {language.capitalize()})"
             list_lang_note = f" (Names might be in {language.capitalize()})"  # Note for the input list
 
+        hints_section = ""
+        if static_edges_text:
+            hints_section = f"""
+Static dependency hints (computed from imports between the abstractions' files, source depends on target).
+Use them as evidence; drop unimportant ones and add interactions they miss:
+{static_edges_text}
+"""
+
         prompt = f"""
 Based on the following abstractions and relevant code snippets from the project `{project_name}`:
 
@@ -358,7 +1472,7 @@ List of Abstraction Indices and Names{list_lang_note}:
 
 Context (Abstractions, Descriptions, Code):
 {context}
-
+{hints_section}
 {language_instruction}Please provide:
 1. A high-level `summary` of the project's main purpose and functionality in a few beginner-friendly sentences{lang_hint}. Use markdown formatting with **bold** and *italic* text to highlight important concepts.
 2. A list (`relationships`) describing the key interactions between these abstractions. For each relationship, specify:
@@ -388,61 +1502,114 @@ relationships:
 
 Now, provide the YAML output:
 """
-        response = call_llm(prompt, use_cache=(use_cache and self.cur_retry == 0)) # Use cache only if enabled and not retrying
+        response = call_llm(
+            prompt,
+            use_cache=(use_cache and self.cur_retry == 0),  # Use cache only if enabled and not retrying
+            stop=self.stop_sequences,
+            num_predict=self.num_predict,
+            node=self.__class__.__name__,
+        )
 
         # --- Validation ---
-        yaml_str = response.strip().split("```yaml")[1].split("```")[0].strip()
-        relationships_data = yaml.safe_load(yaml_str)
+        relationships = parse_relationships_response(response, num_abstractions)
 
-        if not isinstance(relationships_data, dict) or not all(
-            k in relationships_data for k in ["summary", "relationships"]
-        ):
-            raise ValueError(
-                "LLM output is not a dict or missing keys ('summary', 'relationships')"
-            )
-        if not isinstance(relationships_data["summary"], str):
-            raise ValueError("summary is not a string")
-        if not isinstance(relationships_data["relationships"], list):
-            raise ValueError("relationships is not a list")
-
-        # Validate relationships structure
-        validated_relationships = []
-        for rel in relationships_data["relationships"]:
-            # Check for 'label' key
-            if not isinstance(rel, dict) or not all(
-                k in rel for k in ["from_abstraction", "to_abstraction", "label"]
-            ):
-                raise ValueError(
-                    f"Missing keys (expected from_abstraction, to_abstraction, label) in relationship item: {rel}"
-                )
-            # Validate 'label' is a string
-            if not isinstance(rel["label"], str):
-                raise ValueError(f"Relationship label is not a string: {rel}")
+        print("Generated project summary and relationship details.")
+        return relationships
 
-            # Validate indices
-            try:
-                from_idx = int(str(rel["from_abstraction"]).split("#")[0].strip())
-                to_idx = int(str(rel["to_abstraction"]).split("#")[0].strip())
-                if not (
-                    0 <= from_idx < num_abstractions and 0 <= to_idx < num_abstractions
-                ):
-                    raise ValueError(
-                        f"Invalid index in relationship: from={from_idx}, to={to_idx}. Max index is {num_abstractions-1}."
-                    )
-                validated_relationships.append(
-                    {
-                        "from": from_idx,
-                        "to": to_idx,
-                        "label": rel["label"],  # Potentially translated label
-                    }
-                )
-            except (ValueError, TypeError):
-                raise ValueError(f"Could not parse indices from relationship: {rel}")
+    def exec_static(self, prep_res):
+        (
+            context,
+            abstraction_listing,
+            num_abstractions,
+            project_name,
+            language,
+            use_cache,
+            _,
+            static_edges,
+            static_edges_text,
+        ) = prep_res
+        print(f"Labeling {len(static_edges)} static relationships using LLM...")
 
-        print("Generated project summary and relationship details.")
+        language_instruction = ""
+        lang_hint = ""
+        if language.lower() != "english":
+            language_instruction = f"IMPORTANT: Generate the `summary` and `label` fields in **{language.capitalize()}** language. Do NOT use English for these fields.\n\n"
+            lang_hint = f" (in {language.capitalize()})"
+
+        edge_listing = "\n".join(
+            f"- Edge {i}: {line[2:]}" for i, line in enumerate(static_edges_text.splitlines())
+        )
+        prompt = f"""
+Based on the following abstractions from the project `{project_name}`:
+
+{context}
+
+The dependencies between them were computed from the code (source depends on target):
+{edge_listing}
+
+{language_instruction}Please provide:
+1. A high-level `summary` of the project's main purpose and functionality in a few beginner-friendly sentences{lang_hint}. Use markdown formatting with **bold** and *italic* text to highlight important concepts.
+2. For EVERY edge above, a brief `label` for the interaction **in just a few words**{lang_hint} (e.g., "Manages", "Inherits", "Uses").
+
+Format the output as YAML:
+
+```yaml
+summary: |
+  A brief, simple explanation of the project{lang_hint}.
+  Can span multiple lines with **bold** and *italic* for emphasis.
+labels:
+  - edge: 0
+    label: "Manages"{lang_hint}
+  - edge: 1
+    label: "Provides config"{lang_hint}
+  # ... one entry per edge
+```
+
+Now, provide the YAML output:
+"""
+        response = call_llm(
+            prompt,
+            use_cache=(use_cache and self.cur_retry == 0),  # Use cache only if enabled and not retrying
+            stop=self.stop_sequences,
+            num_predict=self.num_predict,
+            node=self.__class__.__name__,
+        )
+
+        # --- Validation ---
+        yaml_str = extract_yaml_block(response)
+        labels_data = yaml.safe_load(yaml_str)
+        if not isinstance(labels_data, dict) or not isinstance(labels_data.get("summary"), str):
+            raise ValueError("LLM output is not a dict or missing 'summary'")
+        labels = labels_data.get("labels") or []
+        if not isinstance(labels, list):
+            raise ValueError("labels is not a list")
+
+        edge_labels = {}
+        for entry in labels:
+            if not isinstance(entry, dict) or "edge" not in entry or not isinstance(entry.get("label"), str):
+                raise ValueError(f"Missing keys (expected edge, label) in label item: {entry}")
+            try:
+                edge_index = int(str(entry["edge"]).split("#")[0].strip())
+            except ValueError:
+                raise ValueError(f"Could not parse edge index from label item: {entry}")
+            if 0 <= edge_index < len(static_edges):
+                edge_labels[edge_index] = entry["label"]
+        missing = [i for i in range(len(static_edges)) if i not in edge_labels]
+        if len(missing) > len(static_edges) // 2:
+            raise ValueError(f"Labels missing for edges: {missing}")
+
+        print("Generated project summary and relationship labels.")
         return {
-            "summary": relationships_data["summary"],  # Potentially translated summary
-            "details": validated_relationships,  # Store validated, index-based relationships with potentially translated labels
+            "summary": labels_data["summary"],
+            "details": [
+                {
+                    "from": edge["from"],
+                    "to": edge["to"],
+                    # The edge itself is known; a label the LLM skipped defaults to a neutral one
+                    "label": edge_labels.get(i, "Uses"),
+                }
+                for i, edge in enumerate(static_edges)
+            ],
         }
 
     def post(self, shared, prep_res, exec_res):
@@ -451,13 +1618,71 @@ Now, provide the YAML output:
         shared["relationships"] = exec_res
 
 
-class OrderChapters(Node):
+# Helper to parse and validate an ordered YAML list of abstraction indices (`idx # Name`)
+def parse_chapter_order_response(response, num_abstractions):
+    yaml_str = extract_yaml_block(response)
+    return validate_chapter_order(yaml.safe_load(yaml_str), num_abstractions)
+
+
+# Helper to validate a parsed ordered list covering every abstraction exactly once
+def validate_chapter_order(ordered_indices_raw, num_abstractions):
+    if not isinstance(ordered_indices_raw, list):
+        raise ValueError("LLM output is not a list")
+
+    ordered_indices = []
+    seen_indices = set()
+    for entry in ordered_indices_raw:
+        try:
+            if isinstance(entry, int):
+                idx = entry
+            elif isinstance(entry, str) and "#" in entry:
+                idx = int(entry.split("#")[0].strip())
+            else:
+                idx = int(str(entry).strip())
+
+            if not (0 <= idx < num_abstractions):
+                raise ValueError(
+                    f"Invalid index {idx} in ordered list. Max index is {num_abstractions-1}."
+                )
+            if idx in seen_indices:
+                raise ValueError(f"Duplicate index {idx} found in ordered list.")
+            ordered_indices.append(idx)
+            seen_indices.add(idx)
+
+        except (ValueError, TypeError):
+            raise ValueError(
+                f"Could not parse index from ordered list entry: {entry}"
+            )
+
+    # Check if all abstractions are included
+    if len(ordered_indices) != num_abstractions:
+        raise ValueError(
+            f"Ordered list length ({len(ordered_indices)}) does not match number of abstractions ({num_abstractions}). Missing indices: {set(range(num_abstractions)) - seen_indices}"
+        )
+
+    return ordered_indices
+
+
+class OrderChapters(MemoizedPlanning, Node):
+    memo_output = "chapter_order"
+    memo_inputs = ("abstractions", "relationships", "order_strategy")
+    # Generation limits passed through to call_llm (num_predict includes thinking tokens)
+    stop_sequences = YAML_BLOCK_STOP
+    num_predict = 4096
+
     def prep(self, shared):
         abstractions = shared["abstractions"]  # Name/description might be translated
         relationships = shared["relationships"]  # Summary/label might be translated
         project_name = shared["project_name"]  # Get project name
         language = shared.get("language", "english")  # Get language
         use_cache = shared.get("use_cache", True)  # Get use_cache flag, default to True
+        # "llm": ask the LLM, "graph": topological sort of the relationships,
+        # "hybrid": topological sort with the LLM only ordering the ties
+        order_strategy = shared.get("order_strategy", "llm")
+        if order_strategy == "llm":
+            check_token_budget(shared, self.__class__.__name__)
+        # The hybrid tie-break is optional: without budget the relationship order is used as is
+        self.token_budget = shared.get("_token_budget")
 
         # Prepare context for the LLM
         abstraction_info_for_prompt = []
@@ -493,6 +1718,9 @@ class OrderChapters(Node):
             project_name,
             list_lang_note,
             use_cache,
+            order_strategy,
+            relationships["details"],
+            [a["name"] for a in abstractions],
         )  # Return use_cache
 
     def exec(self, prep_res):
@@ -503,8 +1731,60 @@ class OrderChapters(Node):
             project_name,
             list_lang_note,
             use_cache,
+            order_strategy,
+            relationship_details,
+            abstraction_names,
         ) = prep_res  # Unpack use_cache
+
+        if order_strategy in ("graph", "hybrid"):
+            graph_order, tie_groups = order_by_dependencies(num_abstractions, relationship_details)
+            ties = [group for group in tie_groups if len(group) > 1]
+            if order_strategy == "graph" or not ties:
+                print(f"Determined chapter order from relationships (indices): {graph_order}")
+                return graph_order
+            if self.token_budget is not None and self.token_budget.exhausted():
+                # Not memoized, so a run with budget left still gets the tie-break
+                self.partial_result = True
+                print(f"Token budget exhausted, using the relationship order without a tie-break: {graph_order}")
+                return graph_order
+
+            print(f"Breaking {len(ties)} ties in the relationship order using LLM...")
+            group_lines = []
+            for group_num, group in enumerate(tie_groups, start=1):
+                members = ", ".join(f"{i} # {abstraction_names[i]}" for i in group)
+                group_lines.append(f"- Group {group_num}: {members}")
+            tie_note = (
+                "\nThe relationships already fix the order of the following groups. "
+                "Keep the groups in this order and only decide the order inside each group:\n"
+                + "\n".join(group_lines)
+                + "\n"
+            )
+            try:
+                llm_order = self.order_with_llm(prep_res, tie_note)
+            except (ValueError, IndexError, yaml.YAMLError) as e:
+                # The graph order is already valid, so a bad answer is not worth a retry
+                print(f"Could not use the LLM tie-break ({e}), using the relationship order.")
+                return graph_order
+            group_of = {i: group_num for group_num, group in enumerate(tie_groups) for i in group}
+            ordered_indices = sorted(llm_order, key=lambda i: group_of[i])
+            print(f"Determined chapter order (indices): {ordered_indices}")
+            return ordered_indices
+
         print("Determining chapter order using LLM...")
+        ordered_indices = self.order_with_llm(prep_res)
+        print(f"Determined chapter order (indices): {ordered_indices}")
+        return ordered_indices  # Return the list of indices
+
+    def order_with_llm(self, prep_res, tie_note=""):
+        (
+            abstraction_listing,
+            context,
+            num_abstractions,
+            project_name,
+            list_lang_note,
+            use_cache,
+            *_,
+        ) = prep_res
         # No language variation needed here in prompt instructions, just ordering based on structure
         # The input names might be translated, hence the note.
         prompt = f"""
@@ -515,7 +1795,7 @@ Abstractions (Index # Name){list_lang_note}:
 
 Context about relationships and project summary:
 {context}
-
+{tie_note}
 If you are going to make a tutorial for ```` {project_name} ````, what is the best order to explain these abstractions, from first to last?
 Ideally, first explain those that are the most important or foundational, perhaps user-facing concepts or entry points. Then move to more detailed, lower-level implementation details or supporting concepts.
 
@@ -530,55 +1810,223 @@ Output the ordered list of abstraction indices, including the name in a comment
 
 Now, provide the YAML output:
 """
-        response = call_llm(prompt, use_cache=(use_cache and self.cur_retry == 0)) # Use cache only if enabled and not retrying
+        response = call_llm(
+            prompt,
+            use_cache=(use_cache and self.cur_retry == 0),  # Use cache only if enabled and not retrying
+            stop=self.stop_sequences,
+            num_predict=self.num_predict,
+            node=self.__class__.__name__,
+        )
 
         # --- Validation ---
-        yaml_str = response.strip().split("```yaml")[1].split("```")[0].strip()
-        ordered_indices_raw = yaml.safe_load(yaml_str)
+        return parse_chapter_order_response(response, num_abstractions)
 
-        if not isinstance(ordered_indices_raw, list):
-            raise ValueError("LLM output is not a list")
+    def post(self, shared, prep_res, exec_res):
+        # exec_res is already the list of ordered indices
+        shared["chapter_order"] = exec_res  # List of indices
 
-        ordered_indices = []
-        seen_indices = set()
-        for entry in ordered_indices_raw:
-            try:
-                if isinstance(entry, int):
-                    idx = entry
-                elif isinstance(entry, str) and "#" in entry:
-                    idx = int(entry.split("#")[0].strip())
-                else:
-                    idx = int(str(entry).strip())
 
-                if not (0 <= idx < num_abstractions):
-                    raise ValueError(
-                        f"Invalid index {idx} in ordered list. Max index is {num_abstractions-1}."
-                    )
-                if idx in seen_indices:
-                    raise ValueError(f"Duplicate index {idx} found in ordered list.")
-                ordered_indices.append(idx)
-                seen_indices.add(idx)
+class FusedPlanner(MemoizedPlanning, Node):
+    """
+    Plans the tutorial in one LLM call instead of three (shared["planner"] = "fused").
+
+    IdentifyAbstractions, AnalyzeRelationships and OrderChapters each send the
+    model overlapping context, the first two with file content. This node sends
+    the file context once and asks for the abstractions, the project summary,
+    the relationships and the chapter order in a single YAML answer. Each part
+    goes through the same validation as in the staged nodes and lands in the same
+    shared keys; the node then returns "fused" so the flow goes straight to
+    WriteChapters. Skipped with the default staged planner.
+    """
+
+    memo_output = ("abstractions", "relationships", "chapter_order")
+    memo_inputs = (
+        "summarize_files",
+        "summary_min_tokens",
+        "planning_context",
+        "max_context_tokens",
+        "max_symbol_files",
+        "minify_planning",
+    )
+    # The answer holds the three planning results, so it gets the largest limit of the three
+    stop_sequences = YAML_BLOCK_STOP
+    num_predict = 12288
+
+    def _run(self, shared):
+        if shared.get("planner", "staged") != "fused":
+            return None  # Staged planning: continue with IdentifyAbstractions
+        return super()._run(shared)
 
-            except (ValueError, TypeError):
-                raise ValueError(
-                    f"Could not parse index from ordered list entry: {entry}"
-                )
+    def prep(self, shared):
+        check_token_budget(shared, self.__class__.__name__)
+        files_data = shared["files"]
+        max_context_tokens = shared.get("max_context_tokens")
+        # Same file context as IdentifyAbstractions without sharding: ranked, within the budget
+        entries = [
+            (i, idx_path.split(" # ", 1)[1], content)
+            for i, (idx_path, content) in enumerate(
+                get_planning_content_for_indices(shared, range(len(files_data))).items()
+            )
+        ]
+        entries = [entries[i] for i in order_by_rank(shared, range(len(entries)))]
+        entries, omitted = apply_context_budget(entries, max_context_tokens)
+        if omitted:
+            print(
+                f"Context budget of ~{max_context_tokens} tokens reached: {omitted} lower-ranked files are listed by path only."
+            )
+        context, file_listing_for_prompt = create_identify_context(entries)
+        return (
+            context,
+            file_listing_for_prompt,
+            len(files_data),
+            shared["project_name"],
+            shared.get("language", "english"),
+            shared.get("use_cache", True),
+            shared.get("max_abstraction_num", 10),
+        )
+
+    def exec(self, prep_res):
+        (
+            context,
+            file_listing_for_prompt,
+            file_count,
+            project_name,
+            language,
+            use_cache,
+            max_abstraction_num,
+        ) = prep_res
+        print("Planning abstractions, relationships and chapter order in one LLM call...")
+
+        language_instruction = ""
+        lang_hint = ""
+        if language.lower() != "english":
+            language_instruction = f"IMPORTANT: Generate the `summary`, and the `name`, `description` and `label` fields in **{language.capitalize()}** language. Do NOT use English for these fields.\n\n"
+            lang_hint = f" (value in {language.capitalize()})"
+
+        prompt = f"""
+For the project `{project_name}`:
+
+Codebase Context:
+{context}
+
+{language_instruction}Analyze the codebase context and plan a tutorial for those new to the codebase. Provide:
+1. `summary`: A high-level summary of the project's main purpose and functionality in a few beginner-friendly sentences{lang_hint}. Use markdown formatting with **bold** and *italic* text to highlight important concepts.
+2. `abstractions`: The top 5-{max_abstraction_num} core most important abstractions. For each, a concise `name`{lang_hint}, a beginner-friendly `description` explaining what it is with a simple analogy, in around 100 words{lang_hint}, and the relevant `file_indices` using the format `idx # path/comment`.
+3. `relationships`: The key interactions between these abstractions, referring to them by their position in the `abstractions` list (starting at 0). For each, `from_abstraction`, `to_abstraction` and a `label` **in just a few words**{lang_hint} (e.g., "Manages", "Inherits", "Uses"). Ideally backed by one abstraction calling or passing parameters to another. Make sure EVERY abstraction is involved in at least ONE relationship.
+4. `chapter_order`: The best order to explain the abstractions, listing every abstraction index exactly once. First explain those that are the most important or foundational, perhaps user-facing concepts or entry points, then lower-level implementation details or supporting concepts.
+
+List of file indices and paths present in the context:
+{file_listing_for_prompt}
+
+Format the output as YAML:
+
+```yaml
+summary: |
+  A brief, simple explanation of the project{lang_hint}.
+abstractions:
+  - name: |
+      Query Processing{lang_hint}
+    description: |
+      Explains what the abstraction does.
+      It's like a central dispatcher routing requests.{lang_hint}
+    file_indices:
+      - 0 # path/to/file1.py
+      - 3 # path/to/related.py
+  - name: |
+      Query Optimization{lang_hint}
+    description: |
+      Another core concept, similar to a blueprint for objects.{lang_hint}
+    file_indices:
+      - 5 # path/to/another.js
+relationships:
+  - from_abstraction: 0 # Query Processing
+    to_abstraction: 1 # Query Optimization
+    label: "Optimizes with"{lang_hint}
+chapter_order:
+  - 0 # Query Processing
+  - 1 # Query Optimization
+```"""
+        response = call_llm(
+            prompt,
+            use_cache=(use_cache and self.cur_retry == 0),  # Use cache only if enabled and not retrying
+            stop=self.stop_sequences,
+            num_predict=self.num_predict,
+            node=self.__class__.__name__,
+        )
 
-        # Check if all abstractions are included
-        if len(ordered_indices) != num_abstractions:
+        # --- Validation (shared with the staged planner) ---
+        yaml_str = extract_yaml_block(response)
+        plan = yaml.safe_load(yaml_str)
+        if not isinstance(plan, dict) or not all(
+            k in plan for k in ["summary", "abstractions", "relationships", "chapter_order"]
+        ):
             raise ValueError(
-                f"Ordered list length ({len(ordered_indices)}) does not match number of abstractions ({num_abstractions}). Missing indices: {set(range(num_abstractions)) - seen_indices}"
+                "LLM output is not a dict or missing keys ('summary', 'abstractions', 'relationships', 'chapter_order')"
             )
+        abstractions = validate_abstractions(plan["abstractions"], file_count)
+        relationships = validate_relationships(plan, len(abstractions))
+        chapter_order = validate_chapter_order(plan["chapter_order"], len(abstractions))
 
-        print(f"Determined chapter order (indices): {ordered_indices}")
-        return ordered_indices  # Return the list of indices
+        print(
+            f"Planned {len(abstractions)} abstractions and {len(relationships['details'])} relationships. "
+            f"Chapter order (indices): {chapter_order}"
+        )
+        return abstractions, relationships, chapter_order
 
     def post(self, shared, prep_res, exec_res):
-        # exec_res is already the list of ordered indices
-        shared["chapter_order"] = exec_res  # List of indices
+        abstractions, relationships, chapter_order = exec_res
+        # Same completion of the file lists as after IdentifyAbstractions
+        added = add_defining_files(shared, abstractions, shared.get("max_symbol_files", 3))
+        if added:
+            print(f"Added {added} defining files to the abstractions from the symbol index.")
+        shared["abstractions"] = abstractions
+        shared["relationships"] = relationships
+        shared["chapter_order"] = chapter_order
+        return "fused"
+
+
+# Helper to parse and validate a chapter outline: introduction, sections and conclusion
+def parse_section_outline(response, max_sections):
+    yaml_str = extract_yaml_block(response)
+    outline = yaml.safe_load(yaml_str)
+    if not isinstance(outline, dict) or not all(
+        k in outline for k in ["introduction", "sections", "conclusion"]
+    ):
+        raise ValueError(
+            "LLM output is not a dict or missing keys ('introduction', 'sections', 'conclusion')"
+        )
+    if not isinstance(outline["introduction"], str) or not isinstance(outline["conclusion"], str):
+        raise ValueError("introduction or conclusion is not a string")
+    sections = outline["sections"]
+    if not isinstance(sections, list) or not 1 <= len(sections) <= max_sections:
+        raise ValueError(f"sections is not a list of 1 to {max_sections} items")
+    validated_sections = []
+    for section in sections:
+        if not isinstance(section, dict) or not isinstance(section.get("title"), str) or not isinstance(section.get("covers"), str):
+            raise ValueError(f"Missing keys (expected title, covers) in section item: {section}")
+        validated_sections.append(
+            {"title": " ".join(section["title"].split()), "covers": section["covers"].strip()}
+        )
+    return {
+        "introduction": outline["introduction"].strip(),
+        "sections": validated_sections,
+        "conclusion": outline["conclusion"].strip(),
+    }
 
 
 class WriteChapters(BatchNode):
+    # Chapters are free-form Markdown full of code fences, so no stop sequences.
+    # The per-chapter length budget can be overridden with shared["chapter_max_tokens"].
+    stop_sequences = None
+    num_predict = 8192
+    # Bump when the chapter prompt changes so stale chapter cache entries are not reused
+    prompt_version = "1"
+    # Section mode (shared["chapter_generation"] = "sections"): a short outline, then
+    # at most max_sections sections written concurrently, each with a share of the chapter budget
+    outline_num_predict = 4096
+    max_sections = 6
+    min_section_tokens = 1024
+
     def prep(self, shared):
         chapter_order = shared["chapter_order"]  # List of indices
         abstractions = shared[
@@ -588,6 +2036,11 @@ class WriteChapters(BatchNode):
         project_name = shared["project_name"]
         language = shared.get("language", "english")
         use_cache = shared.get("use_cache", True)  # Get use_cache flag, default to True
+        max_tokens = shared.get("chapter_max_tokens") or self.num_predict
+        # In parallel mode chapters are written concurrently, so each one gets its
+        # cross-chapter context from the plan instead of the text of earlier chapters
+        parallel = shared.get("parallel_chapters", False)
+        self.max_workers = shared.get("llm_workers", 4) if parallel else 1
 
         # Get already written chapters to provide context
         # We store them temporarily during the batch run, not in shared memory yet
@@ -595,6 +2048,53 @@ class WriteChapters(BatchNode):
         self.chapters_written_so_far = (
             []
         )  # Use instance variable for temporary storage across exec calls
+        # Compact digests of the chapters written so far, used to build a bounded
+        # rolling context instead of pasting every previous chapter in full
+        self.chapter_digests = []
+        # (prompt tokens, prompt tokens with full previous chapters) per chapter
+        self.prompt_token_stats = []
+        # "single": one generation per chapter; "sections": outline, then sections concurrently.
+        # Parallel chapters already use the workers, so their sections are written one by one
+        generation = shared.get("chapter_generation", "single")
+        self.section_workers = 1 if parallel else shared.get("llm_workers", 4)
+        # Chapters are only started while the job's token budget lasts (see PlanTokenBudget)
+        self.token_budget = shared.get("_token_budget")
+        self.skipped_chapters = []
+        chapter_context = shared.get("chapter_context", "digest")
+        previous_context_tokens = shared.get("previous_context_tokens", 1500)
+        # Budget for the source files of one chapter; oversized files are shortened to fit
+        chapter_context_tokens = shared.get("chapter_context_tokens", DEFAULT_CHAPTER_CONTEXT_TOKENS)
+        large_file_mode = shared.get("large_file_mode", "excerpt")
+        shortened_files = 0
+        # Source files as chapter prompts show them (shared["minify_chapters"])
+        chapter_files = get_stage_files(shared, "chapters")
+        minify = shared.get("minify_chapters", "none")
+        # "files": the abstraction's files; otherwise chunks retrieved from the whole codebase
+        retrieval = shared.get("retrieval", "files")
+        retrieved = None
+        if retrieval != "files":
+            retrieved = retrieve_chapter_context(
+                shared,
+                [i for i in chapter_order if 0 <= i < len(abstractions)],
+                retrieval,
+                shared.get("retrieval_top_k", 12),
+                chapter_context_tokens,
+            )
+
+        # Chapters are checkpointed one by one (aligned with chapter_order, None until written),
+        # so a resumed or incremental run only writes the chapters that are still missing
+        checkpoint = shared.get("_checkpoint")
+        chapters_in_progress = shared.get("chapters_in_progress")
+        if not isinstance(chapters_in_progress, list) or len(chapters_in_progress) != len(chapter_order):
+            chapters_in_progress = [None] * len(chapter_order)
+        shared["chapters_in_progress"] = chapters_in_progress
+        self.chapters_in_progress = chapters_in_progress
+        # Incremental runs may update slightly changed chapters from a diff (see ReusePreviousPlan)
+        chapter_patches = shared.get("chapter_patches")
+        if not isinstance(chapter_patches, list) or len(chapter_patches) != len(chapter_order):
+            chapter_patches = [None] * len(chapter_order)
+        # Only the chapters are saved after each one; the rest of shared is saved after the node
+        self.save_progress = (lambda: checkpoint.save_progress(shared)) if checkpoint else None
 
         # Create a complete list of all chapters
         all_chapters = []
@@ -630,10 +2130,23 @@ class WriteChapters(BatchNode):
                 ]  # Contains potentially translated name/desc
                 # Use 'files' (list of indices) directly
                 related_file_indices = abstraction_details.get("files", [])
-                # Get content using helper, passing indices
-                related_files_content_map = get_content_for_indices(
-                    files_data, related_file_indices
-                )
+                if retrieved is not None:
+                    # Chunks retrieved from the whole codebase for this abstraction
+                    related_files_content_map = retrieved[abstraction_index]
+                else:
+                    # Get content using helper, passing indices
+                    related_files_content_map, shortened = get_content_for_indices(
+                        chapter_files,
+                        related_file_indices,
+                        max_tokens=chapter_context_tokens,
+                        query=(
+                            f"{abstraction_details['name']} {abstraction_details['description']}"
+                            if large_file_mode == "relevant"
+                            else None
+                        ),
+                        return_shortened=True,
+                    )
+                    shortened_files += shortened
 
                 # Get previous chapter info for transitions (uses potentially translated name)
                 prev_chapter = None
@@ -647,30 +2160,150 @@ class WriteChapters(BatchNode):
                     next_idx = chapter_order[i + 1]
                     next_chapter = chapter_filenames[next_idx]
 
-                items_to_process.append(
-                    {
-                        "chapter_num": i + 1,
-                        "abstraction_index": abstraction_index,
-                        "abstraction_details": abstraction_details,  # Has potentially translated name/desc
-                        "related_files_content_map": related_files_content_map,
-                        "project_name": shared["project_name"],  # Add project name
-                        "full_chapter_listing": full_chapter_listing,  # Add the full chapter listing (uses potentially translated names)
-                        "chapter_filenames": chapter_filenames,  # Add chapter filenames mapping (uses potentially translated names)
-                        "prev_chapter": prev_chapter,  # Add previous chapter info (uses potentially translated name)
-                        "next_chapter": next_chapter,  # Add next chapter info (uses potentially translated name)
-                        "language": language,  # Add language for multi-language support
-                        "use_cache": use_cache, # Pass use_cache flag
-                        # previous_chapters_summary will be added dynamically in exec
-                    }
-                )
+                item = {
+                    "chapter_num": i + 1,
+                    "abstraction_index": abstraction_index,
+                    "abstraction_details": abstraction_details,  # Has potentially translated name/desc
+                    "related_files_content_map": related_files_content_map,
+                    "project_name": shared["project_name"],  # Add project name
+                    "full_chapter_listing": full_chapter_listing,  # Add the full chapter listing (uses potentially translated names)
+                    "chapter_filenames": chapter_filenames,  # Add chapter filenames mapping (uses potentially translated names)
+                    "prev_chapter": prev_chapter,  # Add previous chapter info (uses potentially translated name)
+                    "next_chapter": next_chapter,  # Add next chapter info (uses potentially translated name)
+                    "language": language,  # Add language for multi-language support
+                    "use_cache": use_cache, # Pass use_cache flag
+                    "max_tokens": max_tokens,  # Per-chapter length budget
+                    "chapter_context": chapter_context,  # "digest" (rolling summaries) or "full"
+                    "previous_context_tokens": previous_context_tokens,  # Budget for the rolling context
+                    "retrieval": retrieval if retrieved is not None else "files",  # Where the file context came from
+                    "generation": generation,  # "single" or "sections"
+                    "minify": minify,  # How the source files in the prompt were minified
+                    "chapter_context_tokens": chapter_context_tokens,  # Budget the source files were fitted to
+                    "large_file_mode": large_file_mode,  # How oversized files were shortened
+                    "completed_content": chapters_in_progress[i],  # Set when restored from a checkpoint or reused
+                    "patch": chapter_patches[i],  # {"previous_chapter", "diff"} to update instead of rewrite
+                    # previous_chapters_summary will be added dynamically in exec
+                }
+                if parallel:
+                    item["planned_context"] = build_planned_chapter_context(
+                        chapter_order[:i], abstractions, chapter_filenames, next_chapter
+                    )
+                items_to_process.append(item)
             else:
                 print(
                     f"Warning: Invalid abstraction index {abstraction_index} in chapter_order. Skipping."
                 )
 
-        print(f"Preparing to write {len(items_to_process)} chapters...")
+        mode = f" in parallel ({self.max_workers} workers)" if parallel else ""
+        print(f"Preparing to write {len(items_to_process)} chapters{mode}...")
+        if shortened_files:
+            print(
+                f"Shortened {shortened_files} oversized source files to fit the "
+                f"{chapter_context_tokens}-token chapter context budget ({large_file_mode})."
+            )
+        restored = sum(1 for item in items_to_process if item["completed_content"] is not None)
+        if restored:
+            print(f"Reusing {restored} chapters written earlier.")
+        patched = sum(
+            1 for item in items_to_process if item["patch"] and item["completed_content"] is None
+        )
+        if patched:
+            print(f"Updating {patched} chapters from source diffs.")
+
+        # Chapter cache: a chapter whose abstraction, files and place in the tutorial are
+        # unchanged is reused even when other chapters (and so its prompt) differ
+        self.chapter_cache = DiskCache("chapters")
+        file_hashes = shared.get("file_hashes") or [content_hash(c) for _, c in files_data]
+        model = get_model_name()
+        hits = 0
+        to_write = [item for item in items_to_process if item["completed_content"] is None]
+        for item in to_write:
+            item["cache_key"] = self.chapter_cache_key(item, files_data, file_hashes, model)
+            cached = self.chapter_cache.get(item["cache_key"]) if use_cache else None
+            if cached:
+                item["completed_content"] = cached
+                self.chapters_in_progress[item["chapter_num"] - 1] = cached
+                hits += 1
+        if to_write:
+            shared["chapter_cache_stats"] = {"hits": hits, "misses": len(to_write) - hits}
+            print(
+                f"Chapter cache: {hits} of {len(to_write)} chapters found "
+                f"({hits * 100 // len(to_write)}% hit rate)."
+            )
         return items_to_process  # Iterable for BatchNode
 
+    def chapter_cache_key(self, item, files_data, file_hashes, model):
+        abstraction = item["abstraction_details"]
+        return json.dumps(
+            {
+                "model": model,
+                "prompt_version": self.prompt_version,
+                "language": item["language"],
+                "project_name": item["project_name"],
+                "name": abstraction["name"],
+                "description": abstraction["description"],
+                "files": sorted(
+                    [files_data[f][0], file_hashes[f]]
+                    for f in abstraction.get("files", [])
+                    if 0 <= f < len(files_data)
+                ),
+                # Links to the neighbouring chapters are part of the text
+                "chapter_num": item["chapter_num"],
+                "prev": item["prev_chapter"]["filename"] if item["prev_chapter"] else None,
+                "next": item["next_chapter"]["filename"] if item["next_chapter"] else None,
+                # Retrieved chunks can come from any file of the codebase
+                "retrieved": (
+                    content_hash(json.dumps(item["related_files_content_map"], ensure_ascii=False))
+                    if item["retrieval"] != "files"
+                    else None
+                ),
+                # Only present in section mode, so single-generation keys stay as they were
+                **({"generation": item["generation"]} if item["generation"] != "single" else {}),
+                **({"minify": item["minify"]} if item["minify"] != "none" else {}),
+                **({"max_tokens": item["max_tokens"]} if item["max_tokens"] != self.num_predict else {}),
+                **(
+                    {"chapter_context_tokens": item["chapter_context_tokens"]}
+                    if item["chapter_context_tokens"] != DEFAULT_CHAPTER_CONTEXT_TOKENS
+                    else {}
+                ),
+                **({"large_file_mode": item["large_file_mode"]} if item["large_file_mode"] != "excerpt" else {}),
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+
+    def _exec(self, items):
+        if self.max_workers <= 1:
+            return super()._exec(items)
+        # Run each chapter on its own shallow copy so retry state (cur_retry) is not shared
+        # between threads. Results come back in chapter order.
+        return map_concurrently(self.exec_reserved, items or [], self.max_workers)
+
+    def exec_reserved(self, item):
+        """
+        Write a chapter in parallel mode, holding its estimated cost against the token
+        budget until it is done, so chapters already running count before the next starts.
+        """
+        if self.token_budget is None or item.get("completed_content") is not None:
+            return Node._exec(copy.copy(self), item)
+        cost = (
+            CHAPTER_OVERHEAD_TOKENS
+            + sum(estimate_tokens(content) for content in item["related_files_content_map"].values())
+            + item.get("previous_context_tokens", 1500)
+            + (item.get("max_tokens") or self.num_predict)
+        )
+        if not self.token_budget.reserve(cost):
+            return self.budget_exhausted_chapter(item)
+        try:
+            return Node._exec(copy.copy(self), item)
+        finally:
+            self.token_budget.release(cost)
+
+    def budget_exhausted_chapter(self, item):
+        # Stop cleanly: the chapter keeps its heading and file, so the links stay valid
+        self.skipped_chapters.append(item["chapter_num"])
+        return f"# Chapter {item['chapter_num']}: {item['abstraction_details']['name']}\n\n{BUDGET_EXHAUSTED_NOTE}"
+
     def exec(self, item):
         # This runs for each item prepared above
         abstraction_name = item["abstraction_details"][
@@ -683,7 +2316,19 @@ class WriteChapters(BatchNode):
         project_name = item.get("project_name")
         language = item.get("language", "english")
         use_cache = item.get("use_cache", True) # Read use_cache from item
-        print(f"Writing chapter {chapter_num} for: {abstraction_name} using LLM...")
+
+        completed_content = item.get("completed_content")
+        if completed_content is not None:
+            # Written before the run was interrupted, or unchanged since the last run
+            self.chapters_written_so_far.append(completed_content)
+            self.chapter_digests.append(make_chapter_digest(completed_content))
+            return completed_content
+
+        if self.token_budget is not None and self.token_budget.exhausted():
+            return self.budget_exhausted_chapter(item)
+
+        action = "Updating" if item.get("patch") else "Writing"
+        print(f"{action} chapter {chapter_num} for: {abstraction_name} using LLM...")
 
         # Prepare file context string from the map
         file_context_str = "\n\n".join(
@@ -692,8 +2337,19 @@ class WriteChapters(BatchNode):
         )
 
         # Get summary of chapters written *before* this one
-        # Use the temporary instance variable
-        previous_chapters_summary = "\n---\n".join(self.chapters_written_so_far)
+        # Use the plan in parallel mode, otherwise the temporary instance variable
+        full_previous_chapters = "\n---\n".join(self.chapters_written_so_far)
+        if "planned_context" in item:
+            previous_chapters_summary = item["planned_context"]
+        elif item.get("chapter_context") == "full" or estimate_tokens(
+            full_previous_chapters
+        ) <= item.get("previous_context_tokens", 1500):
+            # Early chapters fit the budget as they are
+            previous_chapters_summary = full_previous_chapters
+        else:
+            previous_chapters_summary = build_rolling_context(
+                self.chapter_digests, item.get("previous_context_tokens", 1500)
+            )
 
         # Add language instruction and context notes only if not English
         language_instruction = ""
@@ -719,7 +2375,21 @@ class WriteChapters(BatchNode):
             )
             tone_note = f" (appropriate for {lang_cap} readers)"
 
-        prompt = f"""
+        if item.get("generation") == "sections" and not item.get("patch"):
+            # Outline first, then the sections concurrently; see write_in_sections
+            prompt = None
+            chapter_content = self.write_in_sections(
+                item,
+                file_context_str,
+                previous_chapters_summary,
+                full_previous_chapters,
+                language_instruction,
+            )
+        elif item.get("patch"):
+            prompt = self.build_patch_prompt(item, language_instruction)
+            previous_chapters_summary = full_previous_chapters = ""
+        else:
+            prompt = f"""
 {language_instruction}Write a very beginner-friendly tutorial chapter (in Markdown format) for the project `{project_name}` about the concept: "{abstraction_name}". This is Chapter {chapter_num}.
 
 Concept Details{concept_details_note}:
@@ -767,7 +2437,24 @@ Instructions for the chapter (Generate content in {language.capitalize()} unless
 
 Now, directly provide a super beginner-friendly Markdown output (DON'T need ```markdown``` tags):
 """
-        chapter_content = call_llm(prompt, use_cache=(use_cache and self.cur_retry == 0)) # Use cache only if enabled and not retrying
+        if prompt is not None:
+            prompt_tokens = estimate_tokens(prompt)
+            self.prompt_token_stats.append(
+                (
+                    prompt_tokens,
+                    prompt_tokens
+                    - estimate_tokens(previous_chapters_summary)
+                    + estimate_tokens(full_previous_chapters),
+                )
+            )
+
+            chapter_content = call_llm(
+                prompt,
+                use_cache=(use_cache and self.cur_retry == 0),  # Use cache only if enabled and not retrying
+                stop=self.stop_sequences,
+                num_predict=item.get("max_tokens") or self.num_predict,
+                node=self.__class__.__name__,
+            )
         # Basic validation/cleanup
         actual_heading = f"# Chapter {chapter_num}: {abstraction_name}"  # Use potentially translated name
         if not chapter_content.strip().startswith(f"# Chapter {chapter_num}"):
@@ -781,24 +2468,232 @@ Now, directly provide a super beginner-friendly Markdown output (DON'T need ```m
             else:  # Otherwise, prepend it
                 chapter_content = f"{actual_heading}\n\n{chapter_content}"
 
-        # Add the generated content to our temporary list for the next iteration's context
+        # Add the generated content and its digest to our temporary lists for the next iteration's context
         self.chapters_written_so_far.append(chapter_content)
+        self.chapter_digests.append(make_chapter_digest(chapter_content))
+
+        self.chapters_in_progress[chapter_num - 1] = chapter_content
+        if self.save_progress:
+            self.save_progress()
+        if item.get("cache_key"):
+            self.chapter_cache.set(item["cache_key"], chapter_content)
 
         return chapter_content  # Return the Markdown string (potentially translated)
 
+    def build_patch_prompt(self, item, language_instruction):
+        chapter_num = item["chapter_num"]
+        abstraction_name = item["abstraction_details"]["name"]
+        patch = item["patch"]
+        return f"""
+{language_instruction}Below is Chapter {chapter_num} ("{abstraction_name}") of a beginner-friendly tutorial for the project `{item.get("project_name")}`, followed by a unified diff of the changes made to its source files since the chapter was written.
+
+Current chapter:
+{patch["previous_chapter"]}
+
+Source changes (unified diff):
+{patch["diff"]}
+
+Update the chapter so it matches the changed code:
+- Change only the explanations, code snippets and diagrams affected by the diff.
+- Keep everything else (structure, wording, headings, links to other chapters) exactly as it is.
+- If nothing in the chapter is affected, return it unchanged.
+
+Output *only* the complete updated Markdown chapter (DON'T need ```markdown``` tags):
+"""
+
+    def write_in_sections(
+        self, item, file_context_str, previous_chapters_summary, full_previous_chapters, language_instruction
+    ):
+        """
+        Section mode: ask for a short outline (introduction, sections, conclusion),
+        write the sections concurrently, then assemble the chapter in outline order
+        with the heading and links to the neighbouring chapters added here. The
+        chapter takes as long as its outline plus its longest section.
+        """
+        chapter_num = item["chapter_num"]
+        abstraction_name = item["abstraction_details"]["name"]
+        abstraction_description = item["abstraction_details"]["description"]
+        project_name = item.get("project_name")
+        language = item.get("language", "english")
+        use_cache = item.get("use_cache", True) and self.cur_retry == 0
+        code_context = file_context_str or "No specific code snippets provided for this abstraction."
+        prev_chapter, next_chapter = item["prev_chapter"], item["next_chapter"]
+
+        transitions = []
+        if prev_chapter:
+            transitions.append(f'The `introduction` starts with a short transition from the previous chapter, "{prev_chapter["name"].strip()}".')
+        if next_chapter:
+            transitions.append(f'The `conclusion` ends with a short transition to the next chapter, "{next_chapter["name"].strip()}".')
+        outline_prompt = f"""
+{language_instruction}Plan a very beginner-friendly tutorial chapter for the project `{project_name}` about the concept: "{abstraction_name}". This is Chapter {chapter_num}.
+
+Concept Details:
+- Name: {abstraction_name}
+- Description:
+{abstraction_description}
+
+Complete Tutorial Structure:
+{item["full_chapter_listing"]}
+
+Context from previous chapters:
+{previous_chapters_summary if previous_chapters_summary else "This is the first chapter."}
+
+Relevant Code Snippets (Code itself remains unchanged):
+{code_context}
+
+Split the chapter into 3-{self.max_sections} sections that are written separately, in {language.capitalize()}:
+- Start with the motivation and a central use case, then the key concepts one by one, how to use the abstraction to solve the use case, and finally the internal implementation (a step-by-step walkthrough, then the code).
+- For each section give a short `title` and what it `covers` (1-3 sentences, so its writer knows what belongs there and what the other sections explain).
+- Also write the chapter `introduction` (2-3 sentences with the high-level motivation) and `conclusion` (2-3 sentences summarizing what was learned). {" ".join(transitions)}
+
+Format the output as YAML:
+
+```yaml
+introduction: |
+  Two or three sentences.
+sections:
+  - title: |
+      Why Query Processing?
+    covers: |
+      The problem it solves and the central use case.
+  - title: |
+      Under the Hood
+    covers: |
+      Step-by-step walkthrough with a sequence diagram, then the code in path/to/file.py.
+conclusion: |
+  Two or three sentences.
+```"""
+        outline = parse_section_outline(
+            call_llm(
+                outline_prompt,
+                use_cache=use_cache,
+                stop=YAML_BLOCK_STOP,
+                num_predict=self.outline_num_predict,
+                node=self.__class__.__name__,
+            ),
+            self.max_sections,
+        )
+        section_listing = "\n".join(
+            f"{i + 1}. {section['title']}: {section['covers']}"
+            for i, section in enumerate(outline["sections"])
+        )
+        section_tokens = max(
+            (item.get("max_tokens") or self.num_predict) // len(outline["sections"]),
+            self.min_section_tokens,
+        )
+
+        def section_prompt(section):
+            return f"""
+{language_instruction}You are writing one section of Chapter {chapter_num} ("{abstraction_name}") of a very beginner-friendly tutorial for the project `{project_name}`, in {language.capitalize()}.
+
+Concept Details:
+- Name: {abstraction_name}
+- Description:
+{abstraction_description}
+
+Complete Tutorial Structure:
+{item["full_chapter_listing"]}
+
+Sections of this chapter (the others are written separately; do not repeat them):
+{section_listing}
+
+Relevant Code Snippets (Code itself remains unchanged):
+{code_context}
+
+Write ONLY the section "{section['title']}", which covers: {section['covers']}
+- Start with the heading `## {section['title']}`. No chapter heading, introduction or conclusion.
+- Each code block should be BELOW 10 lines! Break longer code into smaller pieces, simplify it aggressively and explain each block right after it.
+- For internals, a simple mermaid sequenceDiagram with at most 5 participants helps.
+- When you refer to abstractions covered in other chapters, use Markdown links from the Complete Tutorial Structure above.
+- Heavily use analogies and examples to help beginners understand.
+
+Output *only* the Markdown content of this section (DON'T need ```markdown``` tags):
+"""
+
+        def write_section(section):
+            content = call_llm(
+                section_prompt(section),
+                use_cache=use_cache,
+                stop=self.stop_sequences,
+                num_predict=section_tokens,
+                node=self.__class__.__name__,
+            ).strip()
+            if not content:
+                raise ValueError(f"Empty section {section['title']!r} in chapter {chapter_num}")
+            lines = content.split("\n")
+            # The heading comes from the outline, so the assembled chapter is predictable
+            if lines[0].lstrip().startswith("#"):
+                lines[0] = f"## {section['title']}"
+            else:
+                lines.insert(0, f"## {section['title']}\n")
+            return "\n".join(lines)
+
+        sections = map_concurrently(write_section, outline["sections"], self.section_workers)
+
+        prompt_tokens = estimate_tokens(outline_prompt) + sum(
+            estimate_tokens(section_prompt(section)) for section in outline["sections"]
+        )
+        self.prompt_token_stats.append(
+            (
+                prompt_tokens,
+                prompt_tokens
+                - estimate_tokens(previous_chapters_summary)
+                + estimate_tokens(full_previous_chapters),
+            )
+        )
+
+        parts = [f"# Chapter {chapter_num}: {abstraction_name}", outline["introduction"]]
+        parts.extend(sections)
+        parts.append(outline["conclusion"])
+        navigation = []
+        if prev_chapter:
+            navigation.append(f"← [{prev_chapter['name'].strip()}]({prev_chapter['filename']})")
+        if next_chapter:
+            navigation.append(f"[{next_chapter['name'].strip()}]({next_chapter['filename']}) →")
+        if navigation:
+            parts.append(" | ".join(navigation))
+        return "\n\n".join(parts)
+
     def post(self, shared, prep_res, exec_res_list):
         # exec_res_list contains the generated Markdown for each chapter, in order
         shared["chapters"] = exec_res_list
-        # Clean up the temporary instance variable
+        shared.pop("chapters_in_progress", None)
+        shared.pop("chapter_patches", None)
+        # Report how much the rolling context saved compared to full previous chapters
+        if self.prompt_token_stats:
+            actual = sum(stats[0] for stats in self.prompt_token_stats)
+            with_full_chapters = sum(stats[1] for stats in self.prompt_token_stats)
+            shared["chapter_prompt_tokens"] = {
+                "actual": actual,
+                "with_full_previous_chapters": with_full_chapters,
+            }
+            print(
+                f"Chapter prompts: ~{actual} tokens in total "
+                f"(~{with_full_chapters} with full previous chapters)."
+            )
+        shared["skipped_chapters"] = sorted(self.skipped_chapters)
+        if self.skipped_chapters:
+            print(
+                f"Token budget exhausted: skipped chapters "
+                f"{', '.join(map(str, shared['skipped_chapters']))}."
+            )
+        # Clean up the temporary instance variables
         del self.chapters_written_so_far
+        del self.chapter_digests
+        del self.prompt_token_stats
+        del self.token_budget
+        del self.skipped_chapters
+        del self.section_workers
+        del self.chapters_in_progress
+        del self.save_progress
+        del self.chapter_cache
         print(f"Finished writing {len(exec_res_list)} chapters.")
 
 
 class CombineTutorial(Node):
     def prep(self, shared):
         project_name = shared["project_name"]
-        output_base_dir = shared.get("output_dir", "output")  # Default output dir
-        output_path = os.path.join(output_base_dir, project_name)
+        output_path = get_tutorial_output_path(shared)
         repo_url = shared.get("repo_url")  # Get the repository URL
         # language = shared.get("language", "english") # No longer needed for fixed strings
 
@@ -857,7 +2752,10 @@ class CombineTutorial(Node):
         # Keep fixed strings in English
         index_content += f"## Chapters\n\n"
 
+        files_data = shared["files"]
+        file_hashes = shared.get("file_hashes") or [content_hash(c) for _, c in files_data]
         chapter_files = []
+        chapter_manifest = []
         # Generate chapter links based on the determined order, using potentially translated names
         for i, abstraction_index in enumerate(chapter_order):
             # Ensure index is valid and we have content for it
@@ -877,22 +2775,54 @@ class CombineTutorial(Node):
                 if not chapter_content.endswith("\n\n"):
                     chapter_content += "\n\n"
                 # Keep fixed strings in English
-                chapter_content += f"---\n\nGenerated by [AI代码助手]"
+                chapter_content += TUTORIAL_FOOTER
 
                 # Store filename and corresponding content
                 chapter_files.append({"filename": filename, "content": chapter_content})
+                # Record the files behind the chapter so later incremental runs can reuse it
+                chapter_manifest.append(
+                    {
+                        "filename": filename,
+                        "abstraction_index": abstraction_index,
+                        "file_hashes": {
+                            files_data[f][0]: file_hashes[f]
+                            for f in abstractions[abstraction_index]["files"]
+                        },
+                    }
+                )
             else:
                 print(
                     f"Warning: Mismatch between chapter order, abstractions, or content at index {i} (abstraction index {abstraction_index}). Skipping file generation for this entry."
                 )
 
         # Add attribution to index content (using English fixed string)
-        index_content += f"\n\n---\n\nGenerated by [AI代码助手]"
+        index_content += f"\n\n{TUTORIAL_FOOTER}"
+
+        manifest = {
+            "language": shared.get("language", "english"),
+            "model": get_model_name(),
+            "files": {path: file_hash for (path, _), file_hash in zip(files_data, file_hashes)},
+            "abstractions": [
+                {**abstr, "files": [files_data[f][0] for f in abstr["files"]]}
+                for abstr in abstractions
+            ],
+            "relationships": relationships_data,
+            "chapter_order": chapter_order,
+            "chapters": chapter_manifest,
+        }
 
         return {
             "output_path": output_path,
             "index_content": index_content,
             "chapter_files": chapter_files,  # List of {"filename": str, "content": str}
+            "manifest": manifest,  # Content hashes and plan for incremental regeneration
+            # Sources the chapters were written from, diffed by later runs in patch mode.
+            # Only kept in patch mode, and in the disk cache rather than the tutorial
+            "sources": (
+                {files_data[f][0]: files_data[f][1] for abstr in abstractions for f in abstr["files"]}
+                if shared.get("incremental", False) and shared.get("patch_chapters", False)
+                else None
+            ),
         }
 
     def exec(self, prep_res):
@@ -917,8 +2847,129 @@ class CombineTutorial(Node):
                 f.write(chapter_info["content"])
             print(f"  - Wrote {chapter_filepath}")
 
+        write_manifest(output_path, prep_res["manifest"])
+        if prep_res["sources"] is not None:
+            write_source_snapshot(output_path, prep_res["sources"])
+
         return output_path  # Return the final path
 
     def post(self, shared, prep_res, exec_res):
         shared["final_output_dir"] = exec_res  # Store the output path
+        # Pages of the tutorial, in reading order (translated by TranslateTutorial)
+        shared["tutorial_files"] = ["index.md"] + [
+            chapter["filename"] for chapter in prep_res["chapter_files"]
+        ]
         print(f"\nTutorial generation complete! Files are in: {exec_res}")
+
+
+class TranslateTutorial(BatchNode):
+    """
+    Translate a finished tutorial into the other languages of shared["languages"].
+
+    The tutorial is planned and written once in the pivot language (languages[0]);
+    every page is then translated on its own, concurrently, and written with the
+    same filename to the language's subdirectory, so links keep working. Nothing
+    happens for single-language runs.
+    """
+
+    # Translations are about as long as the page they translate
+    stop_sequences = None
+    num_predict = 8192
+
+    def prep(self, shared):
+        self.max_workers = shared.get("llm_workers", 4)
+        languages = shared.get("languages") or []
+        if len(languages) <= 1:
+            return []
+        pivot = languages[0]
+        source_path = shared["final_output_dir"]
+        use_cache = shared.get("use_cache", True)
+        max_tokens = shared.get("chapter_max_tokens") or self.num_predict
+        self.token_budget = shared.get("_token_budget")
+
+        pages = []
+        for filename in shared["tutorial_files"]:
+            with open(os.path.join(source_path, filename), "r", encoding="utf-8") as f:
+                content = f.read()
+            # The footer is a fixed string, kept as is instead of being translated
+            if content.endswith(TUTORIAL_FOOTER):
+                content = content[: -len(TUTORIAL_FOOTER)].rstrip("\n")
+            pages.append((filename, content))
+
+        items = []
+        for language in languages[1:]:
+            output_path = get_tutorial_output_path(shared, language)
+            for filename, content in pages:
+                items.append(
+                    {
+                        "project_name": shared["project_name"],
+                        "source_language": pivot,
+                        "language": language,
+                        "filename": filename,
+                        "content": content,
+                        "output_path": output_path,
+                        "use_cache": use_cache,
+                        "max_tokens": max_tokens,
+                    }
+                )
+        print(
+            f"Translating {len(pages)} pages from {pivot.capitalize()} into "
+            f"{', '.join(language.capitalize() for language in languages[1:])}..."
+        )
+        return items
+
+    def _exec(self, items):
+        # Pages are independent: translate each on its own shallow copy so retry
+        # state (cur_retry) is not shared between threads
+        return map_concurrently(
+            lambda item: Node._exec(copy.copy(self), item), items or [], self.max_workers
+        )
+
+    def exec(self, item):
+        if self.token_budget is not None and self.token_budget.exhausted():
+            return None  # Left untranslated once the job's token budget is spent
+        page = "the index page" if item["filename"] == "index.md" else "a chapter"
+        prompt = f"""
+Translate the following Markdown page from {item['source_language'].capitalize()} to {item['language'].capitalize()}.
+It is {page} of a beginner-friendly tutorial about the project `{item['project_name']}`.
+
+Instructions:
+- Translate all prose: headings, paragraphs, lists, table text, link texts, Mermaid labels and code comments.
+- Keep the Markdown structure exactly as it is, including link targets (the part in parentheses, e.g. `(02_store.md)`).
+- Do NOT translate code, identifiers, file paths, URLs, or Mermaid syntax.
+- Output *only* the translated page (DON'T need ```markdown``` tags).
+
+Page:
+{item['content']}
+"""
+        translation = call_llm(
+            prompt,
+            use_cache=(item["use_cache"] and self.cur_retry == 0),
+            stop=self.stop_sequences,
+            num_predict=item["max_tokens"],
+            node=self.__class__.__name__,
+        ).strip()
+        if not translation:
+            raise ValueError(f"Empty translation of {item['filename']} into {item['language']}")
+
+        os.makedirs(item["output_path"], exist_ok=True)
+        filepath = os.path.join(item["output_path"], item["filename"])
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(f"{translation}\n\n{TUTORIAL_FOOTER}")
+        print(f"  - Wrote {filepath}")
+        return item["language"], item["output_path"]
+
+    def post(self, shared, prep_res, exec_res_list):
+        skipped = sum(1 for result in exec_res_list if result is None)
+        exec_res_list = [result for result in exec_res_list if result is not None]
+        if skipped:
+            print(f"Token budget exhausted: {skipped} pages were not translated.")
+        if not exec_res_list:
+            return
+        shared["translated_output_dirs"] = dict(exec_res_list)
+        # All languages now live side by side under the project directory
+        shared["final_output_dir"] = os.path.dirname(shared["final_output_dir"])
+        print(
+            f"Translated {len(exec_res_list)} pages. "
+            f"All languages are in: {shared['final_output_dir']}"
+        )
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+测试API请求的选项字段只接受与命令行choices相同的取值
+"""
+
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+import api_server
+
+
+class TestTutorialRequest(unittest.TestCase):
+
+    def test_options_accept_the_cli_choices(self):
+        """测试各选项接受命令行choices中的取值"""
+        request = api_server.TutorialRequest(
+            local_dir=".",
+            repo_type="gitlab",
+            order_strategy="hybrid",
+            planner="fused",
+            chapter_generation="sections",
+            retrieval="bm25",
+            minify_planning="comments",
+            minify_chapters="all",
+            large_file_mode="relevant",
+            planning_context="skeleton",
+            relationships_mode="static",
+            chapter_context="full",
+        )
+        self.assertEqual(request.order_strategy, "hybrid")
+        self.assertEqual(api_server.TutorialRequest().minify_planning, "none")
+
+    def test_unknown_option_value_is_rejected(self):
+        """测试拼错的选项取值在校验时报错，而不是在运行中被静默忽略"""
+        for field, value in [
+            ("order_strategy", "graf"),
+            ("planner", "single"),
+            ("chapter_generation", "section"),
+            ("retrieval", "embeddings"),
+            ("minify_planning", "comment"),
+            ("minify_chapters", "full"),
+            ("large_file_mode", "outline"),
+            ("repo_type", "bitbucket"),
+        ]:
+            with self.subTest(field=field), self.assertRaises(ValidationError):
+                api_server.TutorialRequest(local_dir=".", **{field: value})
+
+    def test_generate_returns_422_for_unknown_option(self):
+        """测试/generate-tutorial对无效选项返回422且不创建任务"""
+        client = TestClient(api_server.app)
+        with patch("api_server.run_tutorial_generation") as run:
+            response = client.post("/generate-tutorial", json={"local_dir": ".", "order_strategy": "graf"})
+        self.assertEqual(response.status_code, 422)
+        run.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+测试BM25检索：标识符按驼峰和下划线拆分、关键词排序、无需嵌入模型检索章节和关系分析的上下文
+"""
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from nodes import AnalyzeRelationships, WriteChapters
+from utils.bm25 import BM25Index, split_identifier, tokenize
+
+FILES = [
+    ("store/record_store.py", "class RecordStore:\n    def save_record(self, record):\n        self.records.append(record)\n"),
+    ("engine.py", "class QueryEngine:\n    def runQuery(self, sql):\n        return execute(sql)\n"),
+    ("helpers.py", "def format_record(record):\n    return str(record)\n"),
+    ("README.md", "Nothing to see here.\n"),
+]
+
+
+class TestBM25Index(unittest.TestCase):
+
+    def test_split_identifier(self):
+        """测试驼峰、下划线和数字的拆分方式，拼接后的整词也作为索引词"""
+        self.assertEqual(split_identifier("getUserName"), ["get", "user", "name", "getusername"])
+        self.assertEqual(split_identifier("get_user_name"), ["get", "user", "name", "getusername"])
+        self.assertEqual(split_identifier("HTTPServer"), ["http", "server", "httpserver"])
+        self.assertEqual(split_identifier("x"), [])
+        self.assertEqual(tokenize("run_query runQuery")["query"], 2)
+
+    def test_search_ranks_by_keywords(self):
+        """测试查询返回包含关键词的代码块，未命中的代码块不返回"""
+        index = BM25Index.build(FILES)
+        self.assertEqual(index.chunks, [(0, 1, 3), (1, 1, 3), (2, 1, 2), (3, 1, 1)])
+        results = index.search(["Query engine runs SQL", "saves a record", "unrelated words"], top_k=3)
+        self.assertEqual(results[0][0][0], 1)
+        self.assertEqual(results[1][0][0], 0)  # "record" appears most often, and in the path
+        self.assertEqual({chunk for chunk, _ in results[1]}, {0, 2})
+        self.assertEqual(results[2], [])
+
+    def test_boost_own_files(self):
+        """测试抽象已关联文件中的命中代码块获得加分"""
+        index = BM25Index.build(FILES)
+        plain = dict(index.search(["format record"], top_k=3)[0])
+        boosted = dict(index.search(["format record"], top_k=3, boost_files=[[0, 3]])[0])
+        self.assertGreater(boosted[0], plain[0])
+        self.assertEqual(boosted[2], plain[2])
+        self.assertNotIn(3, boosted)  # No matching term, so no bonus either
+
+    def test_empty_corpus(self):
+        """测试没有文件时检索返回空结果"""
+        index = BM25Index.build([])
+        self.assertEqual(index.search(["anything"], top_k=5), [[]])
+
+
+class TestBM25Retrieval(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.patch = patch.dict("os.environ", {"CACHE_DIR": self.cache_dir.name})
+        self.patch.start()
+        self.shared = {
+            "project_name": "demo",
+            "files": FILES,
+            "abstractions": [
+                {"name": "Record Store", "description": "Saves each record.", "files": [0]},
+                {"name": "Query Engine", "description": "Runs a SQL query.", "files": [1]},
+            ],
+            "chapter_order": [0, 1],
+            "retrieval": "bm25",
+            "retrieval_top_k": 2,
+            "use_cache": False,
+        }
+
+    def tearDown(self):
+        self.patch.stop()
+        self.cache_dir.cleanup()
+
+    def test_write_chapters_uses_bm25(self):
+        """测试章节上下文来自BM25检索，包括抽象未列出的辅助文件"""
+        items = WriteChapters().prep(self.shared)
+        self.assertEqual(
+            list(items[0]["related_files_content_map"]),
+            ["0 # store/record_store.py (lines 1-3)", "2 # helpers.py (lines 1-2)"],
+        )
+        self.assertIn("1 # engine.py (lines 1-3)", items[1]["related_files_content_map"])
+        self.assertIn("_retrieval_index_bm25", self.shared)
+
+    def test_analyze_relationships_uses_bm25(self):
+        """测试关系分析的代码片段来自BM25检索，而不是整个文件"""
+        context = AnalyzeRelationships().prep(self.shared)[0]
+        self.assertIn("--- File: 2 # helpers.py (lines 1-2) ---", context)
+        self.assertIn("--- File: 1 # engine.py (lines 1-3) ---", context)
+        self.assertNotIn("README.md", context)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+测试章节缓存：抽象、相关文件和章节位置不变时复用章节，不受其他章节变化的影响
+"""
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from nodes import WriteChapters
+
+
+def make_shared(engine_source="class Engine: pass\n", store_description="Stores."):
+    return {
+        "project_name": "demo",
+        "language": "english",
+        "files": [("store.py", "class Store: pass\n"), ("engine.py", engine_source)],
+        "abstractions": [
+            {"name": "Store", "description": store_description, "files": [0]},
+            {"name": "Engine", "description": "Runs.", "files": [1]},
+        ],
+        "chapter_order": [0, 1],
+    }
+
+
+def fake_chapter(prompt, **kwargs):
+    name = "Store" if 'about the concept: "Store"' in prompt else "Engine"
+    return f"# Chapter: {name}\n\nText about {name}.\n"
+
+
+class TestChapterCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = patch.dict("os.environ", {"CACHE_DIR": self.cache_dir.name})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.cache_dir.cleanup()
+
+    def _write(self, shared):
+        with patch("nodes.call_llm", side_effect=fake_chapter) as mock_llm:
+            WriteChapters().run(shared)
+        return mock_llm.call_count
+
+    def test_unchanged_chapters_are_reused(self):
+        """测试第二次运行只重写相关文件变化的章节，并统计命中率"""
+        first = make_shared()
+        self.assertEqual(self._write(first), 2)
+        self.assertEqual(first["chapter_cache_stats"], {"hits": 0, "misses": 2})
+
+        second = make_shared(engine_source="class Engine:\n    pass\n")
+        self.assertEqual(self._write(second), 1)
+        self.assertEqual(second["chapter_cache_stats"], {"hits": 1, "misses": 1})
+        self.assertEqual(second["chapters"][0], first["chapters"][0])
+
+    def test_key_covers_abstraction_and_settings(self):
+        """测试描述、语言变化或禁用缓存时重新生成"""
+        self._write(make_shared())
+        self.assertEqual(self._write(make_shared(store_description="Keeps data.")), 1)
+
+        chinese = make_shared()
+        chinese["language"] = "chinese"
+        self.assertEqual(self._write(chinese), 2)
+
+        no_cache = make_shared()
+        no_cache["use_cache"] = False
+        self.assertEqual(self._write(no_cache), 2)
+
+    def test_key_covers_prompt_options(self):
+        """测试章节长度、上下文预算、大文件处理方式和项目名变化时重新生成，默认值不改变原有的键"""
+        self._write(make_shared())
+        self.assertEqual(self._write(dict(make_shared(), chapter_max_tokens=8192, chapter_context_tokens=16000)), 0)
+        for option, value in (
+            ("chapter_max_tokens", 4000),
+            ("chapter_context_tokens", 4000),
+            ("large_file_mode", "relevant"),
+            ("project_name", "other"),
+        ):
+            self.assertEqual(self._write(dict(make_shared(), **{option: value})), 2, option)
+
+
+if __name__ == "__main__":
+    unittest.main()
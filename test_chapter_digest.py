@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+测试章节摘要与有界滚动上下文
+"""
+
+import unittest
+
+from utils.chapter_digest import make_chapter_digest, build_rolling_context
+from utils.token_count import estimate_tokens
+
+CHAPTER = """# Chapter 2: Engine
+
+In the previous chapter we met [Store](01_store.md). The **Engine** runs jobs! It calls `Store.get` for data.
+
+## How it works
+
+```python
+# This is code, not a heading
+engine = Engine()
+```
+
+- The **Engine** keeps a queue.
+
+## Conclusion
+
+Next we look at [Helper](03_helper.md).
+"""
+
+
+class TestChapterDigest(unittest.TestCase):
+
+    def test_digest_fields(self):
+        """测试摘要提取标题、小节、关键词和总结"""
+        digest = make_chapter_digest(CHAPTER)
+        self.assertEqual(digest["title"], "Chapter 2: Engine")
+        self.assertEqual(digest["headings"], ["How it works", "Conclusion"])
+        self.assertEqual(digest["key_terms"][0], "Engine")
+        self.assertIn("Store.get", digest["key_terms"])
+        self.assertTrue(digest["summary"].startswith("In the previous chapter we met Store."))
+        self.assertNotIn("This is code", digest["summary"])
+
+    def test_rolling_context_is_bounded(self):
+        """测试滚动上下文不超过token预算"""
+        digests = [make_chapter_digest(CHAPTER.replace("Chapter 2", f"Chapter {i}")) for i in range(1, 40)]
+        context = build_rolling_context(digests, max_tokens=300)
+        self.assertLessEqual(estimate_tokens(context), 330)
+        # The most recent chapter keeps its full digest
+        self.assertIn("- Chapter 39: Engine\n  Sections:", context)
+        self.assertIn("earliest chapters omitted", context)
+
+    def test_empty(self):
+        """测试第一章没有前序上下文"""
+        self.assertEqual(build_rolling_context([]), "")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+测试基于关系图的章节排序（graph / hybrid 策略）
+"""
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from utils.chapter_order import order_by_dependencies
+from nodes import OrderChapters
+from utils.telemetry import RunTelemetry
+from utils.token_budget import TokenBudget
+
+
+def rels(*pairs):
+    return [{"from": a, "to": b, "label": "Uses"} for a, b in pairs]
+
+
+class TestChapterOrder(unittest.TestCase):
+
+    def setUp(self):
+        # Planning results are memoized on disk; keep them out of the working tree
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = patch.dict("os.environ", {"CACHE_DIR": self.cache_dir.name})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.cache_dir.cleanup()
+
+    def test_topological_order(self):
+        """测试入口概念在前，能到达更多概念的优先，其次是被更多概念依赖的"""
+        order, groups = order_by_dependencies(4, rels((0, 1), (0, 2), (3, 2)))
+        self.assertEqual(order, [0, 3, 2, 1])
+        self.assertEqual(groups, [[0], [3], [2], [1]])
+
+    def test_first_layer_ranked_by_reach(self):
+        """测试第一层有多个入口时，按可到达的概念数而不是索引排序"""
+        order, groups = order_by_dependencies(5, rels((0, 4), (1, 2), (2, 3), (3, 4)))
+        self.assertEqual(order, [1, 0, 2, 3, 4])
+        self.assertEqual(groups[:2], [[1], [0]])
+        # Entry points reaching as many concepts stay tied for the LLM in hybrid mode
+        _, groups = order_by_dependencies(4, rels((0, 2), (1, 3)))
+        self.assertEqual(groups[0], [0, 1])
+
+    def test_cycles_are_broken(self):
+        """测试循环依赖时仍输出所有概念且不重复"""
+        order, _ = order_by_dependencies(4, rels((0, 1), (1, 2), (2, 0), (2, 3), (3, 3)))
+        self.assertEqual(sorted(order), [0, 1, 2, 3])
+        self.assertLess(order.index(2), order.index(3))
+
+    def _shared(self, strategy, details):
+        return {
+            "abstractions": [{"name": f"A{i}", "description": "d", "files": []} for i in range(4)],
+            "relationships": {"summary": "s", "details": details},
+            "project_name": "p",
+            "language": "english",
+            "use_cache": False,
+            "order_strategy": strategy,
+        }
+
+    def test_graph_strategy_skips_llm(self):
+        """测试graph策略不调用LLM"""
+        shared = self._shared("graph", rels((1, 0), (0, 2), (2, 3)))
+        with patch("nodes.call_llm") as mock_llm:
+            OrderChapters().run(shared)
+        mock_llm.assert_not_called()
+        self.assertEqual(shared["chapter_order"], [1, 0, 2, 3])
+
+    def test_hybrid_strategy_llm_only_orders_ties(self):
+        """测试hybrid策略只采用LLM在并列组内的顺序"""
+        shared = self._shared("hybrid", rels((0, 2), (1, 2), (2, 3)))
+        # The LLM also moves 3 to the front, which the graph does not allow
+        response = "```yaml\n- 3 # A3\n- 1 # A1\n- 0 # A0\n- 2 # A2\n```"
+        with patch("nodes.call_llm", return_value=response) as mock_llm:
+            OrderChapters().run(shared)
+        self.assertIn("Group 1: 0 # A0, 1 # A1", mock_llm.call_args[0][0])
+        self.assertEqual(shared["chapter_order"], [1, 0, 2, 3])
+
+    def test_hybrid_strategy_without_budget_uses_graph_order(self):
+        """测试hybrid策略在预算用完时不调用LLM，直接使用拓扑顺序"""
+        telemetry = RunTelemetry()
+        telemetry.record_llm_call({"prompt_tokens": 900, "completion_tokens": 100})
+        shared = self._shared("hybrid", rels((0, 2), (1, 2), (2, 3)))
+        shared["_token_budget"] = TokenBudget(1000, telemetry)
+        with patch("nodes.call_llm") as mock_llm:
+            OrderChapters().run(shared)
+        mock_llm.assert_not_called()
+        self.assertEqual(shared["chapter_order"], [0, 1, 2, 3])
+
+    def test_hybrid_strategy_falls_back_on_bad_answer(self):
+        """测试hybrid策略在LLM输出无效时直接使用拓扑顺序而不重试"""
+        shared = self._shared("hybrid", rels((0, 2), (1, 2), (2, 3)))
+        with patch("nodes.call_llm", return_value="```yaml\n- 0\n- 0\n```") as mock_llm:
+            OrderChapters(max_retries=5, wait=20).run(shared)
+        self.assertEqual(mock_llm.call_count, 1)
+        self.assertEqual(shared["chapter_order"], [0, 1, 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+测试流程检查点的保存、加载以及从检查点恢复时跳过已完成步骤
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from pocketflow import Node
+from flow import CheckpointFlow
+from utils import checkpoint as checkpoint_module
+from utils.checkpoint import RunCheckpoint, is_valid_run_id, new_run_id, run_directory
+
+
+class Step(Node):
+    runs = []
+
+    def post(self, shared, prep_res, exec_res):
+        Step.runs.append(self.params.get("name") or type(self).__name__)
+        shared.setdefault("done", []).append(type(self).__name__)
+
+
+class First(Step):
+    pass
+
+
+class Second(Step):
+    def post(self, shared, prep_res, exec_res):
+        super().post(shared, prep_res, exec_res)
+        if shared.get("fail"):
+            raise RuntimeError("interrupted")
+
+
+class Third(Step):
+    pass
+
+
+def build_flow():
+    first, second, third = First(), Second(), Third()
+    first >> second
+    second >> third
+    return CheckpointFlow(start=first)
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        Step.runs = []
+        self.tmp = tempfile.TemporaryDirectory()
+        self.run_dir = run_directory(self.tmp.name, "run-1")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_save_and_load(self):
+        """测试检查点往返保存，排除运行时对象和访问令牌"""
+        checkpoint = RunCheckpoint(self.run_dir)
+        checkpoint.mark_completed("FetchRepo", None)
+        checkpoint.save({
+            "files": [("a.py", "print('你好')")],
+            "patterns": {"*.py"},
+            "github_token": "secret",
+            "_checkpoint": checkpoint,
+        })
+        self.assertTrue(os.path.exists(os.path.join(self.run_dir, "checkpoint.json.gz")))
+        restored = RunCheckpoint(self.run_dir)
+        shared = restored.load()
+        self.assertEqual(shared, {"files": [["a.py", "print('你好')"]], "patterns": ["*.py"]})
+        self.assertEqual(restored.completed, [{"node": "FetchRepo", "action": None}])
+        self.assertEqual(restored.run_id, "run-1")
+
+    def test_resume_skips_completed_nodes(self):
+        """测试中断后恢复只运行未完成的步骤"""
+        shared = {"fail": True, "_checkpoint": RunCheckpoint(self.run_dir)}
+        with self.assertRaises(RuntimeError):
+            build_flow().run(shared)
+        self.assertEqual(Step.runs, ["First", "Second"])
+
+        Step.runs = []
+        checkpoint = RunCheckpoint(self.run_dir)
+        resumed = checkpoint.load()
+        resumed["fail"] = False
+        resumed["_checkpoint"] = checkpoint
+        build_flow().run(resumed)
+        self.assertEqual(Step.runs, ["Second", "Third"])
+        self.assertEqual(resumed["done"], ["First", "Second", "Third"])
+        self.assertEqual([s["node"] for s in checkpoint.completed], ["First", "Second", "Third"])
+
+    def test_static_inputs_and_chapters_are_saved_apart(self):
+        """测试文件内容只在新值时写入一次，每章后只写入章节进度，恢复时合并"""
+        checkpoint = RunCheckpoint(self.run_dir)
+        shared = {"files": [("a.py", "x = 1\n")], "chapters_in_progress": [None, None], "step": 1}
+        with patch("utils.checkpoint._write_json_gz", wraps=checkpoint_module._write_json_gz) as write:
+            checkpoint.save(shared)
+            shared["chapters_in_progress"][0] = "# Chapter 1"
+            checkpoint.save_progress(shared)
+            shared["step"] = 2
+            checkpoint.save(shared)
+        written = [os.path.basename(call.args[0]) for call in write.call_args_list]
+        progress, main = "chapters_in_progress.json.gz", "checkpoint.json.gz"
+        self.assertEqual(written, ["files.json.gz", progress, main, progress, progress, main])
+
+        shared["chapters_in_progress"][1] = "# Chapter 2"
+        checkpoint.save_progress(shared)  # Interrupted before the next full save
+        restored = RunCheckpoint(self.run_dir).load()
+        self.assertEqual(restored["files"], [["a.py", "x = 1\n"]])
+        self.assertEqual(restored["chapters_in_progress"], ["# Chapter 1", "# Chapter 2"])
+        self.assertEqual(restored["step"], 2)
+
+        # Once the chapters are combined, a resume no longer sees them in progress
+        del shared["chapters_in_progress"]
+        checkpoint.save(shared)
+        self.assertNotIn("chapters_in_progress", RunCheckpoint(self.run_dir).load())
+
+    def test_run_id_stays_in_runs_directory(self):
+        """测试恢复运行的ID不能包含路径分隔符或..，避免跳出.runs目录"""
+        self.assertTrue(is_valid_run_id(new_run_id()))
+        for run_id in ("../..", "..", "a/b", "a\\b", "/tmp/run", ".", ""):
+            with self.assertRaises(ValueError):
+                run_directory(self.tmp.name, run_id)
+
+    def test_discard_after_success(self):
+        """测试成功完成后删除检查点，.runs目录在没有其他运行时一并删除"""
+        other = RunCheckpoint(run_directory(self.tmp.name, "run-2"))
+        for checkpoint in (RunCheckpoint(self.run_dir), other):
+            checkpoint.save({"files": [("a.py", "x = 1\n")]})
+        RunCheckpoint(self.run_dir).discard()
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, ".runs")), ["run-2"])
+        other.discard()
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_without_checkpoint(self):
+        """测试未设置检查点时与普通Flow行为一致"""
+        shared = {}
+        build_flow().run(shared)
+        self.assertEqual(shared["done"], ["First", "Second", "Third"])
+
+
+if __name__ == "__main__":
+    unittest.main()
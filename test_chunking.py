@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+测试超大文件的缩短：符号大纲加首尾片段、按相关性选取片段、按预算分配章节上下文
+"""
+
+import unittest
+
+from nodes import get_content_for_indices
+from utils.chunking import (
+    excerpt_file,
+    fit_files_to_budget,
+    relevant_chunks,
+    split_into_chunks,
+)
+from utils.token_count import estimate_tokens
+
+
+def make_module(num_functions):
+    return "".join(
+        f"def handler_{i}(request):\n    \"\"\"Handle request {i}.\"\"\"\n    return {i}\n\n\n"
+        for i in range(num_functions)
+    )
+
+
+class TestChunking(unittest.TestCase):
+
+    def test_split_into_chunks(self):
+        """测试分块覆盖所有行，并且在顶层定义之间切分"""
+        content = make_module(200)
+        chunks = split_into_chunks(content, chunk_tokens=100)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(text for _, _, text in chunks), content)
+        self.assertEqual(chunks[0][0], 1)
+        self.assertEqual(chunks[-1][1], len(content.splitlines()))
+        for _, _, text in chunks[1:]:
+            self.assertTrue(text.startswith("def handler_"))
+
+    def test_excerpt_file(self):
+        """测试超大文件缩短为大纲加首尾片段，并且不超出预算"""
+        content = make_module(2000)
+        excerpt = excerpt_file("handlers.py", content, 1000)
+        self.assertLessEqual(estimate_tokens(excerpt), 1100)
+        self.assertIn("Outline:\ndef handler_0(request): ...", excerpt)
+        self.assertIn("Lines 1-", excerpt)
+        self.assertIn("return 1999", excerpt)  # The tail is kept
+        self.assertIn("omitted", excerpt)
+
+    def test_relevant_chunks(self):
+        """测试按抽象的名称和描述选取最相关的片段"""
+        content = make_module(300) + "class SessionStore:\n    def save_session(self):\n        pass\n"
+        result = relevant_chunks("handlers.py", content, "Session Store: saves sessions", 300)
+        self.assertIn("class SessionStore", result)
+        self.assertNotIn("return 150\n", result)
+        # Nothing matches the query: head/tail excerpt instead
+        fallback = relevant_chunks("handlers.py", make_module(300), "Database", 300)
+        self.assertIn("Lines 1-", fallback)
+
+    def test_fit_files_to_budget(self):
+        """测试小文件保持完整，只缩短占满预算的大文件"""
+        small = ("config.py", "DEBUG = True\n")
+        big = ("generated.py", make_module(3000))
+        contents, shortened = fit_files_to_budget([small, big], 2000)
+        self.assertEqual(shortened, 1)
+        self.assertIs(contents[0], small[1])
+        self.assertLessEqual(sum(estimate_tokens(c) for c in contents), 2100)
+        # Under the budget, or without one, everything is kept whole
+        self.assertEqual(fit_files_to_budget([small, big], None), ([small[1], big[1]], 0))
+        self.assertEqual(fit_files_to_budget([small], 2000), ([small[1]], 0))
+
+    def test_get_content_for_indices(self):
+        """测试章节内容按预算获取，无效的索引被忽略，可返回被缩短的文件数"""
+        files = [("config.py", "DEBUG = True\n"), ("generated.py", make_module(3000))]
+        content_map = get_content_for_indices(files, [0, 1, 5], max_tokens=2000)
+        self.assertEqual(list(content_map), ["0 # config.py", "1 # generated.py"])
+        self.assertTrue(content_map["1 # generated.py"].startswith("(Large file:"))
+        self.assertEqual(get_content_for_indices(files, [1])["1 # generated.py"], files[1][1])
+        # The number of shortened files comes from fit_files_to_budget
+        _, shortened = get_content_for_indices(files, [0, 1], max_tokens=2000, return_shortened=True)
+        self.assertEqual(shortened, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
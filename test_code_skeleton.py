@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+测试代码骨架提取（Python使用ast，其他语言使用正则）
+"""
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from utils.code_skeleton import extract_skeleton, extract_skeletons
+
+PYTHON_SOURCE = '''"""Storage backends."""
+import os
+from typing import Optional
+
+MAX_SIZE = 1024
+
+
+class Store(Base):
+    """Keeps values in memory."""
+    kind = "memory"
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Return the value for key."""
+        value = self.data.get(key)
+        if value is None:
+            return default
+        return value
+'''
+
+
+class TestCodeSkeleton(unittest.TestCase):
+
+    def test_python_skeleton(self):
+        """测试Python骨架保留导入、类继承、签名和文档字符串"""
+        skeleton = extract_skeleton("store.py", PYTHON_SOURCE)
+        self.assertIn('"""Storage backends."""', skeleton)
+        self.assertIn("from typing import Optional", skeleton)
+        self.assertIn("MAX_SIZE = 1024", skeleton)
+        self.assertIn("class Store(Base):", skeleton)
+        self.assertIn("def get(self, key: str, default: Optional[str]=None) -> Optional[str]: ...", skeleton)
+        self.assertIn('"""Return the value for key."""', skeleton)
+        self.assertNotIn("self.data.get", skeleton)
+
+    def test_regex_skeletons(self):
+        """测试JS、Go、Java、C的声明行提取"""
+        js = "import { a } from './a';\nexport class Widget extends Base {\n  render() {\n    if (x) {\n      a();\n    }\n  }\n}\n"
+        self.assertEqual(
+            extract_skeleton("w.tsx", js).splitlines(),
+            ["import { a } from './a';", "export class Widget extends Base", "  render()"],
+        )
+        go = "package main\n\nfunc (s *Server) Start() error {\n\treturn nil\n}\n"
+        self.assertIn("func (s *Server) Start() error", extract_skeleton("s.go", go))
+        java = "public class Foo extends Bar {\n    public int size(String a) {\n        return 1;\n    }\n}\n"
+        self.assertIn("    public int size(String a)", extract_skeleton("Foo.java", java))
+        c = "#include <stdio.h>\nstatic int add(int a, int b) {\n  if (a) return 1;\n  return a + b;\n}\n"
+        self.assertEqual(extract_skeleton("a.c", c).splitlines(), ["#include <stdio.h>", "static int add(int a, int b)"])
+
+    def test_unsupported_and_invalid(self):
+        """测试不支持的文件类型和语法错误返回None"""
+        self.assertIsNone(extract_skeleton("README.md", "# Title"))
+        self.assertIsNone(extract_skeleton("broken.py", "def f(:\n"))
+
+    def test_cached_by_content_hash(self):
+        """测试骨架按内容哈希缓存"""
+        with tempfile.TemporaryDirectory() as cache_dir, patch.dict("os.environ", {"CACHE_DIR": cache_dir}):
+            files = [("a.py", PYTHON_SOURCE), ("README.md", "# Title")]
+            skeletons, hits = extract_skeletons(files)
+            self.assertEqual(hits, 0)
+            self.assertIsNone(skeletons[1])
+            again, hits = extract_skeletons([("other/a.py", PYTHON_SOURCE)])
+            self.assertEqual(hits, 1)
+            self.assertEqual(again[0], skeletons[0])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+测试低价值文件过滤：抓取时跳过锁文件、生成代码、压缩代码和高熵数据块，缩短笔记本和大数据文件，并按原因统计
+"""
+
+import base64
+import json
+import os
+import tempfile
+import unittest
+
+from nodes import FetchRepo
+from utils.crawl_local_files import crawl_local_files
+from utils.file_filter import classify_file
+
+NOTEBOOK = json.dumps(
+    {
+        "cells": [
+            {"cell_type": "markdown", "source": ["# Training\n", "Fits the model."]},
+            {
+                "cell_type": "code",
+                "source": "model.fit(data)",
+                "outputs": [{"data": {"image/png": "iVBORw0KGgo" * 2000}}],
+            },
+        ]
+    }
+)
+
+
+class TestClassifyFile(unittest.TestCase):
+
+    def test_skipped_files(self):
+        """测试锁文件、按文件名或文件头标记识别的生成代码、压缩代码和高熵数据块被跳过"""
+        self.assertEqual(classify_file("web/package-lock.json", "{}"), (None, "lockfile"))
+        self.assertEqual(classify_file("api/user_pb2.py", "x = 1\n"), (None, "generated"))
+        self.assertEqual(
+            classify_file("api/user.go", "// Copyright 2024\n\n// Code generated by protoc. DO NOT EDIT.\npackage api\n"),
+            (None, "generated"),
+        )
+        self.assertEqual(classify_file("static/app.js", "var a=1;" * 1000), (None, "minified"))
+        blob = "KEY = '''\n" + base64.encodebytes(os.urandom(6000)).decode() + "'''\n"
+        self.assertEqual(classify_file("certs.py", blob), (None, "high_entropy"))
+
+    def test_regular_files_are_kept(self):
+        """测试普通代码和长段落的文档保持不变，代码中间提到generated不算生成标记"""
+        code = 'def key():\n    """Return the auto-generated key."""\n    return 1\n' * 50
+        self.assertEqual(classify_file("keys.py", code), (code, None))
+        prose = ("A long paragraph written on a single line. " * 20 + "\n\n") * 5
+        self.assertEqual(classify_file("README.md", prose), (prose, None))
+        chinese = "# 说明\n\n" + "这是一个用中文写成的段落，用来说明配置项的用法。\n" * 200
+        self.assertEqual(classify_file("docs.md", chinese), (chinese, None))
+
+    def test_shortened_files(self):
+        """测试笔记本只保留单元格源码，大数据文件截取开头若干行"""
+        content, reason = classify_file("train.ipynb", NOTEBOOK)
+        self.assertEqual(reason, "notebook_outputs")
+        self.assertEqual(content, "# %% [markdown]\n# # Training\n# Fits the model.\n\n# %%\nmodel.fit(data)\n")
+
+        fixture = "- name: item\n  value: 1\n" * 2000
+        content, reason = classify_file("fixtures/items.yaml", fixture)
+        self.assertEqual(reason, "large_data")
+        self.assertEqual(len(content.splitlines()), 61)
+        self.assertTrue(content.endswith("... (3940 more lines of data omitted)\n"))
+
+
+class TestCrawlFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.TemporaryDirectory()
+        files = {
+            "app.py": "def main():\n    return 1\n",
+            "poetry.lock": "[[package]]\n",
+            "proto/user_pb2.py": "# Generated by the protocol buffer compiler.  DO NOT EDIT!\nx = 1\n",
+            "train.ipynb": NOTEBOOK,
+        }
+        for path, content in files.items():
+            full_path = os.path.join(self.repo.name, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w", encoding="utf-8") as f:
+                f.write(content)
+
+    def tearDown(self):
+        self.repo.cleanup()
+
+    def test_local_crawl_counts_reasons(self):
+        """测试本地抓取按原因统计被过滤的文件，关闭过滤时保留全部文件"""
+        result = crawl_local_files(self.repo.name, filter_low_value=True)
+        self.assertEqual(sorted(result["files"]), ["app.py", "train.ipynb"])
+        self.assertEqual(
+            result["stats"]["low_value_files"], {"lockfile": 1, "generated": 1, "notebook_outputs": 1}
+        )
+        self.assertEqual(len(crawl_local_files(self.repo.name)["files"]), 4)
+
+    def test_fetch_repo_filters_by_default(self):
+        """测试FetchRepo默认启用过滤并记录统计，--keep-low-value时不过滤"""
+        shared = {
+            "local_dir": self.repo.name,
+            "include_patterns": None,
+            "exclude_patterns": None,
+            "max_file_size": 100000,
+            "max_symbol_files": 0,
+        }
+        FetchRepo().run(shared)
+        self.assertEqual(len(shared["files"]), 2)
+        self.assertEqual(shared["low_value_files"]["lockfile"], 1)
+
+        shared = dict(shared, filter_low_value=False)
+        FetchRepo().run(shared)
+        self.assertEqual(len(shared["files"]), 4)
+        self.assertEqual(shared["low_value_files"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+测试导入关系图构建和文件重要性排序
+"""
+
+import unittest
+
+from utils.import_graph import build_import_graph
+from utils.file_ranking import rank_files
+from nodes import apply_context_budget, order_by_rank
+
+FILES = [
+    ("pkg/core/store.py", "class Store:\n    pass\n" * 5),
+    ("pkg/core/engine.py", "from .store import Store\nfrom pkg.util import helper\n" + "x = 1\n" * 20),
+    ("pkg/util.py", "def helper():\n    return 1\n" * 5),
+    ("pkg/__init__.py", "from pkg.core.engine import Engine\n"),
+    ("main.py", "import pkg\nfrom pkg import util\n" + "print(1)\n" * 10),
+    ("web/app.js", "import { api } from './lib/api';\nconst x = require('../shared/x.js');\n"),
+    ("web/lib/api.js", "export const api = 1;\n" * 5),
+    ("shared/x.js", "module.exports = 1;\n" * 5),
+    ("docs/notes/deep/old.txt", "notes " * 20),
+]
+
+
+class TestFileRanking(unittest.TestCase):
+
+    def test_import_graph(self):
+        """测试Python绝对/相对导入和JS相对路径导入的解析"""
+        graph = build_import_graph(FILES)
+        paths = [path for path, _ in FILES]
+
+        def targets(path):
+            return {paths[j] for j in graph[paths.index(path)]}
+
+        self.assertEqual(targets("pkg/core/engine.py"), {"pkg/core/store.py", "pkg/util.py"})
+        self.assertEqual(targets("pkg/__init__.py"), {"pkg/core/engine.py"})
+        self.assertEqual(targets("main.py"), {"pkg/__init__.py", "pkg/util.py"})
+        self.assertEqual(targets("web/app.js"), {"web/lib/api.js", "shared/x.js"})
+        self.assertEqual(targets("pkg/core/store.py"), set())
+
+    def test_rank_files(self):
+        """测试被依赖的核心文件和入口文件排在前面"""
+        ranking, scores = rank_files(FILES)
+        paths = [FILES[i][0] for i in ranking]
+        self.assertEqual(len(scores), len(FILES))
+        self.assertEqual(sorted(ranking), list(range(len(FILES))))
+        self.assertEqual(paths[0], "pkg/util.py")  # Imported by two files
+        self.assertLess(paths.index("pkg/core/store.py"), paths.index("shared/x.js"))
+        self.assertLess(paths.index("main.py"), paths.index("docs/notes/deep/old.txt"))
+        self.assertEqual(paths[-1], "docs/notes/deep/old.txt")
+
+    def test_context_budget(self):
+        """测试按排序填充token预算，超出部分只保留路径"""
+        shared = {"file_ranking": [2, 0, 1]}
+        self.assertEqual(order_by_rank(shared, {0, 1, 2}), [2, 0, 1])
+        self.assertEqual(order_by_rank({}, {2, 0}), [0, 2])
+
+        entries = [(2, "c.py", "c" * 40), (0, "a.py", "a" * 40), (1, "b.py", "b" * 4)]
+        budgeted, omitted = apply_context_budget(entries, 15)
+        self.assertEqual(omitted, 1)
+        self.assertEqual(budgeted[0][2], "c" * 40)
+        self.assertIn("omitted", budgeted[1][2])
+        self.assertEqual(budgeted[2][2], "b" * 4)
+        self.assertEqual(apply_context_budget(entries, None), (entries, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
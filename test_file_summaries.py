@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+测试文件摘要预处理及其按内容哈希的缓存
+"""
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from nodes import SummarizeFiles, get_planning_content_for_indices
+
+
+def make_shared(files):
+    return {
+        "files": files,
+        "project_name": "demo",
+        "summarize_files": True,
+        "summary_min_tokens": 50,
+        "llm_workers": 2,
+    }
+
+
+class TestFileSummaries(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = patch.dict("os.environ", {"CACHE_DIR": self.cache_dir.name})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.cache_dir.cleanup()
+
+    def test_large_files_summarized_and_cached(self):
+        """测试只为大文件生成摘要，且第二次运行命中缓存"""
+        files = [("big.py", "def f():\n    pass\n" * 100), ("small.py", "x = 1\n")]
+
+        with patch("nodes.call_llm", return_value="Defines f.") as mock_llm:
+            shared = make_shared(list(files))
+            SummarizeFiles().run(shared)
+            self.assertEqual(shared["file_summaries"], ["Defines f.", None])
+            self.assertEqual(mock_llm.call_count, 1)
+
+            # Same content again (e.g. a vendored copy in another repo): no LLM call
+            shared = make_shared([("vendor/big.py", files[0][1])])
+            SummarizeFiles().run(shared)
+            self.assertEqual(shared["file_summaries"], ["Defines f."])
+            self.assertEqual(mock_llm.call_count, 1)
+
+    def test_planning_content_uses_summaries(self):
+        """测试规划阶段使用摘要代替原文"""
+        shared = {"files": [("a.py", "raw a"), ("b.py", "raw b")], "file_summaries": ["sum a", None]}
+        content = get_planning_content_for_indices(shared, [0, 1])
+        self.assertEqual(content["0 # a.py"], "(File summary) sum a")
+        self.assertEqual(content["1 # b.py"], "raw b")
+
+    def test_disabled_by_default(self):
+        """测试未启用时不调用LLM"""
+        shared = make_shared([("big.py", "x" * 10000)])
+        shared["summarize_files"] = False
+        with patch("nodes.call_llm") as mock_llm:
+            SummarizeFiles().run(shared)
+        mock_llm.assert_not_called()
+        self.assertNotIn("file_summaries", shared)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
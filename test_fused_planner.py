@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+测试单次调用规划：一次LLM调用生成抽象概念、关系、摘要和章节顺序，并使用与分步规划相同的校验
+"""
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from flow import create_tutorial_flow
+from nodes import FusedPlanner
+
+FILES = [
+    ("store.py", "class Store:\n    def save(self, record):\n        pass\n"),
+    ("engine.py", "from store import Store\n\nclass Engine:\n    def run(self):\n        Store().save(1)\n"),
+]
+
+PLAN = """```yaml
+summary: |
+  A tiny **database**.
+abstractions:
+  - name: |
+      Engine
+    description: |
+      Runs queries.
+    file_indices:
+      - 1 # engine.py
+  - name: |
+      Store
+    description: |
+      Saves records.
+    file_indices:
+      - 0 # store.py
+relationships:
+  - from_abstraction: 0 # Engine
+    to_abstraction: 1 # Store
+    label: "Saves with"
+chapter_order:
+  - 1 # Store
+  - 0 # Engine
+```"""
+
+
+def make_shared(**options):
+    return {
+        "project_name": "demo",
+        "files": list(FILES),
+        "planner": "fused",
+        "max_symbol_files": 0,
+        **options,
+    }
+
+
+class TestFusedPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = patch.dict("os.environ", {"CACHE_DIR": self.cache_dir.name})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.cache_dir.cleanup()
+
+    def test_one_call_fills_the_planning_keys(self):
+        """测试一次调用即写入abstractions、relationships和chapter_order，并跳转到编写章节"""
+        shared = make_shared()
+        with patch("nodes.call_llm", return_value=PLAN) as mock_llm:
+            action = FusedPlanner().run(shared)
+        self.assertEqual(mock_llm.call_count, 1)
+        self.assertEqual(action, "fused")
+        self.assertEqual(
+            shared["abstractions"],
+            [
+                {"name": "Engine\n", "description": "Runs queries.\n", "files": [1]},
+                {"name": "Store\n", "description": "Saves records.\n", "files": [0]},
+            ],
+        )
+        self.assertEqual(
+            shared["relationships"],
+            {"summary": "A tiny **database**.\n", "details": [{"from": 0, "to": 1, "label": "Saves with"}]},
+        )
+        self.assertEqual(shared["chapter_order"], [1, 0])
+        # The prompt carries the file content once
+        self.assertEqual(mock_llm.call_args[0][0].count("class Store:"), 1)
+
+    def test_invalid_parts_are_rejected(self):
+        """测试任一部分校验失败时抛出异常，以便节点重试"""
+        for broken in (
+            PLAN.replace("  - 0 # Engine\n```", "```"),  # Order misses an abstraction
+            PLAN.replace("to_abstraction: 1", "to_abstraction: 7"),  # Unknown abstraction
+            PLAN.replace("      - 0 # store.py", "      - 9 # missing.py"),  # Unknown file
+            PLAN.replace("chapter_order:", "order:"),  # Missing section
+        ):
+            with patch("nodes.call_llm", return_value=broken) as mock_llm:
+                with self.assertRaises(ValueError):
+                    FusedPlanner(max_retries=2).run(make_shared(use_cache=False))
+            self.assertEqual(mock_llm.call_count, 2)
+
+    def test_staged_planner_skips_the_node(self):
+        """测试默认的分步规划不调用LLM，流程继续到IdentifyAbstractions"""
+        shared = make_shared(planner="staged")
+        with patch("nodes.call_llm") as mock_llm:
+            self.assertIsNone(FusedPlanner().run(shared))
+        mock_llm.assert_not_called()
+        self.assertNotIn("abstractions", shared)
+
+    def test_result_is_memoized(self):
+        """测试相同输入的第二次运行复用记忆的三项规划结果"""
+        with patch("nodes.call_llm", return_value=PLAN):
+            FusedPlanner().run(make_shared())
+        shared = make_shared()
+        with patch("nodes.call_llm") as mock_llm:
+            self.assertEqual(FusedPlanner().run(shared), "fused")
+        mock_llm.assert_not_called()
+        self.assertEqual(shared["chapter_order"], [1, 0])
+        self.assertEqual(len(shared["relationships"]["details"]), 1)
+
+    def test_flow_routes_to_write_chapters(self):
+        """测试流程中fused动作直接连接到WriteChapters"""
+        node = create_tutorial_flow().start_node
+        while type(node).__name__ != "FusedPlanner":
+            node = node.successors["default"]
+        self.assertEqual(type(node.successors["fused"]).__name__, "WriteChapters")
+        self.assertEqual(type(node.successors["default"]).__name__, "IdentifyAbstractions")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+测试大型仓库的分片识别（map-reduce）辅助函数
+"""
+
+import re
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from utils.file_shards import partition_files
+from utils.token_count import estimate_tokens, truncate_to_tokens
+from nodes import IdentifyAbstractions, merge_candidate_abstractions, parse_abstractions_response
+
+
+class TestIdentifySharding(unittest.TestCase):
+
+    def test_partition_respects_budget_and_directories(self):
+        """测试分片不超过预算且同一目录的文件尽量在一起"""
+        files = [(f"pkg{i % 3}/mod{i}.py", "x" * 400) for i in range(12)]
+        shards = partition_files(files, max_tokens=600)
+
+        self.assertEqual(sorted(i for shard in shards for i in shard), list(range(12)))
+        for shard in shards:
+            directories = {files[i][0].split("/")[0] for i in shard}
+            self.assertEqual(len(directories), 1)
+
+    def test_oversized_file_gets_own_shard(self):
+        """测试超大文件单独成片"""
+        files = [("a/small.py", "x" * 40), ("a/huge.py", "y" * 40000), ("b/other.py", "z" * 40)]
+        shards = partition_files(files, max_tokens=500)
+        self.assertIn([1], shards)
+
+    def test_truncate_to_tokens(self):
+        """测试按token估算截断超大文件，中文内容也不超出预算"""
+        for text in ("x" * 4000, "注释" * 2000, "代码 code " * 500):
+            truncated = truncate_to_tokens(text, 300)
+            self.assertTrue(text.startswith(truncated))
+            self.assertLessEqual(estimate_tokens(truncated), 300)
+            self.assertGreater(estimate_tokens(truncated + text[len(truncated)]), 300)
+        self.assertIs(truncate_to_tokens("short", 300), "short")
+
+    def test_merge_candidates_by_name(self):
+        """测试按名称合并候选抽象并合并文件索引"""
+        merged = merge_candidate_abstractions([
+            {"name": "Query Engine\n", "description": "A", "files": [3, 1]},
+            {"name": "query-engine", "description": "B", "files": [7]},
+            {"name": "Storage", "description": "C", "files": [2]},
+        ])
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(merged[0]["files"], [1, 3, 7])
+
+    def test_parse_rejects_out_of_range_index(self):
+        """测试分片内的局部索引越界时报错"""
+        response = "```yaml\n- name: A\n  description: B\n  file_indices:\n    - 5 # x.py\n```"
+        with self.assertRaises(ValueError):
+            parse_abstractions_response(response, file_count=3)
+        self.assertEqual(parse_abstractions_response(response, file_count=6)[0]["files"], [5])
+
+
+class TestShardRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = patch.dict("os.environ", {"CACHE_DIR": self.cache_dir.name})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.cache_dir.cleanup()
+
+    def test_retry_reruns_only_failed_shards(self):
+        """测试某个分片失败时由节点重试，只重新调用失败的分片"""
+        shared = {
+            "project_name": "demo",
+            "files": [(f"pkg{i}/mod.py", "x = 1\n" * 60) for i in range(3)],
+            "shard_tokens": 150,
+            "llm_workers": 1,
+            "use_cache": False,
+        }
+        calls = []
+
+        def fake_llm(prompt, **kwargs):
+            part = int(re.search(r"This is part (\d+) of 3", prompt).group(1))
+            calls.append(part)
+            if part == 2 and calls.count(2) == 1:
+                return "not yaml"
+            return f"```yaml\n- name: Part {part}\n  description: D\n  file_indices:\n    - 0 # mod.py\n```"
+
+        with patch("nodes.call_llm", side_effect=fake_llm):
+            IdentifyAbstractions(max_retries=2).run(shared)
+        self.assertEqual(calls, [1, 2, 2, 3])
+        self.assertEqual([a["files"] for a in shared["abstractions"]], [[0], [1], [2]])
+
+        # Every shard keeps failing: each is called once per node attempt, not max_retries times per attempt
+        calls.clear()
+        with patch("nodes.call_llm", side_effect=lambda prompt, **kwargs: calls.append(0) or "```yaml\n- name: X\n```"):
+            with self.assertRaises(ValueError):
+                IdentifyAbstractions(max_retries=3).run(dict(shared, llm_workers=3))
+        self.assertEqual(len(calls), 3 * 3)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
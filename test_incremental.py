@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+测试增量生成：CombineTutorial写入清单，ReusePreviousPlan复用规划和未变化的章节
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from nodes import CombineTutorial, ReusePreviousPlan, WriteChapters
+from utils.disk_cache import content_hash
+from utils.tutorial_manifest import load_source_snapshot, source_snapshot_path
+
+
+def make_shared(output_dir, files):
+    return {
+        "project_name": "demo",
+        "output_dir": output_dir,
+        "language": "english",
+        "incremental": True,
+        "files": files,
+        "file_hashes": [content_hash(content) for _, content in files],
+        "abstractions": [
+            {"name": "Store", "description": "Stores.", "files": [0]},
+            {"name": "Engine", "description": "Runs.", "files": [1]},
+        ],
+        "relationships": {"summary": "Demo.", "details": [{"from": 1, "to": 0, "label": "Uses"}]},
+        "chapter_order": [1, 0],
+        "chapters": ["# Chapter 1: Engine\n\nEngine text.\n", "# Chapter 2: Store\n\nStore text."],
+    }
+
+
+class TestIncremental(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict("os.environ", {"CACHE_DIR": os.path.join(self.tmp.name, "cache")})
+        self.env.start()
+        self.extra = [(f"doc{i}.md", f"Doc {i}\n") for i in range(4)]
+        self.store_source = "".join(f"def get_{i}(key):\n    return {i}\n\n" for i in range(40))
+        self.files = [("store.py", self.store_source), ("engine.py", "class Engine: pass\n")] + self.extra
+        shared = make_shared(self.tmp.name, self.files)
+        shared["patch_chapters"] = True
+        CombineTutorial().run(shared)
+        self.output_path = shared["final_output_dir"]
+        with open(os.path.join(self.output_path, "02_store.md"), encoding="utf-8") as f:
+            self.store_chapter = f.read()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def _rerun(self, files):
+        # A fresh run: only the crawl results are known
+        shared = make_shared(self.tmp.name, files)
+        for key in ("abstractions", "relationships", "chapter_order", "chapters"):
+            shared.pop(key)
+        shared["patch_chapters"] = True
+        action = ReusePreviousPlan().run(shared)
+        return action, shared
+
+    def test_reuses_unchanged_chapters(self):
+        """测试只有源文件变化的章节需要重写，未变化章节原样复用"""
+        changed = [("engine.py", "class Engine:\n    pass\n"), ("store.py", self.store_source)] + self.extra
+        action, shared = self._rerun(changed)
+        self.assertEqual(action, "reuse")
+        # File indices are remapped to the new crawl order
+        self.assertEqual(shared["abstractions"][0]["files"], [1])
+        self.assertEqual(shared["chapter_order"], [1, 0])
+        self.assertIsNone(shared["chapters_in_progress"][0])
+        self.assertEqual(shared["chapters_in_progress"][1], "# Chapter 2: Store\n\nStore text.\n\n")
+
+        # Writing the reused content again gives the same file
+        shared["chapters"] = ["# Chapter 1: Engine\n\nNew engine text.\n", shared["chapters_in_progress"][1]]
+        CombineTutorial().run(shared)
+        with open(os.path.join(self.output_path, "02_store.md"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), self.store_chapter)
+
+    def test_patches_slightly_changed_chapters(self):
+        """测试源文件小改动时用diff更新章节，而不是重写"""
+        store_source = self.store_source.replace("return 7\n", "return 70\n")
+        action, shared = self._rerun(
+            [("store.py", store_source), ("engine.py", "class Engine: pass\n")] + self.extra
+        )
+        self.assertEqual(action, "reuse")
+        self.assertIsNone(shared["chapters_in_progress"][1])
+        chapter_patch = shared["chapter_patches"][1]
+        self.assertIn("-    return 7\n+    return 70\n", chapter_patch["diff"])
+        self.assertTrue(chapter_patch["previous_chapter"].startswith("# Chapter 2: Store"))
+
+        shared["patch_chapters"] = True
+        updated = "# Chapter 2: Store\n\nStore text, updated.\n"
+        with patch("nodes.call_llm", return_value=updated) as mock_llm:
+            WriteChapters().run(shared)
+        self.assertEqual(mock_llm.call_count, 1)
+        prompt = mock_llm.call_args[0][0]
+        self.assertIn("unified diff", prompt)
+        self.assertNotIn("def get_0", prompt)  # Only the diff, not the whole file
+        self.assertEqual(shared["chapters"][1], updated)
+        self.assertNotIn("chapter_patches", shared)
+
+    def test_source_snapshot_stays_out_of_the_tutorial(self):
+        """测试源文件快照保存在缓存目录而不是发布的教程目录中，且只在补丁模式下写入"""
+        self.assertEqual(load_source_snapshot(self.output_path)["engine.py"], "class Engine: pass\n")
+        self.assertTrue(source_snapshot_path(self.output_path).startswith(os.path.join(self.tmp.name, "cache")))
+        self.assertEqual(sorted(os.listdir(self.output_path)), [".manifest.json", "01_engine.md", "02_store.md", "index.md"])
+
+        other = make_shared(os.path.join(self.tmp.name, "other"), self.files)
+        CombineTutorial().run(other)
+        self.assertFalse(os.path.exists(source_snapshot_path(other["final_output_dir"])))
+
+    def test_falls_back_when_planned_file_removed(self):
+        """测试规划引用的文件被删除时完整重新生成"""
+        action, shared = self._rerun([("engine.py", "class Engine: pass\n")] + self.extra)
+        self.assertIsNone(action)
+        self.assertNotIn("chapters_in_progress", shared)
+
+    def test_disabled_by_default(self):
+        """测试未开启增量模式时不复用"""
+        shared = make_shared(self.tmp.name, self.files)
+        shared["incremental"] = False
+        self.assertIsNone(ReusePreviousPlan().run(shared))
+
+
+if __name__ == "__main__":
+    unittest.main()
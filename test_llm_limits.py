@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+测试call_llm的停止序列、num_predict上限以及截断遥测记录
+"""
+
+import unittest
+from unittest.mock import patch, MagicMock
+from ollama import ChatResponse
+
+from utils.call_llm import call_llm
+from utils.telemetry import start_run
+from nodes import IdentifyAbstractions, parse_abstractions_response
+
+
+def make_response(content, done_reason="stop", prompt_tokens=100, completion_tokens=20):
+    return ChatResponse(
+        model="test",
+        done=True,
+        done_reason=done_reason,
+        prompt_eval_count=prompt_tokens,
+        eval_count=completion_tokens,
+        message={"role": "assistant", "content": content},
+    )
+
+
+class TestLLMLimits(unittest.TestCase):
+
+    def test_options_passed_through(self):
+        """测试stop和num_predict被传递给Ollama"""
+        client = MagicMock()
+        client.chat.return_value = make_response("```yaml\n- 1\n")
+        with patch("utils.call_llm.ollama.Client", return_value=client):
+            call_llm("prompt", stop=["\n```\n"], num_predict=128, node="Test")
+
+        options = client.chat.call_args.kwargs["options"]
+        self.assertEqual(options["stop"], ["\n```\n"])
+        self.assertEqual(options["num_predict"], 128)
+
+    def test_no_limits_by_default(self):
+        """测试未指定时不设置限制"""
+        client = MagicMock()
+        client.chat.return_value = make_response("ok")
+        with patch("utils.call_llm.ollama.Client", return_value=client):
+            call_llm("prompt")
+
+        options = client.chat.call_args.kwargs["options"]
+        self.assertNotIn("stop", options)
+        self.assertNotIn("num_predict", options)
+
+    def test_truncation_recorded(self):
+        """测试达到num_predict上限时记录截断并输出警告"""
+        telemetry = start_run()
+        client = MagicMock()
+        client.chat.side_effect = [
+            make_response("partial", done_reason="length", completion_tokens=64),
+            make_response("complete"),
+        ]
+        # assertLogs swaps the logger's file handler out, so nothing reaches LOG_DIR
+        with patch("utils.call_llm.ollama.Client", return_value=client), self.assertLogs("llm_logger", "WARNING") as logs:
+            call_llm("prompt", num_predict=64, node="WriteChapters")
+            call_llm("prompt", node="OrderChapters")
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("WriteChapters truncated at num_predict=64", logs.output[0])
+
+        summary = telemetry.summary()
+        self.assertEqual(summary["total"]["calls"], 2)
+        self.assertEqual(summary["total"]["truncated"], 1)
+        self.assertEqual(summary["nodes"]["WriteChapters"]["truncated"], 1)
+        self.assertEqual(summary["nodes"]["WriteChapters"]["completion_tokens"], 64)
+        self.assertEqual(summary["nodes"]["OrderChapters"]["truncated"], 0)
+
+    def test_yaml_stop_does_not_match_opening_fence(self):
+        """测试YAML停止序列不会匹配开头的```yaml"""
+        for stop in IdentifyAbstractions.stop_sequences:
+            self.assertNotIn(stop, "Here you go:\n```yaml\n- name: x\n")
+            self.assertIn(stop, "- name: x\n```\nSome commentary\n")
+
+    def test_fenced_block_before_yaml(self):
+        """测试YAML之前有代码块时，停止序列截断的响应给出明确的ValueError，完整响应仍可解析"""
+        code = "The entry point:\n```python\nmain()\n```\n"
+        yaml_block = "```yaml\n- name: Flow\n  description: Runs nodes\n  file_indices: [0]\n```\n"
+        # Generation ends at the stop sequence, so the stopped response has no ```yaml block
+        stopped = code.split(IdentifyAbstractions.stop_sequences[0])[0]
+        with self.assertRaisesRegex(ValueError, "no ```yaml block in response"):
+            parse_abstractions_response(stopped, 1)
+        parsed = parse_abstractions_response(code + yaml_block, 1)
+        self.assertEqual([a["name"] for a in parsed], ["Flow"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
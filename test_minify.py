@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+测试源文件精简：删除许可证头、分隔线、注释和文档字符串，按阶段配置精简方式，并按文件类型统计节省的token
+"""
+
+import ast
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from nodes import WriteChapters, get_planning_content_for_indices, get_stage_files
+from utils.minify import minify_code, minify_files
+
+PYTHON = '''#!/usr/bin/env python
+# Copyright 2024 Example Inc.
+# Licensed under the Apache License, Version 2.0
+
+
+"""Record storage."""
+import os  # Paths
+
+# ==========================
+class Store:
+    """Saves records."""
+
+    def save(self, record):  # Public
+        path = "#records"
+        return path
+
+
+    def load(self):
+        """Not written yet."""
+'''
+
+TYPESCRIPT = '''/*
+ * Copyright (c) Example. MIT License.
+ */
+/** Adds two numbers. */
+export function add(a: number, b: number) { // sum
+  const url = "http://example.com"; /* inline */
+  return a + b;
+}
+'''
+
+
+class TestMinifyCode(unittest.TestCase):
+
+    def test_python_modes(self):
+        """测试Python各模式：whitespace保留注释，comments保留文档字符串，all只剩代码"""
+        self.assertEqual(
+            minify_code("store.py", PYTHON, "whitespace"),
+            '#!/usr/bin/env python\n\n"""Record storage."""\nimport os  # Paths\n\nclass Store:\n'
+            '    """Saves records."""\n\n    def save(self, record):  # Public\n        path = "#records"\n'
+            '        return path\n\n    def load(self):\n        """Not written yet."""\n',
+        )
+        self.assertEqual(
+            minify_code("store.py", PYTHON, "comments"),
+            '"""Record storage."""\nimport os\n\nclass Store:\n    """Saves records."""\n\n'
+            '    def save(self, record):\n        path = "#records"\n        return path\n\n'
+            '    def load(self):\n        """Not written yet."""\n',
+        )
+        # A docstring that is the whole body becomes "...", so the code stays valid
+        self.assertEqual(
+            minify_code("store.py", PYTHON, "all"),
+            'import os\n\nclass Store:\n\n    def save(self, record):\n        path = "#records"\n'
+            "        return path\n\n    def load(self):\n        ...\n",
+        )
+        self.assertIs(minify_code("store.py", PYTHON, "none"), PYTHON)
+
+    def test_strings_are_left_alone(self):
+        """测试多行字符串内的尾随空白、连续空行和分隔线不被修改，代码的语法树不变"""
+        code = 'USAGE = """\nusage:   \n\n\n# ==========\n"""\n\n\n\nx = 1   \n'
+        for mode in ("whitespace", "comments"):
+            minified = minify_code("cli.py", code, mode)
+            self.assertEqual(minified, 'USAGE = """\nusage:   \n\n\n# ==========\n"""\n\nx = 1\n')
+            self.assertEqual(ast.dump(ast.parse(minified)), ast.dump(ast.parse(code)))
+        template = "const help = `\nusage:  \n\n\n`;   \n"
+        self.assertEqual(minify_code("cli.js", template, "whitespace"), "const help = `\nusage:  \n\n\n`;\n")
+
+    def test_c_family_doc_comments(self):
+        """测试C系语言：字符串中的注释符号不受影响，comments模式保留文档注释"""
+        self.assertEqual(
+            minify_code("math.ts", TYPESCRIPT, "comments"),
+            "/** Adds two numbers. */\nexport function add(a: number, b: number) {\n"
+            '  const url = "http://example.com";\n  return a + b;\n}\n',
+        )
+        self.assertTrue(minify_code("math.ts", TYPESCRIPT, "all").startswith("export function add"))
+
+    def test_implicit_concatenation_is_kept(self):
+        """测试括号内独占一行的字符串不会被当作文档字符串删除"""
+        code = 'message = (\n    "part one "\n    "part two"\n)\n'
+        self.assertEqual(minify_code("a.py", code, "all"), code)
+
+    def test_unknown_files_only_lose_whitespace(self):
+        """测试未知语言的文件只清理空白，不删除内容"""
+        notes = "# Title   \n\n\n\nSome text.\n# ==========\n"
+        self.assertEqual(minify_code("notes.md", notes, "all"), "# Title\n\nSome text.\n# ==========\n")
+
+    def test_savings_by_file_type(self):
+        """测试按文件扩展名统计精简前后的token数"""
+        _, savings = minify_files(
+            [("a.py", PYTHON), ("b.py", PYTHON), ("math.ts", TYPESCRIPT), ("Makefile", "all:\n\n\n\tgo build\n")],
+            "all",
+        )
+        self.assertEqual(set(savings), {".py", ".ts", "(none)"})
+        self.assertEqual(savings[".py"]["files"], 2)
+        self.assertLess(savings[".py"]["minified_tokens"], savings[".py"]["raw_tokens"] * 0.6)
+
+
+class TestStageMinification(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = patch.dict("os.environ", {"CACHE_DIR": self.cache_dir.name})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.cache_dir.cleanup()
+
+    def make_shared(self, **options):
+        return {
+            "project_name": "demo",
+            "files": [("store.py", PYTHON)],
+            "abstractions": [{"name": "Store", "description": "Stores.", "files": [0]}],
+            "chapter_order": [0],
+            **options,
+        }
+
+    def test_stages_use_their_own_mode(self):
+        """测试规划和章节阶段分别使用各自的精简方式，并记录节省情况"""
+        shared = self.make_shared(minify_planning="all", minify_chapters="comments")
+        self.assertNotIn('"""Saves records."""', get_planning_content_for_indices(shared, [0])["0 # store.py"])
+        self.assertIn('"""Saves records."""', get_stage_files(shared, "chapters")[0][1])
+        self.assertEqual(set(shared["minify_savings"]), {"planning", "chapters"})
+        # The default leaves the files as crawled
+        unminified = self.make_shared()
+        self.assertIs(get_stage_files(unminified, "planning"), unminified["files"])
+        self.assertNotIn("minify_savings", unminified)
+
+    def test_chapter_prompt_and_cache_key(self):
+        """测试章节提示词使用精简后的代码，且精简方式参与章节缓存键"""
+        shared = self.make_shared(minify_chapters="comments")
+        with patch("nodes.call_llm", return_value="# Chapter 1: Store\n\nText.\n") as mock_llm:
+            WriteChapters().run(shared)
+        prompt = mock_llm.call_args[0][0]
+        self.assertIn('"""Saves records."""', prompt)
+        self.assertNotIn("Apache License", prompt)
+
+        with patch("nodes.call_llm", return_value="# Chapter 1: Store\n\nText.\n") as mock_llm:
+            WriteChapters().run(self.make_shared())
+        self.assertEqual(mock_llm.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+测试并行章节生成的辅助函数
+"""
+
+import time
+import unittest
+
+from utils.concurrency import map_concurrently
+from utils.telemetry import start_run, current_run
+from nodes import build_planned_chapter_context
+
+
+class TestParallelChapters(unittest.TestCase):
+
+    def test_results_keep_input_order(self):
+        """测试并发执行后结果顺序与输入一致"""
+        def slow_square(x):
+            time.sleep(0.01 * (5 - x))
+            return x * x
+
+        self.assertEqual(map_concurrently(slow_square, range(5), max_workers=5), [0, 1, 4, 9, 16])
+
+    def test_telemetry_follows_tasks(self):
+        """测试工作线程中的调用记录到当前运行的遥测中"""
+        telemetry = start_run()
+        map_concurrently(lambda i: current_run().record_llm_call({"node": "T"}), range(4), max_workers=4)
+        self.assertEqual(telemetry.summary()["total"]["calls"], 4)
+
+    def test_planned_context(self):
+        """测试根据章节规划生成上下文"""
+        abstractions = [
+            {"name": "Engine", "description": "Runs\nthings."},
+            {"name": "Store", "description": "Keeps data."},
+            {"name": "Helper", "description": "Small utilities."},
+        ]
+        chapter_filenames = {
+            1: {"num": 1, "name": "Store", "filename": "01_store.md"},
+            0: {"num": 2, "name": "Engine", "filename": "02_engine.md"},
+            2: {"num": 3, "name": "Helper", "filename": "03_helper.md"},
+        }
+        self.assertEqual(build_planned_chapter_context([], abstractions, chapter_filenames, None), "")
+
+        context = build_planned_chapter_context([1], abstractions, chapter_filenames, chapter_filenames[2])
+        self.assertIn("Chapter 1: [Store](01_store.md) - Keeps data.", context)
+        self.assertIn("Next chapter: [Helper](03_helper.md)", context)
+        self.assertNotIn("Engine", context)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
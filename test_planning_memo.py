@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+测试规划阶段的跨运行记忆：输入不变时直接复用结果，跳过提示构建和LLM调用
+"""
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from nodes import IdentifyAbstractions, OrderChapters
+
+IDENTIFY_RESPONSE = """```yaml
+- name: |
+    Store
+  description: |
+    Keeps data.
+  file_indices:
+    - 0 # store.py
+- name: |
+    Engine
+  description: |
+    Runs things.
+  file_indices:
+    - 1 # engine.py
+```"""
+
+
+def make_shared(engine_source="class Engine: pass\n"):
+    return {
+        "project_name": "demo",
+        "language": "english",
+        "max_abstraction_num": 5,
+        "files": [("store.py", "class Store: pass\n"), ("engine.py", engine_source)],
+    }
+
+
+class TestPlanningMemo(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = patch.dict("os.environ", {"CACHE_DIR": self.cache_dir.name})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.cache_dir.cleanup()
+
+    def _identify(self, shared):
+        with patch("nodes.call_llm", return_value=IDENTIFY_RESPONSE) as mock_llm:
+            IdentifyAbstractions().run(shared)
+        return mock_llm.call_count
+
+    def test_hit_skips_the_node(self):
+        """测试相同输入的第二次运行不构建提示，直接得到相同的结果"""
+        first = make_shared()
+        self.assertEqual(self._identify(first), 1)
+        self.assertEqual([a["files"] for a in first["abstractions"]], [[0], [1]])
+
+        second = make_shared()
+        with patch.object(IdentifyAbstractions, "prep") as mock_prep:
+            self.assertEqual(self._identify(second), 0)
+        mock_prep.assert_not_called()
+        self.assertEqual(second["abstractions"], first["abstractions"])
+
+    def test_changed_inputs_miss(self):
+        """测试文件内容、选项变化或关闭记忆时重新计算"""
+        self._identify(make_shared())
+        self.assertEqual(self._identify(make_shared(engine_source="class Engine:\n    pass\n")), 1)
+
+        more = make_shared()
+        more["max_abstraction_num"] = 8
+        self.assertEqual(self._identify(more), 1)
+
+        no_memo = make_shared()
+        no_memo["use_memo"] = False
+        self.assertEqual(self._identify(no_memo), 1)
+
+    def test_disabled_memo_is_not_written(self):
+        """测试关闭记忆或缓存时不写入记忆，之后开启时仍重新计算"""
+        for option in ("use_memo", "use_cache"):
+            disabled = make_shared()
+            disabled[option] = False
+            self.assertEqual(self._identify(disabled), 1)
+        self.assertEqual(self._identify(make_shared()), 1)
+
+    def test_upstream_results_are_part_of_the_key(self):
+        """测试后续规划节点的键包含前序节点的结果"""
+        shared = make_shared()
+        shared["abstractions"] = [
+            {"name": "Store", "description": "d", "files": [0]},
+            {"name": "Engine", "description": "d", "files": [1]},
+        ]
+        shared["relationships"] = {"summary": "s", "details": [{"from": 1, "to": 0, "label": "Uses"}]}
+        shared["order_strategy"] = "graph"
+        node = OrderChapters()
+        key = node.memo_key(shared)
+        shared["chapters"] = ["Not an input of OrderChapters"]
+        self.assertEqual(node.memo_key(shared), key)
+        shared["relationships"]["details"] = []
+        self.assertNotEqual(node.memo_key(shared), key)
+
+
+if __name__ == "__main__":
+    unittest.main()
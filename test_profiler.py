@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+测试流程性能分析：每个步骤和批处理项的计时、LLM时间、Chrome trace导出
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from pocketflow import Node, BatchNode
+from flow import CheckpointFlow
+from utils.concurrency import map_concurrently
+from utils.profiler import FlowProfiler, approximate_size
+from utils.telemetry import start_run, current_run, current_span
+
+
+class Load(Node):
+    def post(self, shared, prep_res, exec_res):
+        shared["data"] = "x" * 1000
+
+
+class Write(BatchNode):
+    def prep(self, shared):
+        return [{"chapter_num": 1}, {"chapter_num": 2}]
+
+    def exec(self, item):
+        current_run().record_llm_call(
+            {"node": "Write", "seconds": 0.5, "span": current_span()}
+        )
+        return item["chapter_num"]
+
+    def post(self, shared, prep_res, exec_res):
+        shared["written"] = exec_res
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_profiled_flow(self):
+        """测试每个节点的prep/exec/post和每个批处理项都被记录"""
+        start_run()
+        profiler = FlowProfiler()
+        load = Load()
+        load >> Write()
+        shared = {"_profiler": profiler}
+        CheckpointFlow(start=load).run(shared)
+
+        self.assertEqual(shared["written"], [1, 2])
+        summary = profiler.summary()
+        self.assertEqual(list(summary["nodes"]), ["Load", "Write"])
+        write = summary["nodes"]["Write"]
+        self.assertEqual(write["items"], 2)
+        self.assertEqual(write["llm_calls"], 2)
+        self.assertAlmostEqual(write["llm_seconds"], 1.0)
+        self.assertEqual(set(write["phases"]), {"prep", "exec", "post"})
+        self.assertGreaterEqual(summary["nodes"]["Load"]["shared_bytes"], 1000)
+        self.assertIn("Write item 1", profiler.format_summary())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            trace_path, summary_path = profiler.write(tmp)
+            with open(trace_path, encoding="utf-8") as f:
+                trace = json.load(f)
+            self.assertTrue(os.path.exists(summary_path))
+        names = [event["name"] for event in trace["traceEvents"]]
+        self.assertIn("Load.prep", names)
+        self.assertIn("Write.item 2", names)
+        self.assertTrue(all(event["ph"] == "X" for event in trace["traceEvents"]))
+
+    def test_item_calls_from_worker_threads(self):
+        """测试批处理项在线程池中发起的LLM调用（如章节小节）也计入该项"""
+        class WriteSections(Write):
+            def exec(self, item):
+                def section(seconds):
+                    current_run().record_llm_call({"node": "WriteSections", "seconds": seconds, "span": current_span()})
+
+                map_concurrently(section, [item["chapter_num"]] * 3, max_workers=3)
+                return item["chapter_num"]
+
+        start_run()
+        profiler = FlowProfiler()
+        CheckpointFlow(start=WriteSections()).run({"_profiler": profiler})
+        items = {e["phase"]: e for e in profiler.events if e["phase"].startswith("item")}
+        self.assertEqual(items["item 1"]["llm_calls"], 3)
+        self.assertAlmostEqual(items["item 2"]["llm_seconds"], 6.0)
+        self.assertEqual(profiler.summary()["nodes"]["WriteSections"]["llm_calls"], 6)
+
+    def test_errors_are_recorded(self):
+        """测试失败的步骤也会记录耗时和异常类型"""
+        class Broken(Node):
+            def exec(self, prep_res):
+                raise RuntimeError("boom")
+
+        profiler = FlowProfiler()
+        with self.assertRaises(RuntimeError):
+            CheckpointFlow(start=Broken()).run({"_profiler": profiler})
+        self.assertEqual(profiler.events[-1]["error"], "RuntimeError")
+
+    def test_approximate_size(self):
+        """测试共享数据大小估算会跳过运行时对象"""
+        self.assertEqual(approximate_size({"a": "xyz", "_profiler": "x" * 100}), 4)
+        self.assertEqual(approximate_size([("p", "12"), 3]), 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
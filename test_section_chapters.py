@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+测试分节生成章节：先生成章节大纲，再并发编写各小节，最后按大纲顺序拼接并添加标题和前后章节链接
+"""
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from nodes import WriteChapters, parse_section_outline
+
+OUTLINE = """```yaml
+introduction: |
+  After the store, we look at the engine.
+sections:
+  - title: |
+      Why an Engine?
+    covers: |
+      The problem it solves.
+  - title: |
+      Under the Hood
+    covers: |
+      How run() calls the store.
+conclusion: |
+  The engine ties everything together.
+```"""
+
+
+def fake_llm(prompt, **kwargs):
+    if "Format the output as YAML" in prompt:
+        return OUTLINE
+    if 'section "Why an Engine?"' in prompt:
+        return "## Motivation\n\nEngines run queries."
+    return "Step by step, `run()` calls the store."
+
+
+def make_shared(**options):
+    return {
+        "project_name": "demo",
+        "files": [("store.py", "class Store: pass\n"), ("engine.py", "class Engine: pass\n")],
+        "abstractions": [
+            {"name": "Store", "description": "Stores.", "files": [0]},
+            {"name": "Engine", "description": "Runs.", "files": [1]},
+            {"name": "Api", "description": "Serves.", "files": [1]},
+        ],
+        "chapter_order": [0, 1, 2],
+        "chapter_generation": "sections",
+        **options,
+    }
+
+
+class TestSectionChapters(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = patch.dict("os.environ", {"CACHE_DIR": self.cache_dir.name})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.cache_dir.cleanup()
+
+    def test_chapter_is_assembled_from_sections(self):
+        """测试每章一次大纲调用加每节一次调用，按大纲顺序拼接，标题和导航链接由代码生成"""
+        shared = make_shared()
+        with patch("nodes.call_llm", side_effect=fake_llm) as mock_llm:
+            WriteChapters().run(shared)
+        self.assertEqual(mock_llm.call_count, 9)
+        self.assertEqual(
+            shared["chapters"][1],
+            "# Chapter 2: Engine\n\n"
+            "After the store, we look at the engine.\n\n"
+            "## Why an Engine?\n\nEngines run queries.\n\n"
+            "## Under the Hood\n\nStep by step, `run()` calls the store.\n\n"
+            "The engine ties everything together.\n\n"
+            "← [Store](01_store.md) | [Api](03_api.md) →",
+        )
+        self.assertTrue(shared["chapters"][0].endswith("\n\n[Engine](02_engine.md) →"))
+        self.assertTrue(shared["chapters"][2].endswith("\n\n← [Engine](02_engine.md)"))
+
+    def test_invalid_outline_is_rejected(self):
+        """测试大纲缺少小节或超过小节上限时抛出异常，以便节点重试"""
+        with self.assertRaises(ValueError):
+            parse_section_outline(OUTLINE.replace("sections:", "parts:"), 6)
+        with self.assertRaises(ValueError):
+            parse_section_outline(OUTLINE, 1)
+        outline = parse_section_outline(OUTLINE, 6)
+        self.assertEqual([s["title"] for s in outline["sections"]], ["Why an Engine?", "Under the Hood"])
+
+    def test_modes_do_not_share_the_chapter_cache(self):
+        """测试两种生成方式使用不同的章节缓存"""
+        with patch("nodes.call_llm", side_effect=fake_llm):
+            WriteChapters().run(make_shared())
+        shared = make_shared(chapter_generation="single")
+        with patch("nodes.call_llm", return_value="# Chapter 1: Store\n\nText.\n") as mock_llm:
+            WriteChapters().run(shared)
+        self.assertEqual(mock_llm.call_count, 3)
+
+        with patch("nodes.call_llm") as mock_llm:
+            WriteChapters().run(make_shared())
+        mock_llm.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
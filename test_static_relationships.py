@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+测试根据导入关系静态计算抽象概念之间的依赖（hints / static 模式）
+"""
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from utils.import_graph import abstraction_edges
+from nodes import AnalyzeRelationships
+
+FILES = [
+    ("app/cli.py", "from app.engine import run\n"),
+    ("app/engine.py", "from app.store import Store\nfrom app.util import helper\n"),
+    ("app/store.py", "from app.util import helper\n"),
+    ("app/util.py", "def helper():\n    return 1\n"),
+]
+
+ABSTRACTIONS = [
+    {"name": "CLI", "description": "Command line.", "files": [0]},
+    {"name": "Engine", "description": "Runs things.", "files": [1, 3]},
+    {"name": "Storage", "description": "Stores things.", "files": [2, 3]},
+]
+
+# For each file index, the file indices it imports
+IMPORT_GRAPH = [[1], [2, 3], [3], []]
+
+
+class TestStaticRelationships(unittest.TestCase):
+
+    def setUp(self):
+        # Planning results are memoized on disk; keep them out of the working tree
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = patch.dict("os.environ", {"CACHE_DIR": self.cache_dir.name})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.cache_dir.cleanup()
+
+    def test_abstraction_edges(self):
+        """测试文件级导入关系汇总为抽象概念之间的边，共享文件不产生边"""
+        edges = abstraction_edges(ABSTRACTIONS, IMPORT_GRAPH)
+        pairs = {(e["from"], e["to"]): e for e in edges}
+        self.assertEqual(set(pairs), {(0, 1), (1, 2), (2, 1)})
+        self.assertEqual(pairs[(1, 2)]["example"], (1, 2))
+        self.assertEqual(len(abstraction_edges(ABSTRACTIONS, IMPORT_GRAPH, max_edges=1)), 1)
+
+    def _shared(self, mode):
+        return {
+            "files": FILES,
+            "abstractions": ABSTRACTIONS,
+            "import_graph": IMPORT_GRAPH,
+            "project_name": "app",
+            "language": "english",
+            "use_cache": False,
+            "relationships_mode": mode,
+        }
+
+    def test_static_mode_labels_edges(self):
+        """测试static模式只让LLM生成摘要和标签，边来自静态分析"""
+        response = (
+            "```yaml\nsummary: |\n  An app.\nlabels:\n"
+            "  - edge: 0\n    label: \"Runs\"\n  - edge: 1\n    label: \"Saves with\"\n```"
+        )
+        node = AnalyzeRelationships()
+        with patch("nodes.call_llm", return_value=response) as mock_llm:
+            shared = self._shared("static")
+            node.run(shared)
+        prompt = mock_llm.call_args[0][0]
+        self.assertIn("Edge 0:", prompt)
+        self.assertNotIn("--- File:", prompt)
+        details = shared["relationships"]["details"]
+        self.assertEqual(len(details), 3)
+        self.assertEqual(
+            [d["label"] for d in details], ["Runs", "Saves with", "Uses"]
+        )
+        self.assertEqual(shared["relationships"]["summary"].strip(), "An app.")
+
+    def test_hints_mode_adds_static_edges_to_prompt(self):
+        """测试hints模式在提示词中加入静态依赖，并按常规方式解析LLM结果"""
+        response = (
+            "```yaml\nsummary: An app.\nrelationships:\n"
+            "  - from_abstraction: 0 # CLI\n    to_abstraction: 1 # Engine\n    label: Runs\n```"
+        )
+        node = AnalyzeRelationships()
+        with patch("nodes.call_llm", return_value=response) as mock_llm:
+            shared = self._shared("hints")
+            node.run(shared)
+        prompt = mock_llm.call_args[0][0]
+        self.assertIn("Static dependency hints", prompt)
+        self.assertIn("`app/cli.py` imports `app/engine.py`", prompt)
+        self.assertEqual(
+            shared["relationships"]["details"], [{"from": 0, "to": 1, "label": "Runs"}]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+测试符号索引：提取各语言的定义、统计文件间的引用，并为抽象概念补充定义文件
+"""
+
+import unittest
+
+from nodes import FetchRepo, IdentifyAbstractions, add_defining_files
+from utils.symbol_index import SymbolIndex, extract_definitions
+
+FILES = [
+    ("app/engine.py", "from app.store import RecordStore\n\nclass QueryEngine:\n    def run(self):\n        return RecordStore().load_all()\n"),
+    ("app/store.py", "MAX_RECORDS = 100\n\nclass RecordStore:\n    def load_all(self):\n        return format_record(None)\n"),
+    ("app/helpers.py", "def format_record(record):\n    return str(record)\n"),
+    ("web/client.ts", "export class ApiClient {}\nexport const fetchUser = async (id) => get(id);\n"),
+    ("cmd/main.go", "package main\n\ntype Server struct {}\n\nfunc (s *Server) Serve() {}\n"),
+    ("a/run.py", "def run():\n    pass\n"),
+    ("b/run.py", "def run():\n    pass\n"),
+    ("c/run.py", "def run():\n    pass\n"),
+    ("d/run.py", "def run():\n    pass\n"),
+]
+
+
+class TestSymbolIndex(unittest.TestCase):
+
+    def test_extract_definitions(self):
+        """测试按语言提取类、函数、类型和模块常量的定义"""
+        self.assertEqual(extract_definitions(*FILES[1]), ["RecordStore", "load_all", "MAX_RECORDS"])
+        self.assertEqual(extract_definitions(*FILES[3]), ["ApiClient", "fetchUser"])
+        self.assertEqual(extract_definitions(*FILES[4]), ["Serve", "Server"])
+        self.assertEqual(extract_definitions("notes.txt", "class Foo:"), [])
+
+    def test_definitions_and_references(self):
+        """测试定义和引用查找，定义过多的同名符号视为歧义被忽略"""
+        index = SymbolIndex.build(FILES)
+        self.assertEqual(index.defining_files("RecordStore"), [1])
+        self.assertEqual(index.defining_files("run"), [])  # Defined in five files
+        self.assertEqual(index.references[0], {"RecordStore", "load_all"})
+        self.assertEqual(index.references[1], {"format_record"})
+
+    def test_suggest_files(self):
+        """测试优先补充描述中提到的符号的定义文件，单个被使用的符号不足以补充文件"""
+        index = SymbolIndex.build(FILES)
+        suggestions = index.suggest_files("Query Engine\nRuns queries over the RecordStore.", [0], 3)
+        self.assertEqual(suggestions, [(1, ["RecordStore", "load_all"])])
+        # "record store" in prose maps to RecordStore too
+        self.assertEqual(index.suggest_files("record store", [], 3)[0][0], 1)
+        # store.py only uses format_record, which is not enough on its own
+        self.assertEqual(index.suggest_files("Storage", [1], 3), [])
+        self.assertEqual(index.suggest_files("Uses the ApiClient and the Server", [], 1), [(3, ["ApiClient"])])
+
+    def test_identify_abstractions_adds_defining_files(self):
+        """测试识别抽象概念后按预算补充定义文件，符号索引在首次使用时才建立"""
+        shared = {"files": FILES, "max_symbol_files": 2, "_symbol_index": SymbolIndex.build(FILES[:1])}
+        FetchRepo().post(shared, None, (FILES, {}))
+        self.assertNotIn("_symbol_index", shared)
+        abstractions = [
+            {"name": "Query Engine", "description": "Wraps the RecordStore.", "files": [0]},
+            {"name": "Client", "description": "Calls fetchUser.", "files": [3]},
+        ]
+        IdentifyAbstractions().post(shared, None, abstractions)
+        self.assertIn("_symbol_index", shared)
+        self.assertEqual(shared["abstractions"][0]["files"], [0, 1])
+        self.assertEqual(shared["abstractions"][1]["files"], [3])
+
+    def test_budget_zero_disables(self):
+        """测试预算为0时不修改文件列表，也不建立索引"""
+        shared = {"files": FILES}
+        abstractions = [{"name": "Engine", "description": "Uses RecordStore.", "files": [0]}]
+        self.assertEqual(add_defining_files(shared, abstractions, 0), 0)
+        self.assertEqual(abstractions[0]["files"], [0])
+        self.assertNotIn("_symbol_index", shared)
+
+
+if __name__ == "__main__":
+    unittest.main()
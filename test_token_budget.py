@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+测试任务token预算：按预算缩减规划参数、统计实际花费、预算用完后停止规划和编写剩余章节、并行章节预留预计花费
+"""
+
+import os
+import re
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import api_server
+from nodes import (
+    BUDGET_EXHAUSTED_NOTE,
+    AnalyzeRelationships,
+    FusedPlanner,
+    IdentifyAbstractions,
+    PlanTokenBudget,
+    WriteChapters,
+)
+from utils.telemetry import RunTelemetry, current_run
+from utils.token_budget import TokenBudget, TokenBudgetExceeded, plan_token_budget
+
+OPTIONS = {
+    "max_abstraction_num": 10,
+    "max_context_tokens": None,
+    "chapter_context_tokens": 16000,
+    "chapter_max_tokens": 8192,
+    "summarize_files": True,
+    "shard_tokens": 20000,
+    "languages": [],
+}
+
+
+class TestPlanTokenBudget(unittest.TestCase):
+
+    def test_generous_budget_changes_nothing(self):
+        """测试预算充足且代码库较小时不修改任何参数"""
+        self.assertEqual(plan_token_budget(10_000_000, 5000, dict(OPTIONS, summarize_files=False)), {})
+
+    def test_small_budget_shrinks_the_run(self):
+        """测试预算较小时缩减规划上下文、抽象数量、章节上下文和长度，并关闭预处理"""
+        changes = plan_token_budget(60000, 500000, OPTIONS)
+        self.assertEqual(changes["max_context_tokens"], 6000)
+        self.assertEqual(changes["max_abstraction_num"], 7)  # 42000 tokens for 6000-token chapters
+        self.assertFalse(changes["summarize_files"])
+        self.assertIsNone(changes["shard_tokens"])
+        self.assertEqual(changes["chapter_max_tokens"], 1500)
+        self.assertEqual(changes["chapter_context_tokens"], 2000)
+
+    def test_translations_leave_fewer_chapters(self):
+        """测试多语言时为翻译预留预算，章节数相应减少"""
+        single = plan_token_budget(80000, 100000, OPTIONS)
+        translated = plan_token_budget(80000, 100000, dict(OPTIONS, languages=["english", "chinese"]))
+        self.assertEqual(single["max_abstraction_num"], 9)
+        self.assertEqual(translated["max_abstraction_num"], 6)
+
+    def test_node_updates_shared(self):
+        """测试节点根据代码库大小更新共享参数，未设置预算时跳过"""
+        shared = {"files": [("big.py", "x = 1\n" * 40000)], "token_budget": 60000}
+        PlanTokenBudget().run(shared)
+        self.assertEqual(shared["max_context_tokens"], 6000)
+        self.assertEqual(shared["chapter_max_tokens"], 1500)
+
+        unlimited = {"files": [("big.py", "x = 1\n" * 40000)]}
+        PlanTokenBudget().run(unlimited)
+        self.assertNotIn("max_context_tokens", unlimited)
+
+
+class TestTokenSpend(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = patch.dict("os.environ", {"CACHE_DIR": self.cache_dir.name})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.cache_dir.cleanup()
+
+    def test_spend_comes_from_telemetry(self):
+        """测试实际花费来自LLM调用统计，并包含恢复前已花费的token"""
+        telemetry = RunTelemetry()
+        budget = TokenBudget(1000, telemetry, spent_before=300)
+        telemetry.record_llm_call({"prompt_tokens": 400, "completion_tokens": 200})
+        telemetry.record_llm_call({"prompt_tokens": None, "completion_tokens": None})
+        self.assertEqual(budget.usage(), {"budget": 1000, "spent": 900, "remaining": 100, "exhausted": False})
+        telemetry.record_llm_call({"prompt_tokens": 100, "completion_tokens": 50})
+        self.assertTrue(budget.exhausted())
+
+    def test_reservations(self):
+        """测试并发调用预留预计花费：无在途调用时只要求预算未用完，释放后可再次预留"""
+        telemetry = RunTelemetry()
+        budget = TokenBudget(1000, telemetry)
+        self.assertTrue(budget.reserve(1500))
+        self.assertFalse(budget.reserve(10))
+        budget.release(1500)
+        self.assertTrue(budget.reserve(600))
+        self.assertTrue(budget.reserve(400))
+        self.assertFalse(budget.reserve(1))
+        budget.release(600)
+        budget.release(400)
+        telemetry.record_llm_call({"prompt_tokens": 900, "completion_tokens": 100})
+        self.assertFalse(budget.reserve(1))
+
+    def test_planning_stops_when_budget_is_spent(self):
+        """测试预算用完后规划节点在调用LLM之前停止"""
+        telemetry = RunTelemetry()
+        telemetry.record_llm_call({"prompt_tokens": 900, "completion_tokens": 100})
+        shared = {
+            "project_name": "demo",
+            "files": [("store.py", "class Store: pass\n")],
+            "abstractions": [{"name": "Store", "description": "Stores.", "files": [0]}],
+            "planner": "fused",
+            "_token_budget": TokenBudget(1000, telemetry),
+        }
+        for node in (IdentifyAbstractions(), AnalyzeRelationships(), FusedPlanner()):
+            with patch("nodes.call_llm") as mock_llm:
+                with self.assertRaises(TokenBudgetExceeded):
+                    node.run(dict(shared))
+            mock_llm.assert_not_called()
+
+    def test_shards_stop_when_budget_is_spent(self):
+        """测试分片识别在预算用完后跳过剩余分片，用已读分片的结果规划且不写入记忆"""
+        telemetry = RunTelemetry()
+        shared = {
+            "project_name": "demo",
+            "files": [(f"pkg{i}/mod.py", "x = 1\n" * 60) for i in range(3)],
+            "shard_tokens": 150,
+            "llm_workers": 1,
+            "_token_budget": TokenBudget(1000, telemetry),
+        }
+
+        def fake_shard(prompt, **kwargs):
+            telemetry.record_llm_call({"prompt_tokens": 900, "completion_tokens": 100})
+            part = re.search(r"This is part (\d+) of 3", prompt).group(1)
+            return f"```yaml\n- name: Part {part}\n  description: D\n  file_indices:\n    - 0 # mod.py\n```"
+
+        with patch("nodes.call_llm", side_effect=fake_shard) as mock_llm:
+            IdentifyAbstractions().run(shared)
+        self.assertEqual(mock_llm.call_count, 1)
+        self.assertEqual(shared["abstractions"][0]["files"], [0])
+
+        # With a fresh budget, the next run reads every shard instead of the partial plan
+        shared["_token_budget"] = TokenBudget(100000, RunTelemetry())
+        with patch("nodes.call_llm", side_effect=fake_shard) as mock_llm:
+            IdentifyAbstractions().run(shared)
+        self.assertEqual(mock_llm.call_count, 3)
+
+    def test_parallel_chapters_reserve_their_cost(self):
+        """测试并行章节在开始前预留预计花费，预算只够一章时其余章节不再同时开始"""
+        telemetry = RunTelemetry()
+        shared = {
+            "project_name": "demo",
+            "files": [(f"m{i}.py", f"class M{i}: pass\n") for i in range(3)],
+            "abstractions": [{"name": f"M{i}", "description": "D.", "files": [i]} for i in range(3)],
+            "chapter_order": [0, 1, 2],
+            "parallel_chapters": True,
+            "llm_workers": 3,
+            "chapter_max_tokens": 3000,
+            "_token_budget": TokenBudget(10000, telemetry),
+        }
+
+        def slow_chapter(prompt, **kwargs):
+            time.sleep(0.2)  # Still in flight while the other workers try to start
+            telemetry.record_llm_call({"prompt_tokens": 3000, "completion_tokens": 1000})
+            return "# Chapter 1: M0\n\nText.\n"
+
+        with patch("nodes.call_llm", side_effect=slow_chapter) as mock_llm:
+            WriteChapters().run(shared)
+        self.assertEqual(mock_llm.call_count, 1)
+        self.assertEqual(len(shared["skipped_chapters"]), 2)
+
+    def test_api_reports_a_stop_on_budget(self):
+        """测试规划阶段因预算停止时，API任务标记为stopped并照常返回花费和调用统计"""
+
+        def run_out_of_budget(shared):
+            current_run().record_llm_call({"node": "IdentifyAbstractions", "prompt_tokens": 900, "completion_tokens": 100})
+            shared["_checkpoint"].save(shared)  # As the flow does after each node
+            shared["_token_budget"].check("AnalyzeRelationships")
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            request = api_server.TutorialRequest(local_dir=output_dir, output_dir=output_dir, token_budget=1000)
+            api_server.jobs["budget-job"] = {"status": "queued", "result": None, "error": None}
+            with patch("api_server.create_tutorial_flow") as create_flow:
+                create_flow.return_value.run.side_effect = run_out_of_budget
+                api_server.run_tutorial_generation("budget-job", request)
+            # Kept for a resume, unlike the checkpoint of a job that completes
+            self.assertEqual(len(os.listdir(os.path.join(output_dir, ".runs"))), 1)
+        job = api_server.jobs.pop("budget-job")
+        self.assertEqual(job["status"], "stopped")
+        self.assertIn("before AnalyzeRelationships", job["error"])
+        self.assertTrue(job["result"]["stopped_on_budget"])
+        self.assertEqual(job["result"]["token_usage"]["spent"], 1000)
+        self.assertEqual(job["result"]["llm_usage"]["total"]["calls"], 1)
+
+    def test_chapters_stop_when_budget_is_spent(self):
+        """测试预算用完后剩余章节不再调用LLM，保留标题和说明，且不写入章节缓存"""
+        telemetry = RunTelemetry()
+        shared = {
+            "project_name": "demo",
+            "files": [("store.py", "class Store: pass\n"), ("engine.py", "class Engine: pass\n")],
+            "abstractions": [
+                {"name": "Store", "description": "Stores.", "files": [0]},
+                {"name": "Engine", "description": "Runs.", "files": [1]},
+            ],
+            "chapter_order": [0, 1],
+            "_token_budget": TokenBudget(500, telemetry),
+        }
+
+        def fake_chapter(prompt, **kwargs):
+            telemetry.record_llm_call({"prompt_tokens": 450, "completion_tokens": 100})
+            return "# Chapter 1: Store\n\nText.\n"
+
+        with patch("nodes.call_llm", side_effect=fake_chapter) as mock_llm:
+            WriteChapters().run(shared)
+        self.assertEqual(mock_llm.call_count, 1)
+        self.assertEqual(shared["skipped_chapters"], [2])
+        self.assertEqual(shared["chapters"][1], f"# Chapter 2: Engine\n\n{BUDGET_EXHAUSTED_NOTE}")
+
+        # With a fresh budget only the skipped chapter is written; the first comes from the cache
+        shared["_token_budget"] = TokenBudget(10000, RunTelemetry())
+        with patch("nodes.call_llm", side_effect=fake_chapter) as mock_llm:
+            WriteChapters().run(shared)
+        self.assertEqual(mock_llm.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
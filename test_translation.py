@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+测试多语言输出：教程只用主语言生成一次，再翻译为其他语言并写入各自的子目录
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from nodes import CombineTutorial, TranslateTutorial, TUTORIAL_FOOTER
+from utils.tutorial_manifest import load_manifest
+
+
+def make_shared(output_dir, languages):
+    return {
+        "project_name": "demo",
+        "output_dir": output_dir,
+        "language": languages[0],
+        "languages": languages,
+        "llm_workers": 2,
+        "files": [("store.py", "class Store: pass\n"), ("engine.py", "class Engine: pass\n")],
+        "abstractions": [
+            {"name": "Store", "description": "Stores.", "files": [0]},
+            {"name": "Engine", "description": "Runs.", "files": [1]},
+        ],
+        "relationships": {"summary": "Demo.", "details": [{"from": 1, "to": 0, "label": "Uses"}]},
+        "chapter_order": [1, 0],
+        "chapters": ["# Chapter 1: Engine\n\nEngine text.\n", "# Chapter 2: Store\n\nStore text."],
+    }
+
+
+def fake_translate(prompt, **kwargs):
+    page = prompt.split("\nPage:\n", 1)[1].strip()
+    return f"[zh] {page}"
+
+
+class TestTranslation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_translates_into_language_directories(self):
+        """测试每种语言写入各自子目录，文件名与主语言一致，页脚不翻译"""
+        shared = make_shared(self.tmp.name, ["english", "chinese"])
+        CombineTutorial().run(shared)
+        english_dir = os.path.join(self.tmp.name, "demo", "english")
+        self.assertEqual(shared["final_output_dir"], english_dir)
+        self.assertIsNotNone(load_manifest(english_dir))
+
+        with patch("nodes.call_llm", side_effect=fake_translate) as mock_llm:
+            TranslateTutorial().run(shared)
+        self.assertEqual(mock_llm.call_count, 3)  # index.md and two chapters
+        prompt = mock_llm.call_args[0][0]
+        self.assertIn("from English to Chinese", prompt)
+        self.assertNotIn(TUTORIAL_FOOTER, prompt)
+
+        chinese_dir = os.path.join(self.tmp.name, "demo", "chinese")
+        self.assertEqual(shared["translated_output_dirs"], {"chinese": chinese_dir})
+        self.assertEqual(shared["final_output_dir"], os.path.join(self.tmp.name, "demo"))
+        self.assertEqual(
+            sorted(os.listdir(chinese_dir)), ["01_engine.md", "02_store.md", "index.md"]
+        )
+        with open(os.path.join(chinese_dir, "02_store.md"), encoding="utf-8") as f:
+            self.assertEqual(
+                f.read(), f"[zh] # Chapter 2: Store\n\nStore text.\n\n{TUTORIAL_FOOTER}"
+            )
+        with open(os.path.join(chinese_dir, "index.md"), encoding="utf-8") as f:
+            self.assertIn("(01_engine.md)", f.read())
+
+    def test_single_language_is_unchanged(self):
+        """测试单一语言时不翻译，输出目录保持原样"""
+        shared = make_shared(self.tmp.name, ["english"])
+        CombineTutorial().run(shared)
+        with patch("nodes.call_llm") as mock_llm:
+            TranslateTutorial().run(shared)
+        mock_llm.assert_not_called()
+        self.assertEqual(shared["final_output_dir"], os.path.join(self.tmp.name, "demo"))
+        self.assertNotIn("translated_output_dirs", shared)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+测试向量检索：代码分块的嵌入索引、按文件哈希缓存、批量余弦相似度检索章节上下文
+"""
+
+import re
+import tempfile
+import unittest
+import zlib
+from unittest.mock import patch
+
+import numpy as np
+
+from nodes import WriteChapters, retrieve_chapter_context
+from utils.vector_index import VectorIndex
+
+
+def fake_vector(text, dim=64):
+    # Bag of words hashed into a fixed number of dimensions
+    vector = np.zeros(dim)
+    for word in re.findall(r"[a-z]+", text.lower()):
+        vector[zlib.crc32(word.encode()) % dim] += 1.0
+    return vector.tolist()
+
+
+class FakeClient:
+    """Stand-in for the Ollama embed endpoint."""
+
+    calls = []
+
+    def __init__(self, host=None):
+        pass
+
+    def embed(self, model, input, truncate=None):
+        FakeClient.calls.append(list(input))
+        return {"embeddings": [fake_vector(text) for text in input], "prompt_eval_count": len(input)}
+
+
+FILES = [
+    ("store.py", "class Store:\n    def save(self, record):\n        pass\n"),
+    ("engine.py", "class Engine:\n    def run(self):\n        pass\n"),
+    ("helpers.py", "def format_record(record):\n    return str(record)\n"),
+]
+
+
+class TestVectorIndex(unittest.TestCase):
+
+    def setUp(self):
+        FakeClient.calls = []
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.patches = [
+            patch.dict("os.environ", {"CACHE_DIR": self.cache_dir.name}),
+            patch("utils.embeddings.ollama.Client", FakeClient),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.cache_dir.cleanup()
+
+    def test_build_and_search(self):
+        """测试批量检索返回最相似的代码块，且向量已归一化"""
+        index, hits = VectorIndex.build(FILES)
+        self.assertEqual(hits, 0)
+        self.assertEqual(index.chunks, [(0, 1, 3), (1, 1, 3), (2, 1, 2)])
+        self.assertEqual(index.matrix.dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(index.matrix, axis=1), 1.0, rtol=1e-5)
+
+        results = index.search(["Engine run", "record store save"], top_k=2)
+        self.assertEqual(results[0][0][0], 1)
+        self.assertEqual(results[1][0][0], 0)
+        self.assertEqual(len(results[1]), 2)
+
+    def test_embeddings_cached_by_file_hash(self):
+        """测试第二次构建只为变化的文件生成向量"""
+        VectorIndex.build(FILES)
+        FakeClient.calls = []
+        changed = FILES[:2] + [("helpers.py", "def format_record(record):\n    return repr(record)\n")]
+        index, hits = VectorIndex.build(changed)
+        self.assertEqual(hits, 2)
+        self.assertEqual(len(FakeClient.calls), 1)
+        self.assertEqual(len(FakeClient.calls[0]), 1)
+        self.assertIn("repr(record)", index.texts[2])
+
+    def test_chapter_context(self):
+        """测试每章的上下文来自整个代码库，包括抽象未列出的辅助文件"""
+        shared = {
+            "files": FILES,
+            "abstractions": [
+                {"name": "Store", "description": "Saves a record, formatted.", "files": [0]},
+                {"name": "Engine", "description": "Runs.", "files": [1]},
+            ],
+        }
+        retrieved = retrieve_chapter_context(shared, [0, 1], "embedding", top_k=2, max_tokens=1000)
+        self.assertIn("2 # helpers.py (lines 1-2)", retrieved[0])
+        self.assertIn("0 # store.py (lines 1-3)", retrieved[0])
+        # The index is built once per run and not checkpointed
+        self.assertIn("_retrieval_index_embedding", shared)
+        retrieve_chapter_context(shared, [1], "embedding", top_k=1, max_tokens=None)
+        self.assertEqual(len(FakeClient.calls), 3)  # The chunks once, then one batch of queries per call
+
+    def test_write_chapters_falls_back_without_endpoint(self):
+        """测试嵌入服务不可用时回退到抽象关联的文件"""
+        shared = {
+            "project_name": "demo",
+            "files": FILES,
+            "abstractions": [{"name": "Store", "description": "Saves.", "files": [0]}],
+            "chapter_order": [0],
+            "retrieval": "embedding",
+            "use_cache": False,
+        }
+        with patch("utils.embeddings.ollama.Client", side_effect=ConnectionError("refused")):
+            items = WriteChapters().prep(shared)
+        self.assertEqual(list(items[0]["related_files_content_map"]), ["0 # store.py"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+import re
+from collections import Counter
+
+import numpy as np
+
+from utils.chunking import split_into_chunks
+
+_IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_PART_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+# Identifiers repeat across a codebase, so their splits are computed once per process
+_SPLIT_CACHE = {}
+_SPLIT_CACHE_SIZE = 500000
+
+# Added to the score of chunks from files an abstraction already lists, relative to the best score
+OWN_FILE_BOOST = 0.1
+
+
+def split_identifier(identifier):
+    """
+    Index terms of one identifier: its camelCase / snake_case parts, lowercased,
+    plus the joined parts when there are several, so `get_user_name` and
+    `getUserName` share every term.
+
+    >>> split_identifier("parseHTTPResponse_v2")
+    ['parse', 'http', 'response', 'v2', 'parsehttpresponsev2']
+    """
+    parts = [
+        part.lower()
+        for segment in identifier.split("_")
+        for part in _PART_PATTERN.findall(segment)
+    ]
+    # Digits stay attached to the part before them ("v2", "utf8")
+    merged = []
+    for part in parts:
+        if part.isdigit() and merged:
+            merged[-1] += part
+        else:
+            merged.append(part)
+    terms = [part for part in merged if len(part) > 1]
+    if len(merged) > 1:
+        terms.append("".join(merged))
+    return terms
+
+
+def tokenize(text):
+    """Term frequencies of a text, with identifiers split into their parts."""
+    counts = Counter()
+    for identifier, count in Counter(_IDENTIFIER_PATTERN.findall(text)).items():
+        terms = _SPLIT_CACHE.get(identifier)
+        if terms is None:
+            if len(_SPLIT_CACHE) >= _SPLIT_CACHE_SIZE:
+                _SPLIT_CACHE.clear()
+            terms = _SPLIT_CACHE[identifier] = split_identifier(identifier)
+        for term in terms:
+            counts[term] += count
+    return counts
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over code chunks, for retrieval without an embedding model.
+
+    Postings are stored in CSR form: one array of chunk ids and one of
+    precomputed BM25 weights, sorted by term, with `offsets` marking where each
+    term's postings start. A query only adds up the weight slices of its terms
+    into a score vector. Same interface as VectorIndex: `chunks` holds
+    (file index, first line, last line), `texts` the chunk text.
+    """
+
+    def __init__(self, chunks, texts, vocabulary, offsets, postings, weights):
+        self.chunks = chunks
+        self.texts = texts
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.postings = postings
+        self.weights = weights
+        self.chunk_files = np.array([file_index for file_index, _, _ in chunks], dtype=np.int64)
+
+    @classmethod
+    def build(cls, files_data, chunk_tokens=400, k1=1.2, b=0.75):
+        """
+        Chunk every file and index the chunks.
+
+        Args:
+            files_data (list): (path, content) tuples.
+            chunk_tokens (int): Approximate chunk size.
+            k1 (float): Term frequency saturation.
+            b (float): Document length normalisation.
+
+        Returns:
+            BM25Index: The index.
+        """
+        # Pass 1, per chunk: count identifiers (Counter runs in C). Postings are
+        # collected per identifier; most identifiers occur in many chunks.
+        chunks, texts = [], []
+        names, counts, names_per_chunk = [], [], []
+        for file_index, (path, content) in enumerate(files_data):
+            for first, last, text in split_into_chunks(content, chunk_tokens):
+                chunks.append((file_index, first, last))
+                texts.append(text)
+                # The path is indexed with the chunk, so queries can match file names
+                chunk_counts = Counter(_IDENTIFIER_PATTERN.findall(f"{path}\n{text}"))
+                names.extend(chunk_counts)
+                counts.extend(chunk_counts.values())
+                names_per_chunk.append(len(chunk_counts))
+        identifiers = {name: i for i, name in enumerate(dict.fromkeys(names))}
+        identifier_ids = np.fromiter(map(identifiers.__getitem__, names), dtype=np.int64, count=len(names))
+        chunk_ids = np.repeat(np.arange(len(chunks)), names_per_chunk)
+        del names
+
+        # Pass 2, once per distinct identifier: split it into terms
+        vocabulary = {}
+        identifier_terms = []
+        terms_per_identifier = np.zeros(len(identifiers), dtype=np.int64)
+        for name, identifier_id in identifiers.items():
+            terms = [vocabulary.setdefault(term, len(vocabulary)) for term in split_identifier(name)]
+            identifier_terms.extend(terms)
+            terms_per_identifier[identifier_id] = len(terms)
+        identifier_terms = np.asarray(identifier_terms, dtype=np.int64)
+        identifier_offsets = np.concatenate(([0], np.cumsum(terms_per_identifier)))
+
+        # Pass 3, vectorised: expand identifier postings into term postings and sum the
+        # frequencies of a term coming from several identifiers of the same chunk
+        repeats = terms_per_identifier[identifier_ids]
+        expanded = np.repeat(np.arange(len(identifier_ids)), repeats)
+        within = np.arange(len(expanded)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        term_ids = identifier_terms[identifier_offsets[identifier_ids[expanded]] + within]
+        chunk_ids = chunk_ids[expanded]
+        counts = np.asarray(counts, dtype=np.float64)[expanded]
+
+        num_chunks = max(len(chunks), 1)
+        keys, inverse = np.unique(term_ids * num_chunks + chunk_ids, return_inverse=True)
+        frequencies = np.bincount(inverse.ravel(), weights=counts).astype(np.float32)
+        postings = keys % num_chunks  # Sorted by term, then chunk
+        document_frequency = np.bincount(keys // num_chunks, minlength=len(vocabulary))
+        offsets = np.concatenate(([0], np.cumsum(document_frequency)))
+
+        idf = np.log1p((num_chunks - document_frequency + 0.5) / (document_frequency + 0.5))
+        lengths = np.bincount(chunk_ids, weights=counts, minlength=len(chunks)).astype(np.float32)
+        average_length = float(lengths.mean()) if len(lengths) else 1.0
+        norms = k1 * (1 - b + b * lengths / max(average_length, 1e-9))
+        weights = (
+            np.repeat(idf, document_frequency).astype(np.float32)
+            * frequencies * (k1 + 1) / (frequencies + norms[postings])
+        )
+        return cls(chunks, texts, vocabulary, offsets, postings, weights.astype(np.float32))
+
+    def scores(self, query):
+        """BM25 score of every chunk for one query."""
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in tokenize(query):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            # A chunk appears at most once per term, so plain fancy-index addition is safe
+            scores[self.postings[start:end]] += self.weights[start:end]
+        return scores
+
+    def search(self, queries, top_k, boost_files=None):
+        """
+        Rank chunks for several queries.
+
+        Args:
+            queries (list of str): Query texts.
+            top_k (int): Number of best chunks returned per query.
+            boost_files (list, optional): Per query, file indices whose matching chunks get
+                                          a bonus (the files an abstraction already lists).
+
+        Returns:
+            list: Per query, [(chunk index, score)] best first; chunks without any
+                  query term are left out.
+        """
+        results = []
+        for position, query in enumerate(queries):
+            scores = self.scores(query)
+            if boost_files and boost_files[position] and scores.size:
+                own = np.isin(self.chunk_files, list(boost_files[position])) & (scores > 0)
+                scores[own] += OWN_FILE_BOOST * float(scores.max())
+            k = min(top_k, int(np.count_nonzero(scores)))
+            if k == 0:
+                results.append([])
+                continue
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best], kind="stable")]
+            results.append([(int(i), float(scores[i])) for i in best])
+        return results
@@ -3,8 +3,10 @@ import os
 import logging
 import json
 import re
+import time
 from datetime import datetime
 import ollama
+from utils.telemetry import current_run, current_span
 
 # Configure logging
 log_directory = os.getenv("LOG_DIR", "logs")
@@ -27,23 +29,40 @@ logger.addHandler(file_handler)
 cache_file = "llm_cache.json"
 
 
-def call_llm(prompt, use_cache: bool = True):
+def get_model_name():
+    """Name of the Ollama model used for generation."""
+    return os.getenv("OLLAMA_MODEL", "qwen3:8b")  # deepcoder:14b  gemma3:12b  phi4:14b Replace with your desired Ollama model name
+
+
+def call_llm(prompt, use_cache: bool = True, stop=None, num_predict=None, node=None):
     """
     Calls an Ollama model to generate a text response.
 
     Args:
         prompt (str): The prompt to send to the model.
         use_cache (bool, optional): Whether to use Ollama's caching mechanism. Defaults to True.
+        stop (list of str, optional): Stop sequences; generation ends as soon as one is produced.
+        num_predict (int, optional): Maximum number of tokens to generate.
+        node (str, optional): Name of the calling node, recorded in the run telemetry.
 
     Returns:
         str: The generated text response from the model.
     """
+    options = {
+        'use_cache': use_cache,
+    }
+    if stop:
+        options['stop'] = list(stop)
+    if num_predict:
+        options['num_predict'] = num_predict
+
     try:
         client = ollama.Client(
             host = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
         )
+        start_time = time.perf_counter()
         response = client.chat(
-            model=os.getenv("OLLAMA_MODEL", "qwen3:8b"),  # deepcoder:14b  gemma3:12b  phi4:14b Replace with your desired Ollama model name
+            model=get_model_name(),
             messages=[
                 {
                     'role': 'user',
@@ -51,12 +70,31 @@ def call_llm(prompt, use_cache: bool = True):
                 },
             ],
             stream=False, # important to set stream to false to get the response.
-            options = {
-                'use_cache': use_cache,
-            }
+            options = options
 
         )
+        elapsed = time.perf_counter() - start_time
         content = response['message']['content']
+
+        # "length" means the model was cut off by num_predict
+        truncated = response.get('done_reason') == 'length'
+        current_run().record_llm_call({
+            'node': node,
+            'prompt_chars': len(prompt),
+            'prompt_tokens': response.get('prompt_eval_count'),
+            'completion_tokens': response.get('eval_count'),
+            'num_predict': num_predict,
+            'stop': options.get('stop'),
+            'done_reason': response.get('done_reason'),
+            'truncated': truncated,
+            'seconds': elapsed,
+            'span': current_span(),  # Lets the profiler attribute calls made in worker threads
+        })
+        if truncated:
+            logger.warning(
+                f"Response of {node or 'call_llm'} truncated at num_predict={num_predict} "
+                f"({response.get('eval_count')} tokens generated)"
+            )
         
         # Remove <think></think> tags and their content
         cleaned_content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL)
@@ -0,0 +1,137 @@
+import re
+from collections import Counter
+
+from utils.token_count import estimate_tokens
+
+_HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_BOLD_PATTERN = re.compile(r"\*\*([^*\n]{2,60})\*\*")
+_CODE_SPAN_PATTERN = re.compile(r"`([^`\n]{2,60})`")
+_LINK_PATTERN = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[。！？])")
+
+
+def _prose_lines(chapter_content):
+    """Yield (line, in_code_block) for every line, tracking fenced code blocks."""
+    in_code = False
+    for line in chapter_content.splitlines():
+        if line.strip().startswith("```"):
+            in_code = not in_code
+            continue
+        yield line, in_code
+
+
+def make_chapter_digest(chapter_content, max_terms=8, max_summary_chars=400):
+    """
+    Build a compact digest of a written chapter.
+
+    The digest keeps what later chapters need to refer back to a chapter: its
+    title, section headings, the terms it emphasised (bold text and inline
+    code) and a short summary made of its opening sentences.
+
+    Args:
+        chapter_content (str): Markdown of the chapter.
+        max_terms (int): Maximum number of key terms to keep.
+        max_summary_chars (int): Maximum length of the summary.
+
+    Returns:
+        dict: {"title": str, "headings": [str], "key_terms": [str], "summary": str}
+    """
+    title = ""
+    headings = []
+    terms = Counter()
+    summary_parts = []
+    summary_length = 0
+
+    for line, in_code in _prose_lines(chapter_content):
+        if in_code:
+            continue
+        stripped = line.strip()
+        heading = _HEADING_PATTERN.match(stripped)
+        if heading:
+            if len(heading.group(1)) == 1 and not title:
+                title = heading.group(2)
+            else:
+                headings.append(heading.group(2))
+            continue
+
+        for term in _BOLD_PATTERN.findall(stripped) + _CODE_SPAN_PATTERN.findall(stripped):
+            terms[term.strip()] += 1
+
+        # Opening prose (not lists, tables, quotes or diagrams) forms the summary
+        if (
+            summary_length < max_summary_chars
+            and stripped
+            and not stripped.startswith(("-", "*", "|", ">", "<"))
+            and not re.match(r"^\d+\.", stripped)
+        ):
+            text = _LINK_PATTERN.sub(r"\1", stripped).replace("**", "")
+            for sentence in _SENTENCE_END.split(text):
+                if not sentence or summary_length >= max_summary_chars:
+                    continue
+                summary_parts.append(sentence)
+                summary_length += len(sentence) + 1
+
+    summary = " ".join(summary_parts)
+    if len(summary) > max_summary_chars:
+        summary = summary[: max_summary_chars - 3].rstrip() + "..."
+
+    return {
+        "title": title,
+        "headings": headings,
+        "key_terms": [term for term, _ in terms.most_common(max_terms)],
+        "summary": summary,
+    }
+
+
+def format_chapter_digest(digest, brief=False):
+    """Render a digest as prompt text. `brief` keeps only the title."""
+    if brief:
+        return f"- {digest['title']}"
+    lines = [f"- {digest['title']}"]
+    if digest["headings"]:
+        lines.append(f"  Sections: {'; '.join(digest['headings'])}")
+    if digest["key_terms"]:
+        lines.append(f"  Key terms: {', '.join(digest['key_terms'])}")
+    if digest["summary"]:
+        lines.append(f"  Summary: {digest['summary']}")
+    return "\n".join(lines)
+
+
+def build_rolling_context(digests, max_tokens=1500):
+    """
+    Combine chapter digests into a context string of bounded size.
+
+    The most recent chapters keep their full digest. Once the budget is used up,
+    older chapters are reduced to their titles, and the oldest titles are dropped
+    if even those do not fit.
+
+    Args:
+        digests (list): Digests of the chapters written so far, in order.
+        max_tokens (int): Approximate token budget for the whole context.
+
+    Returns:
+        str: The rolling context ("" when there are no earlier chapters).
+    """
+    if not digests:
+        return ""
+
+    entries = []
+    used = 0
+    brief = False
+    for digest in reversed(digests):
+        entry = format_chapter_digest(digest, brief=brief)
+        cost = estimate_tokens(entry) + 1
+        if used + cost > max_tokens and not brief:
+            brief = True
+            entry = format_chapter_digest(digest, brief=True)
+            cost = estimate_tokens(entry) + 1
+        if used + cost > max_tokens:
+            break
+        entries.append(entry)
+        used += cost
+
+    omitted = len(digests) - len(entries)
+    header = "Summary of previous chapters"
+    if omitted:
+        header += f" ({omitted} earliest chapters omitted)"
+    return header + ":\n" + "\n".join(reversed(entries))
@@ -0,0 +1,78 @@
+def order_by_dependencies(num_abstractions, relationships):
+    """
+    Order abstractions with a cycle-tolerant topological sort of their relationships.
+
+    Relationships point from the abstraction that uses another to the one being
+    used, so entry points come first and the concepts they build on follow,
+    matching the order the LLM is asked for. The sort runs in layers (Kahn's
+    algorithm); inside a layer, abstractions that reach more others through the
+    graph come first, as their chapters introduce more of what follows, then
+    those that more others depend on, then lower indices (IdentifyAbstractions
+    lists important ones first).
+    When only cycles remain, the abstraction with the fewest remaining incoming
+    edges is released to break them.
+
+    Args:
+        num_abstractions (int): Number of abstractions.
+        relationships (list): Dicts with integer "from" and "to" indices.
+
+    Returns:
+        tuple: (ordered indices, tie groups), where tie groups are consecutive
+               runs of the order (lists of indices) that the graph does not rank.
+    """
+    successors = [set() for _ in range(num_abstractions)]
+    for rel in relationships:
+        source, target = rel["from"], rel["to"]
+        if source != target and 0 <= source < num_abstractions and 0 <= target < num_abstractions:
+            successors[source].add(target)
+
+    in_degree = [0] * num_abstractions
+    for targets in successors:
+        for target in targets:
+            in_degree[target] += 1
+    total_in_degree = list(in_degree)
+
+    # Number of abstractions each one leads to, directly or transitively
+    reach = []
+    for start in range(num_abstractions):
+        seen = {start}
+        stack = [start]
+        while stack:
+            for target in successors[stack.pop()]:
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        reach.append(len(seen) - 1)
+
+    def rank(i):
+        return (-reach[i], -total_in_degree[i])
+
+    def priority(i):
+        return (*rank(i), i)
+
+    remaining = set(range(num_abstractions))
+    order = []
+    tie_groups = []
+    while remaining:
+        layer = [i for i in remaining if in_degree[i] == 0]
+        if not layer:
+            # Only cycles are left: release the abstraction closest to being free
+            layer = [min(remaining, key=lambda i: (in_degree[i], priority(i)))]
+        layer.sort(key=priority)
+
+        # Abstractions in the same layer with the same reach and in-degree are ties
+        group = [layer[0]]
+        for i in layer[1:]:
+            if rank(i) == rank(group[0]):
+                group.append(i)
+            else:
+                tie_groups.append(group)
+                group = [i]
+        tie_groups.append(group)
+
+        for i in layer:
+            remaining.discard(i)
+            order.append(i)
+            for target in successors[i]:
+                in_degree[target] -= 1
+    return order, tie_groups
@@ -0,0 +1,160 @@
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+from utils.disk_cache import atomic_write_bytes
+
+CHECKPOINT_VERSION = 2
+CHECKPOINT_FILENAME = "checkpoint.json.gz"
+PROGRESS_FILENAME = "chapters_in_progress.json.gz"
+
+# Large inputs that are replaced, never changed in place, by the node producing them.
+# Each is written to its own file once per new value instead of with every save.
+STATIC_KEYS = ("files", "file_hashes", "file_summaries", "file_skeletons")
+# Chapters written so far, saved on their own after each chapter (see save_progress)
+PROGRESS_KEY = "chapters_in_progress"
+
+# Never written to disk; a resumed run takes them from its own arguments
+SECRET_KEYS = {"github_token", "gitlab_token"}
+
+# A run id names one directory under .runs: no path separators, no "." or ".."
+_RUN_ID_PATTERN = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9._-]*")
+
+
+def new_run_id():
+    """A sortable, unique run id such as 20260105-142233-1a2b3c."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def is_valid_run_id(run_id):
+    """Whether `run_id` is a plain name that stays inside the .runs directory."""
+    return isinstance(run_id, str) and bool(_RUN_ID_PATTERN.fullmatch(run_id)) and ".." not in run_id
+
+
+def run_directory(output_dir, run_id):
+    """Directory holding the checkpoint of a run; raises ValueError for an unsafe run id."""
+    if not is_valid_run_id(run_id):
+        raise ValueError(f"Invalid run id: {run_id!r}")
+    return os.path.join(output_dir, ".runs", run_id)
+
+
+def _json_default(value):
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _write_json_gz(path, value):
+    data = json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+    atomic_write_bytes(path, gzip.compress(data, compresslevel=6))
+
+
+def _read_json_gz(path):
+    with open(path, "rb") as f:
+        return json.loads(gzip.decompress(f.read()).decode("utf-8"))
+
+
+class RunCheckpoint:
+    """
+    Saves the shared store of a flow run so a failed run can be resumed.
+
+    The checkpoint is a gzip-compressed JSON file, replaced atomically on every
+    save, holding the shared store and the list of nodes that have completed
+    (with the action each returned). Keys starting with "_" hold runtime objects
+    such as this checkpoint and are not saved, and neither are access tokens.
+
+    The crawled files and the data derived from them (STATIC_KEYS) go to their
+    own files, rewritten only when the node producing them stores a new value,
+    and the chapters written so far to a small file of their own, so saving
+    after each chapter does not rewrite the codebase. As these hold a copy of
+    the codebase, the entry points discard() the checkpoint once a run succeeds.
+    """
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.path = os.path.join(run_dir, CHECKPOINT_FILENAME)
+        self.completed = []  # [{"node": class name, "action": returned action}]
+        self._lock = threading.Lock()
+        self._written = {}  # Static key -> the value last written, compared by identity
+
+    @property
+    def run_id(self):
+        return os.path.basename(os.path.normpath(self.run_dir))
+
+    def mark_completed(self, node_name, action):
+        self.completed.append({"node": node_name, "action": action})
+
+    def _static_path(self, key):
+        return os.path.join(self.run_dir, f"{key}.json.gz")
+
+    def save(self, shared):
+        with self._lock:
+            static = [key for key in STATIC_KEYS if key in shared]
+            for key in static:
+                if self._written.get(key) is not shared[key]:
+                    _write_json_gz(self._static_path(key), shared[key])
+                    self._written[key] = shared[key]
+            progress_path = os.path.join(self.run_dir, PROGRESS_FILENAME)
+            if PROGRESS_KEY in shared:
+                _write_json_gz(progress_path, shared[PROGRESS_KEY])
+            elif os.path.exists(progress_path):
+                os.remove(progress_path)  # The chapters are done and stored with the rest
+            _write_json_gz(
+                self.path,
+                {
+                    "version": CHECKPOINT_VERSION,
+                    "completed": self.completed,
+                    "static": static,
+                    "shared": {
+                        key: value
+                        for key, value in shared.items()
+                        if not key.startswith("_")
+                        and key not in SECRET_KEYS
+                        and key not in STATIC_KEYS
+                        and key != PROGRESS_KEY
+                    },
+                },
+            )
+
+    def save_progress(self, shared):
+        """Save only the chapters written so far, after each chapter."""
+        with self._lock:
+            _write_json_gz(os.path.join(self.run_dir, PROGRESS_FILENAME), shared[PROGRESS_KEY])
+
+    def discard(self):
+        """Delete the checkpoint of a finished run, and the .runs directory once no run is left."""
+        with self._lock:
+            shutil.rmtree(self.run_dir, ignore_errors=True)
+            try:
+                os.rmdir(os.path.dirname(os.path.normpath(self.run_dir)))
+            except OSError:
+                pass  # Other runs still have checkpoints
+
+    def load(self):
+        """
+        Read the checkpoint and return the saved shared store.
+
+        Raises:
+            FileNotFoundError: If the run has no checkpoint.
+            ValueError: If the checkpoint was written by an incompatible version.
+        """
+        state = _read_json_gz(self.path)
+        if state.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(
+                f"Checkpoint version {state.get('version')} is not supported (expected {CHECKPOINT_VERSION})"
+            )
+        self.completed = state["completed"]
+        shared = state["shared"]
+        for key in state["static"]:
+            shared[key] = _read_json_gz(self._static_path(key))
+            self._written[key] = shared[key]  # Already on disk
+        # Also present when the run stopped while writing chapters, after the last full save
+        progress_path = os.path.join(self.run_dir, PROGRESS_FILENAME)
+        if os.path.exists(progress_path):
+            shared[PROGRESS_KEY] = _read_json_gz(progress_path)
+        return shared
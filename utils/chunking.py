@@ -0,0 +1,213 @@
+import math
+import re
+
+from utils.code_skeleton import extract_skeleton
+from utils.token_count import estimate_tokens
+
+# Share of a shortened file's budget spent on its symbol outline
+OUTLINE_SHARE = 0.25
+
+# Lines longer than this (minified or generated code) are cut in excerpts
+MAX_LINE_CHARS = 300
+
+_WORD_PATTERN = re.compile(r"[A-Za-z][a-z]+|[A-Z]+(?![a-z])|[a-z]+|\d+")
+_STOP_WORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "are", "its", "into",
+    "how", "what", "which", "when", "their", "them", "can", "all", "any", "each",
+}
+
+
+def _terms(text):
+    """Lowercase words of a text, with camelCase and snake_case identifiers split up."""
+    return [
+        word.lower()
+        for word in _WORD_PATTERN.findall(text)
+        if len(word) >= 3 and word.lower() not in _STOP_WORDS
+    ]
+
+
+def _clip_line(line):
+    if len(line) <= MAX_LINE_CHARS:
+        return line
+    return line[:MAX_LINE_CHARS] + " ...(line truncated)\n"
+
+
+def _take_lines(lines, max_tokens):
+    """Clipped lines from the start of `lines` while they fit in `max_tokens`."""
+    taken = []
+    used = 0
+    for line in lines:
+        line = _clip_line(line)
+        tokens = estimate_tokens(line)
+        if used + tokens > max_tokens:
+            break
+        taken.append(line)
+        used += tokens
+    return taken
+
+
+def _outline(path, content, max_tokens):
+    skeleton = extract_skeleton(path, content)
+    if not skeleton:
+        return ""
+    lines = _take_lines(skeleton.splitlines(keepends=True), max_tokens)
+    return "".join(lines).rstrip("\n")
+
+
+def split_into_chunks(content, chunk_tokens=400):
+    """
+    Split a file into consecutive chunks of about `chunk_tokens` tokens.
+
+    Chunks end at a blank line before a top-level statement when one falls in the
+    second half of the chunk, so definitions are rarely cut in two.
+
+    Returns:
+        list: (first line, last line, text) tuples with 1-based line numbers.
+    """
+    lines = content.splitlines(keepends=True)
+    if content.isascii():
+        # Same estimate as estimate_tokens, without its CJK scan when there is nothing to find
+        sizes = [(len(line) + 3) // 4 for line in lines]
+    else:
+        sizes = [estimate_tokens(line) for line in lines]
+    # A top-level line after a blank line usually starts a new definition
+    blank = [not line.strip() for line in lines]
+    chunks = []
+    start = 0
+    tokens = 0
+    boundary = None
+    for i, size in enumerate(sizes):
+        if i > start and blank[i - 1] and not blank[i] and not lines[i][0].isspace():
+            boundary = i
+        tokens += size
+        if tokens >= chunk_tokens:
+            end = i + 1
+            if boundary is not None and (boundary - start) * 2 >= end - start:
+                end = boundary
+            chunks.append((start, end))
+            start = end
+            tokens = sum(sizes[start : i + 1])
+            boundary = None
+    if start < len(lines):
+        chunks.append((start, len(lines)))
+    return [(first + 1, last, "".join(lines[first:last])) for first, last in chunks]
+
+
+def excerpt_file(path, content, max_tokens):
+    """
+    Shorten a file to about `max_tokens` tokens: a symbol outline, then its first and last lines.
+
+    The outline comes from the code skeleton extractors and is left out for
+    unsupported file types. The head gets two thirds of the remaining budget.
+    """
+    lines = content.splitlines(keepends=True)
+    outline = _outline(path, content, int(max_tokens * OUTLINE_SHARE))
+    budget = max(max_tokens - estimate_tokens(outline) - 40, 0)
+    head = _take_lines(lines, budget * 2 // 3)
+    tail_budget = budget - estimate_tokens("".join(head))
+    tail = _take_lines(reversed(lines[len(head):]), tail_budget)[::-1]
+    tail_start = len(lines) - len(tail) + 1
+
+    parts = [
+        f"(Large file: ~{estimate_tokens(content)} tokens in {len(lines)} lines. "
+        f"Showing {'a symbol outline, ' if outline else ''}the first {len(head)} "
+        f"and the last {len(tail)} lines.)"
+    ]
+    if outline:
+        parts.append(f"Outline:\n{outline}")
+    parts.append(f"Lines 1-{len(head)}:\n{''.join(head).rstrip()}")
+    if tail:
+        parts.append(f"... (lines {len(head) + 1}-{tail_start - 1} omitted) ...")
+        parts.append(f"Lines {tail_start}-{len(lines)}:\n{''.join(tail).rstrip()}")
+    return "\n\n".join(parts)
+
+
+def relevant_chunks(path, content, query, max_tokens, chunk_tokens=400):
+    """
+    Shorten a file to the chunks that best match `query`, plus a symbol outline.
+
+    Chunks are scored by the query terms they contain, weighted by how rare each
+    term is across the file's chunks, and kept in file order. Falls back to
+    `excerpt_file` when no chunk mentions the query.
+    """
+    query_terms = set(_terms(query))
+    chunks = split_into_chunks(content, chunk_tokens)
+    chunk_terms = [set(_terms(text)) for _, _, text in chunks]
+    document_frequency = {
+        term: sum(1 for terms in chunk_terms if term in terms) for term in query_terms
+    }
+    scores = [
+        sum(math.log(1 + len(chunks) / document_frequency[term]) for term in query_terms & terms)
+        for terms in chunk_terms
+    ]
+    if not any(scores):
+        return excerpt_file(path, content, max_tokens)
+
+    outline = _outline(path, content, int(max_tokens * OUTLINE_SHARE))
+    budget = max(max_tokens - estimate_tokens(outline) - 40, 0)
+    selected = []
+    used = 0
+    for i in sorted(range(len(chunks)), key=lambda i: -scores[i]):
+        if not scores[i]:
+            break
+        tokens = estimate_tokens(chunks[i][2])
+        if used + tokens > budget:
+            continue
+        selected.append(i)
+        used += tokens
+    if not selected:
+        return excerpt_file(path, content, max_tokens)
+
+    total_lines = chunks[-1][1]
+    parts = [
+        f"(Large file: ~{estimate_tokens(content)} tokens in {total_lines} lines. "
+        f"Showing {'a symbol outline and ' if outline else ''}the {len(selected)} "
+        f"parts most relevant to this chapter.)"
+    ]
+    if outline:
+        parts.append(f"Outline:\n{outline}")
+    for i in sorted(selected):
+        first, last, text = chunks[i]
+        clipped = "".join(_clip_line(line) for line in text.splitlines(keepends=True))
+        parts.append(f"Lines {first}-{last}:\n{clipped.rstrip()}")
+    return "\n\n".join(parts)
+
+
+def fit_files_to_budget(files, max_tokens, query=None):
+    """
+    Shorten the largest files so that all of them together fit in `max_tokens`.
+
+    The budget is shared out smallest file first: files below their fair share
+    are kept whole and leave the rest to the others, so one oversized file can
+    no longer crowd out the rest of the prompt.
+
+    Args:
+        files (list): (path, content) tuples.
+        max_tokens (int): Token budget for all files; falsy keeps every file whole.
+        query (str, optional): When given, oversized files keep their chunks most
+                               relevant to it instead of a head/tail excerpt.
+
+    Returns:
+        tuple: (contents aligned with `files`, number of files shortened)
+    """
+    contents = [content for _, content in files]
+    if not max_tokens:
+        return contents, 0
+    sizes = [estimate_tokens(content) for content in contents]
+    if sum(sizes) <= max_tokens:
+        return contents, 0
+
+    remaining = max_tokens
+    shortened = 0
+    by_size = sorted(range(len(files)), key=lambda i: sizes[i])
+    for position, i in enumerate(by_size):
+        share = remaining // (len(by_size) - position)
+        if sizes[i] > share:
+            path, content = files[i]
+            if query:
+                contents[i] = relevant_chunks(path, content, query, share)
+            else:
+                contents[i] = excerpt_file(path, content, share)
+            shortened += 1
+        remaining = max(remaining - estimate_tokens(contents[i]), 0)
+    return contents, shortened
@@ -0,0 +1,209 @@
+import ast
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.disk_cache import DiskCache, content_hash
+
+# Bump when the extractors change so stale cache entries are not reused
+EXTRACTOR_VERSION = "1"
+
+# Below this many cache misses, a process pool costs more than it saves
+_MIN_FILES_FOR_POOL = 32
+
+
+def _first_doc_line(node):
+    docstring = ast.get_docstring(node)
+    if docstring:
+        return docstring.strip().splitlines()[0]
+    return None
+
+
+def _python_signature(node):
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    signature = f"{prefix} {node.name}({ast.unparse(node.args)})"
+    if node.returns is not None:
+        signature += f" -> {ast.unparse(node.returns)}"
+    return signature
+
+
+def _python_skeleton(content):
+    tree = ast.parse(content)
+    lines = []
+    module_doc = _first_doc_line(tree)
+    if module_doc:
+        lines.append(f'"""{module_doc}"""')
+
+    def visit(body, indent):
+        for node in body:
+            pad = "    " * indent
+            if isinstance(node, (ast.Import, ast.ImportFrom)) and indent == 0:
+                lines.append(ast.unparse(node))
+            elif isinstance(node, ast.ClassDef):
+                bases = [ast.unparse(base) for base in node.bases + node.keywords]
+                for decorator in node.decorator_list:
+                    lines.append(f"{pad}@{ast.unparse(decorator)}")
+                lines.append(f"{pad}class {node.name}{'(' + ', '.join(bases) + ')' if bases else ''}:")
+                doc = _first_doc_line(node)
+                if doc:
+                    lines.append(f'{pad}    """{doc}"""')
+                visit(node.body, indent + 1)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                for decorator in node.decorator_list:
+                    lines.append(f"{pad}@{ast.unparse(decorator)}")
+                lines.append(f"{pad}{_python_signature(node)}: ...")
+                doc = _first_doc_line(node)
+                if doc:
+                    lines.append(f'{pad}    """{doc}"""')
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)) and indent <= 1:
+                # Module constants and class attributes describe configuration and state
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                names = [ast.unparse(t) for t in targets]
+                if indent == 1 or all(name.isupper() for name in names):
+                    value = ast.unparse(node.value) if node.value is not None else ""
+                    if len(value) > 60:
+                        value = value[:57] + "..."
+                    annotation = f": {ast.unparse(node.annotation)}" if isinstance(node, ast.AnnAssign) else ""
+                    lines.append(f"{pad}{' = '.join(names)}{annotation} = {value}" if value else f"{pad}{names[0]}{annotation}")
+            elif isinstance(node, ast.If) and indent == 0:
+                # Keep `if __name__ == "__main__":` style entry points visible
+                test = ast.unparse(node.test)
+                if "__name__" in test:
+                    lines.append(f"if {test}: ...")
+
+    visit(tree.body, 0)
+    return "\n".join(lines)
+
+
+# Regex-based extractors keep declaration lines, which is enough to see the structure
+_REGEX_EXTRACTORS = {
+    "js": re.compile(
+        r"^\s*(?:import\s.+|export\s.+|(?:const|let|var)\s+\w+\s*=\s*require\(.+|"
+        r"(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+\w+.*|"
+        r"(?:export\s+)?(?:async\s+)?function\s*\*?\s*\w+\s*\(.*|"
+        r"(?:export\s+)?(?:const|let|var)\s+\w+\s*=\s*(?:async\s*)?(?:\([^)]*\)|\w+)\s*=>.*|"
+        r"(?:export\s+)?(?:interface|type|enum)\s+\w+.*|"
+        r"(?:(?:public|private|protected|static|async|readonly|get|set)\s+)*[A-Za-z_$][\w$]*\s*\([^;{]*\)\s*(?::\s*[^{;]+)?\{\s*)$"
+    ),
+    "go": re.compile(
+        r"^(?:package\s+\w+|import\s.+|\t\"[^\"]+\"|type\s+\w+.*|func\s.+|const\s.+|var\s.+)$"
+    ),
+    "java": re.compile(
+        r"^\s*(?:package\s.+;|import\s.+;|"
+        r"(?:@\w+\s+)*(?:(?:public|protected|private|abstract|static|final|sealed)\s+)*(?:class|interface|enum|record)\s+\w+.*|"
+        r"(?:@\w+\s+)*(?:(?:public|protected|private|abstract|static|final|synchronized|native|default)\s+)+(?:[\w<>\[\], ?]+\s+)?\w+\s*\([^;]*\)?\s*(?:throws\s+[\w., ]+)?\s*[{;]?\s*)$"
+    ),
+    "c": re.compile(
+        r"^(?:#\s*(?:include|define)\s.+|(?:typedef\s+)?(?:struct|class|union|enum)\s+\w+.*|"
+        r"namespace\s+\w+.*|template\s*<.*|"
+        r"[A-Za-z_][\w\s\*&:<>,]*\b[A-Za-z_][\w:~]*\s*\([^;]*\)\s*(?:const\s*)?(?:override\s*)?[{;]?\s*)$"
+    ),
+}
+
+_LANGUAGE_BY_EXTENSION = {
+    ".py": "python", ".pyi": "python", ".pyx": "python",
+    ".js": "js", ".jsx": "js", ".ts": "js", ".tsx": "js", ".mjs": "js", ".cjs": "js",
+    ".go": "go",
+    ".java": "java",
+    ".c": "c", ".cc": "c", ".cpp": "c", ".cxx": "c", ".h": "c", ".hpp": "c",
+}
+
+_C_LIKE_KEYWORDS = ("if", "for", "while", "switch", "return", "else", "do", "catch", "sizeof")
+
+
+def _regex_skeleton(language, content):
+    pattern = _REGEX_EXTRACTORS[language]
+    lines = []
+    for line in content.splitlines():
+        if len(line) > 300:
+            continue
+        stripped = line.strip()
+        if not stripped or stripped.startswith(("//", "*", "/*")):
+            continue
+        # Control statements look like calls to the C-like patterns
+        head = stripped.split("(")[0].split()
+        if head and head[-1] in _C_LIKE_KEYWORDS:
+            continue
+        if pattern.match(line):
+            lines.append(line.rstrip().rstrip("{").rstrip())
+    return "\n".join(lines)
+
+
+def skeleton_language(path):
+    """Return the extractor language for a path, or None when skeletons are not supported."""
+    return _LANGUAGE_BY_EXTENSION.get(os.path.splitext(path)[1].lower())
+
+
+def extract_skeleton(path, content):
+    """
+    Reduce a source file to its imports, class hierarchy, signatures and docstrings.
+
+    Python is parsed with `ast`; JavaScript/TypeScript, Go, Java and C/C++ use
+    line-based regular expressions.
+
+    Args:
+        path (str): File path, used to pick the extractor.
+        content (str): File content.
+
+    Returns:
+        str or None: The skeleton, or None when the file type is not supported
+                     or the extractor produced nothing useful.
+    """
+    language = skeleton_language(path)
+    if language is None:
+        return None
+    try:
+        if language == "python":
+            skeleton = _python_skeleton(content)
+        else:
+            skeleton = _regex_skeleton(language, content)
+    except (SyntaxError, ValueError, RecursionError):
+        return None
+    return skeleton or None
+
+
+def _extract_entry(entry):
+    path, content = entry
+    return extract_skeleton(path, content)
+
+
+def extract_skeletons(files_data, file_hashes=None, max_workers=None, use_cache=True):
+    """
+    Extract skeletons for all files, using a process pool and a content-hash cache.
+
+    Args:
+        files_data (list): List of (path, content) tuples.
+        file_hashes (list, optional): Content hashes aligned with files_data.
+        max_workers (int, optional): Process pool size (defaults to the CPU count).
+        use_cache (bool): Whether to read cached skeletons.
+
+    Returns:
+        tuple: (skeletons aligned with files_data with None where unsupported, number of cache hits)
+    """
+    cache = DiskCache("code_skeletons")
+    skeletons = [None] * len(files_data)
+    misses = []
+    hits = 0
+    for i, (path, content) in enumerate(files_data):
+        if skeleton_language(path) is None:
+            continue
+        file_hash = file_hashes[i] if file_hashes else content_hash(content)
+        cache_key = f"{EXTRACTOR_VERSION}:{skeleton_language(path)}:{file_hash}"
+        cached = cache.get(cache_key) if use_cache else None
+        if cached is not None:
+            skeletons[i] = cached["skeleton"]
+            hits += 1
+        else:
+            misses.append((i, cache_key))
+
+    entries = [files_data[i] for i, _ in misses]
+    if len(entries) >= _MIN_FILES_FOR_POOL:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_extract_entry, entries, chunksize=16))
+    else:
+        results = [_extract_entry(entry) for entry in entries]
+
+    for (i, cache_key), skeleton in zip(misses, results):
+        skeletons[i] = skeleton
+        cache.set(cache_key, {"skeleton": skeleton})
+    return skeletons, hits
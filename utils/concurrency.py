@@ -0,0 +1,31 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+
+def map_concurrently(func, items, max_workers=4):
+    """
+    Apply `func` to every item using a thread pool and return the results in input order.
+
+    LLM calls spend their time waiting on the model server, so threads are enough
+    to keep several requests in flight. Each task runs in a copy of the caller's
+    context so per-run state such as telemetry follows the work into the pool.
+
+    Args:
+        func (callable): Function called with a single item.
+        items (iterable): Items to process.
+        max_workers (int): Maximum number of concurrent calls. 1 runs sequentially.
+
+    Returns:
+        list: Results of `func`, in the same order as `items`. The first exception
+              raised by a task is re-raised.
+    """
+    items = list(items)
+    if max_workers is None or max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, func, item)
+            for item in items
+        ]
+        return [future.result() for future in futures]
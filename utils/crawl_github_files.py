@@ -7,6 +7,7 @@ import time
 import fnmatch
 from typing import Union, Set, List, Dict, Tuple, Any
 from urllib.parse import urlparse
+from utils.file_filter import apply_low_value_filter
 
 def crawl_github_files(
     repo_url, 
@@ -14,7 +15,8 @@ def crawl_github_files(
     max_file_size: int = 1 * 1024 * 1024,  # 1 MB
     use_relative_paths: bool = False,
     include_patterns: Union[str, Set[str]] = None,
-    exclude_patterns: Union[str, Set[str]] = None
+    exclude_patterns: Union[str, Set[str]] = None,
+    filter_low_value: bool = False
 ):
     """
     Crawl files from a specific path in a GitHub repository at a specific commit.
@@ -32,6 +34,8 @@ def crawl_github_files(
                                                        If None, all files are included.
         exclude_patterns (str or set of str, optional): Pattern or set of patterns specifying which files to exclude.
                                                        If None, no files are excluded.
+        filter_low_value (bool, optional): If True, lockfiles, generated and minified code are skipped and
+                                           notebooks and large data files are shortened (see utils/file_filter.py)
 
     Returns:
         dict: Dictionary with files and statistics
@@ -59,6 +63,15 @@ def crawl_github_files(
 
         return include_file
 
+    # Files skipped or shortened by the low-value filter, by reason
+    low_value_files = {}
+
+    def keep_content(rel_path, content):
+        """The content to store for a file, or None when the low-value filter skips it"""
+        if not filter_low_value:
+            return content
+        return apply_low_value_filter(rel_path, content, low_value_files)
+
     # Detect SSH URL (git@ or .git suffix)
     is_ssh_url = repo_url.startswith("git@") or repo_url.endswith(".git")
 
@@ -105,7 +118,9 @@ def crawl_github_files(
                     # Read content
                     try:
                         with open(abs_path, "r", encoding="utf-8-sig") as f:
-                            content = f.read()
+                            content = keep_content(rel_path, f.read())
+                        if content is None:
+                            continue
                         files[rel_path] = content
                         print(f"Added {rel_path} ({file_size} bytes)")
                     except Exception as e:
@@ -117,6 +132,7 @@ def crawl_github_files(
                     "downloaded_count": len(files),
                     "skipped_count": len(skipped_files),
                     "skipped_files": skipped_files,
+                    "low_value_files": low_value_files,
                     "base_path": None,
                     "include_patterns": include_patterns,
                     "exclude_patterns": exclude_patterns,
@@ -286,7 +302,10 @@ def crawl_github_files(
                         continue
                         
                     if file_response.status_code == 200:
-                        files[rel_path] = file_response.text
+                        content = keep_content(rel_path, file_response.text)
+                        if content is None:
+                            continue
+                        files[rel_path] = content
                         print(f"Downloaded: {rel_path} ({file_size} bytes) ")
                     else:
                         print(f"Failed to download {rel_path}: {file_response.status_code}")
@@ -303,7 +322,9 @@ def crawl_github_files(
                                 print(f"Skipping {rel_path}: Encoded content exceeds size limit")
                                 continue
                                 
-                            file_content = base64.b64decode(content_data["content"]).decode('utf-8')
+                            file_content = keep_content(rel_path, base64.b64decode(content_data["content"]).decode('utf-8'))
+                            if file_content is None:
+                                continue
                             files[rel_path] = file_content
                             print(f"Downloaded: {rel_path} ({file_size} bytes)")
                         else:
@@ -336,6 +357,7 @@ def crawl_github_files(
             "downloaded_count": len(files),
             "skipped_count": len(skipped_files),
             "skipped_files": skipped_files,
+            "low_value_files": low_value_files,
             "base_path": specific_path if use_relative_paths else None,
             "include_patterns": include_patterns,
             "exclude_patterns": exclude_patterns
@@ -7,6 +7,7 @@ import time
 import fnmatch
 from typing import Union, Set, List, Dict, Tuple, Any
 from urllib.parse import urlparse
+from utils.file_filter import apply_low_value_filter
 
 def crawl_gitlab_files(
     repo_url,
@@ -18,7 +19,8 @@ def crawl_gitlab_files(
     include_patterns: Union[str, Set[str]] = None,
     exclude_patterns: Union[str, Set[str]] = None,
     debug: bool = False,
-    ref: str = None  # 用户指定的分支或commit引用
+    ref: str = None,  # 用户指定的分支或commit引用
+    filter_low_value: bool = False  # 跳过或缩短低价值文件
 ):
     """
     Crawl files from a specific path in a GitLab repository at a specific commit.
@@ -40,6 +42,8 @@ def crawl_gitlab_files(
                                                        If None, no files are excluded.
         debug (bool, optional): Enable debug mode for detailed logging. Useful for troubleshooting 400 errors.
         ref (str, optional): Specific branch, tag, or commit reference to use. If provided, will override any ref parsed from URL.
+        filter_low_value (bool, optional): If True, lockfiles, generated and minified code are skipped and
+                                           notebooks and large data files are shortened (see utils/file_filter.py)
 
     Returns:
         dict: Dictionary with files and statistics
@@ -268,6 +272,7 @@ def crawl_gitlab_files(
     # Dictionary to store path -> content mapping
     files = {}
     skipped_files = []
+    low_value_files = {}  # Files skipped or shortened by the low-value filter, by reason
     
     def fetch_contents(path):
         """Fetch contents of the repository at a specific path and ref"""
@@ -389,6 +394,10 @@ def crawl_gitlab_files(
                     
                     try:
                         content = file_response.text
+                        if filter_low_value:
+                            content = apply_low_value_filter(rel_path, content, low_value_files)
+                            if content is None:
+                                continue
                         files[rel_path] = content
                         print(f"Downloaded: {rel_path} ({content_length} bytes)")
                     except UnicodeDecodeError:
@@ -431,6 +440,7 @@ def crawl_gitlab_files(
             "downloaded_count": len(files),
             "skipped_count": len(skipped_files),
             "skipped_files": skipped_files,
+            "low_value_files": low_value_files,
             "base_path": specific_path if use_relative_paths else None,
             "include_patterns": include_patterns,
             "exclude_patterns": exclude_patterns,
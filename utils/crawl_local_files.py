@@ -2,6 +2,8 @@ import os
 import fnmatch
 import pathspec
 
+from utils.file_filter import apply_low_value_filter
+
 
 def crawl_local_files(
     directory,
@@ -9,6 +11,7 @@ def crawl_local_files(
     exclude_patterns=None,
     max_file_size=None,
     use_relative_paths=True,
+    filter_low_value=False,
 ):
     """
     Crawl files in a local directory with similar interface as crawl_github_files.
@@ -18,14 +21,17 @@ def crawl_local_files(
         exclude_patterns (set): File patterns to exclude (e.g. {"tests/*"})
         max_file_size (int): Maximum file size in bytes
         use_relative_paths (bool): Whether to use paths relative to directory
+        filter_low_value (bool): Whether to skip or shorten low-value files (lockfiles,
+                                 generated or minified code, notebook outputs, large data files)
 
     Returns:
-        dict: {"files": {filepath: content}}
+        dict: {"files": {filepath: content}, "stats": {"low_value_files": {reason: count}}}
     """
     if not os.path.isdir(directory):
         raise ValueError(f"Directory does not exist: {directory}")
 
     files_dict = {}
+    low_value_files = {}
 
     # --- Load .gitignore ---
     gitignore_path = os.path.join(directory, ".gitignore")
@@ -115,7 +121,12 @@ def crawl_local_files(
         try:
             with open(filepath, "r", encoding="utf-8-sig") as f:
                 content = f.read()
-            files_dict[relpath] = content
+            if filter_low_value:
+                content = apply_low_value_filter(relpath, content, low_value_files)
+            if content is None:
+                status = "skipped (low-value)"
+            else:
+                files_dict[relpath] = content
         except Exception as e:
             print(f"Warning: Could not read file {filepath}: {e}")
             status = "skipped (read error)"
@@ -126,7 +137,7 @@ def crawl_local_files(
             rounded_percentage = int(percentage)
             print(f"\033[92mProgress: {processed_files}/{total_files} ({rounded_percentage}%) {relpath} [{status}]\033[0m")
 
-    return {"files": files_dict}
+    return {"files": files_dict, "stats": {"low_value_files": low_value_files}}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+import tempfile
+
+
+def content_hash(text):
+    """SHA-256 hex digest of a text, used to key caches by file content."""
+    return hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def atomic_write_bytes(path, data):
+    """Write `data` to `path` through a temporary file so readers never see a partial file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class DiskCache:
+    """
+    Small persistent key/value store for JSON-serialisable values.
+
+    Every entry is a file named after the SHA-256 of its key, under
+    `<cache_dir>/<namespace>/`, so entries can be shared between runs and
+    repositories and written concurrently without a global lock.
+    The cache directory defaults to the CACHE_DIR environment variable (".cache").
+    """
+
+    def __init__(self, namespace, cache_dir=None):
+        self.directory = os.path.join(cache_dir or os.getenv("CACHE_DIR", ".cache"), namespace)
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + ".json")
+
+    def get(self, key, default=None):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def set(self, key, value):
+        try:
+            atomic_write_bytes(
+                self._path(key), json.dumps(value, ensure_ascii=False).encode("utf-8")
+            )
+        except OSError as e:
+            print(f"Warning: Could not write cache entry in {self.directory}: {e}")
@@ -0,0 +1,52 @@
+import os
+import time
+
+import ollama
+
+from utils.telemetry import current_run, current_span
+
+# Texts sent per embedding request
+EMBED_BATCH_SIZE = 64
+
+
+def get_embedding_model_name():
+    """Name of the Ollama model used for embeddings."""
+    return os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+
+
+def embed_texts(texts, node=None, batch_size=EMBED_BATCH_SIZE):
+    """
+    Embed texts with the Ollama embed endpoint (OLLAMA_HOST, OLLAMA_EMBED_MODEL).
+
+    Any server implementing Ollama's /api/embed works, so a local stand-in can
+    serve the vectors when the real model is not available.
+
+    Args:
+        texts (list of str): Texts to embed.
+        node (str, optional): Name of the calling node, recorded in the run telemetry.
+        batch_size (int): Texts per request.
+
+    Returns:
+        list: One embedding (list of floats) per text, in input order.
+    """
+    client = ollama.Client(host=os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434"))
+    model = get_embedding_model_name()
+    embeddings = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start : start + batch_size]
+        start_time = time.perf_counter()
+        response = client.embed(model=model, input=batch, truncate=True)
+        current_run().record_llm_call({
+            'node': node,
+            'prompt_chars': sum(len(text) for text in batch),
+            'prompt_tokens': response.get('prompt_eval_count'),
+            'completion_tokens': 0,
+            'seconds': time.perf_counter() - start_time,
+            'span': current_span(),
+        })
+        if len(response['embeddings']) != len(batch):
+            raise ValueError(
+                f"Embedding endpoint returned {len(response['embeddings'])} vectors for {len(batch)} texts"
+            )
+        embeddings.extend(response['embeddings'])
+    return embeddings
@@ -0,0 +1,148 @@
+import collections
+import fnmatch
+import json
+import math
+import os
+import re
+
+LOCKFILE_NAMES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "bun.lockb",
+    "poetry.lock", "Pipfile.lock", "uv.lock", "pdm.lock", "Cargo.lock", "go.sum", "composer.lock",
+    "Gemfile.lock", "mix.lock", "pubspec.lock", "Podfile.lock", "flake.lock", "packages.lock.json",
+}
+GENERATED_NAME_PATTERNS = (
+    "*_pb2.py", "*_pb2.pyi", "*_pb2_grpc.py", "*.pb.go", "*.pb.cc", "*.pb.h", "*.pb.gw.go",
+    "*.g.dart", "*.freezed.dart", "*.designer.cs", "*.generated.*", "*_generated.*",
+)
+MINIFIED_NAME_PATTERNS = ("*.min.js", "*.min.css", "*.bundle.js", "*.chunk.js")
+# Generator markers are looked for in the comment block at the head of the file, where
+# generators put them ("# Generated by the protocol buffer compiler.  DO NOT EDIT!")
+_GENERATED_MARKER = re.compile(
+    r"@generated|do not edit|code generated|generated by|auto-?generated|automatically generated"
+    r"|this file (?:is|was|has been) generated",
+    re.I,
+)
+_HEADER_LINE = re.compile(r"[ \t]*(?:$|#|//|/\*|\*|--|<!--|;)")
+GENERATED_MARKER_CHARS = 2048
+
+# Content checks only apply from this size; small files cost little either way
+MIN_CHECK_CHARS = 2048
+# Code averages well under 100 characters per line; minified bundles run to thousands
+MAX_AVERAGE_LINE_LENGTH = 300
+# Bits per character of the ASCII text: code and prose stay below ~5.5, base64 is ~6
+MAX_ENTROPY = 5.8
+ENTROPY_SAMPLE_CHARS = 65536
+# Prose is written one paragraph per line and never minified
+PROSE_EXTENSIONS = {".md", ".rst", ".txt", ".adoc"}
+
+# Data files above this size are cut to their first lines, which show the structure
+DATA_EXTENSIONS = {".json", ".yaml", ".yml", ".csv", ".tsv", ".xml"}
+LARGE_DATA_CHARS = 32768
+DATA_HEAD_LINES = 60
+
+
+def _ascii_entropy(content):
+    sample = content[:ENTROPY_SAMPLE_CHARS].encode("ascii", "ignore")
+    if not sample:
+        return 0.0
+    total = len(sample)
+    return -sum(count / total * math.log2(count / total) for count in collections.Counter(sample).values())
+
+
+def _header_comments(content):
+    """The leading comment and blank lines of a file (license, generator notice)."""
+    lines = []
+    for line in content[:GENERATED_MARKER_CHARS].split("\n"):
+        if not _HEADER_LINE.match(line):
+            break
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def strip_notebook_outputs(content):
+    """
+    Reduce a Jupyter notebook to its cell sources in the "# %%" script format,
+    dropping outputs, images and metadata. Returns None when it is not valid JSON.
+    """
+    try:
+        notebook = json.loads(content)
+    except ValueError:
+        return None
+    if not isinstance(notebook, dict):
+        return None
+    parts = []
+    for cell in notebook.get("cells") or []:
+        source = cell.get("source", "")
+        if isinstance(source, list):
+            source = "".join(source)
+        if not isinstance(source, str) or not source.strip():
+            continue
+        if cell.get("cell_type") == "markdown":
+            lines = [f"# {line}" if line else "#" for line in source.strip().splitlines()]
+            parts.append("# %% [markdown]\n" + "\n".join(lines))
+        elif cell.get("cell_type") == "code":
+            parts.append("# %%\n" + source.strip())
+    return "\n\n".join(parts) + "\n"
+
+
+def classify_file(path, content):
+    """
+    Decide whether a crawled file is worth a place in the prompts.
+
+    Lockfiles ("lockfile"), generated code by name or a notice in the header
+    comments ("generated"), minified files ("minified") and high-entropy blobs
+    ("high_entropy") are dropped. Notebooks lose their outputs ("notebook_outputs")
+    and large data files are cut to their first DATA_HEAD_LINES lines ("large_data").
+
+    Args:
+        path (str): File path.
+        content (str): File content.
+
+    Returns:
+        tuple: (content to keep or None to drop the file, reason or None when kept unchanged).
+    """
+    name = os.path.basename(path)
+    extension = os.path.splitext(name)[1].lower()
+    if name in LOCKFILE_NAMES:
+        return None, "lockfile"
+    if any(fnmatch.fnmatch(name, pattern) for pattern in GENERATED_NAME_PATTERNS):
+        return None, "generated"
+    if any(fnmatch.fnmatch(name, pattern) for pattern in MINIFIED_NAME_PATTERNS):
+        return None, "minified"
+    if extension == ".ipynb":
+        stripped = strip_notebook_outputs(content)
+        if stripped is not None and len(stripped) < len(content):
+            return stripped, "notebook_outputs"
+        return content, None
+    prose = extension in PROSE_EXTENSIONS
+    if not prose and _GENERATED_MARKER.search(_header_comments(content)):
+        return None, "generated"
+    if len(content) < MIN_CHECK_CHARS:
+        return content, None
+    if not prose and len(content) / (content.count("\n") + 1) > MAX_AVERAGE_LINE_LENGTH:
+        return None, "minified"
+    if _ascii_entropy(content) > MAX_ENTROPY:
+        return None, "high_entropy"
+    if extension in DATA_EXTENSIONS and len(content) > LARGE_DATA_CHARS:
+        lines = content.splitlines()
+        if len(lines) > DATA_HEAD_LINES:
+            head = "\n".join(lines[:DATA_HEAD_LINES])
+            return f"{head}\n... ({len(lines) - DATA_HEAD_LINES} more lines of data omitted)\n", "large_data"
+    return content, None
+
+
+def apply_low_value_filter(path, content, counts):
+    """
+    Apply classify_file for a crawler, counting each reason in `counts`.
+
+    Returns:
+        str: The content to keep, or None when the file should be skipped.
+    """
+    kept, reason = classify_file(path, content)
+    if reason:
+        counts[reason] = counts.get(reason, 0) + 1
+        if kept is None:
+            print(f"Skipping {path}: low-value file ({reason})")
+        else:
+            print(f"Shortened {path}: {reason} ({len(content)} -> {len(kept)} characters)")
+    return kept
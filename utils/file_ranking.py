@@ -0,0 +1,95 @@
+import math
+import os
+
+from utils.import_graph import build_import_graph
+
+# File names that usually mark entry points or package interfaces
+_ENTRY_POINT_NAMES = {
+    "main", "__main__", "__init__", "app", "index", "cli", "server", "mod",
+}
+_DOC_NAMES = {"readme"}
+
+
+def _pagerank(edges, iterations=10, damping=0.85):
+    """Power-iteration PageRank over file -> imported file edges. O(iterations * (V + E))."""
+    count = len(edges)
+    if count == 0:
+        return []
+    rank = [1.0 / count] * count
+    for _ in range(iterations):
+        dangling = sum(rank[i] for i in range(count) if not edges[i])
+        base = (1.0 - damping) / count + damping * dangling / count
+        new_rank = [base] * count
+        for i, targets in enumerate(edges):
+            if targets:
+                share = damping * rank[i] / len(targets)
+                for j in targets:
+                    new_rank[j] += share
+        rank = new_rank
+    return rank
+
+
+def _path_score(path):
+    normalized = path.replace("\\", "/")
+    name = os.path.splitext(os.path.basename(normalized))[0].lower()
+    depth = normalized.count("/")
+    score = 0.0
+    if name in _ENTRY_POINT_NAMES:
+        score += 0.3
+    if name in _DOC_NAMES:
+        score += 0.4 if depth == 0 else 0.1
+    # Shallow files tend to be the public surface of a project
+    score += 0.2 / (1 + depth)
+    return score
+
+
+def _size_score(content):
+    # Tiny files carry little information; very large ones crowd out everything else
+    size = len(content)
+    if size < 50:
+        return -0.3
+    return -0.05 * max(0.0, math.log2(size / 20000)) if size > 20000 else 0.0
+
+
+def rank_files(files_data, import_graph=None):
+    """
+    Order files by how useful they are for understanding the codebase.
+
+    The score combines centrality in the import graph (PageRank and in-degree),
+    path heuristics (entry points, package `__init__` files, the top-level README,
+    shallow paths) and a size term. Everything is linear in the number of files
+    and import edges.
+
+    Args:
+        files_data (list): List of (path, content) tuples.
+        import_graph (list, optional): Output of `build_import_graph`, computed if omitted.
+
+    Returns:
+        tuple: (file indices ordered from most to least important, scores aligned with files_data)
+    """
+    if import_graph is None:
+        import_graph = build_import_graph(files_data)
+    count = len(files_data)
+    if count == 0:
+        return [], []
+
+    pagerank = _pagerank(import_graph)
+    in_degree = [0] * count
+    for targets in import_graph:
+        for j in targets:
+            in_degree[j] += 1
+
+    max_rank = max(pagerank) or 1.0
+    max_in_degree = max(in_degree) or 1
+    scores = []
+    for i, (path, content) in enumerate(files_data):
+        score = (
+            0.5 * pagerank[i] / max_rank
+            + 0.3 * math.log1p(in_degree[i]) / math.log1p(max_in_degree)
+            + _path_score(path)
+            + _size_score(content)
+        )
+        scores.append(round(score, 4))
+
+    ranking = sorted(range(count), key=lambda i: (-scores[i], files_data[i][0]))
+    return ranking, scores
@@ -0,0 +1,57 @@
+import os
+
+from utils.token_count import estimate_tokens
+
+
+def _directory_key(path):
+    directory = os.path.dirname(path.replace("\\", "/"))
+    return directory or "."
+
+
+def partition_files(files_data, max_tokens):
+    """
+    Split the crawled files into shards that each fit a token budget.
+
+    Files are grouped by directory so a shard covers whole packages where
+    possible. Directories are packed greedily in path order; a directory that
+    is larger than the budget is split across several shards, and a single file
+    that is larger than the budget gets a shard of its own.
+
+    Args:
+        files_data (list): List of (path, content) tuples as stored in shared["files"].
+        max_tokens (int): Approximate token budget per shard.
+
+    Returns:
+        list: Shards, each a list of global file indices (in path order).
+    """
+    directories = {}
+    for i, (path, content) in enumerate(files_data):
+        directories.setdefault(_directory_key(path), []).append(
+            (path, i, estimate_tokens(content) + estimate_tokens(path) + 10)
+        )
+
+    shards = []
+    current = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            shards.append(current)
+        current, current_tokens = [], 0
+
+    for directory in sorted(directories):
+        entries = sorted(directories[directory])
+        directory_tokens = sum(tokens for _, _, tokens in entries)
+
+        # Start a new shard rather than splitting a directory that would fit on its own
+        if current and current_tokens + directory_tokens > max_tokens and directory_tokens <= max_tokens:
+            flush()
+
+        for _, index, tokens in entries:
+            if current and current_tokens + tokens > max_tokens:
+                flush()
+            current.append(index)
+            current_tokens += tokens
+    flush()
+    return shards
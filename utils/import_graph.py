@@ -0,0 +1,160 @@
+import os
+import re
+
+_IMPORT_PATTERNS = {
+    "python": re.compile(
+        r"^\s*(?:from\s+(\.*[\w.]*)\s+import\s+\(?\s*([\w, *]+)|import\s+([\w., ]+))", re.M
+    ),
+    "js": re.compile(
+        r"(?:\bfrom\s+|\bimport\s+|\brequire\(\s*|\bimport\(\s*)['\"]([^'\"]+)['\"]"
+    ),
+    "go": re.compile(r"^\s*(?:import\s+)?(?:\w+\s+)?\"([\w./-]+)\"", re.M),
+    "java": re.compile(r"^\s*import\s+(?:static\s+)?([\w.]+)(?:\.\*)?\s*;", re.M),
+    "c": re.compile(r"^\s*#\s*include\s*[\"<]([^\">]+)[\">]", re.M),
+}
+
+_LANGUAGE_BY_EXTENSION = {
+    ".py": "python", ".pyi": "python", ".pyx": "python",
+    ".js": "js", ".jsx": "js", ".ts": "js", ".tsx": "js", ".mjs": "js", ".cjs": "js",
+    ".go": "go",
+    ".java": "java",
+    ".c": "c", ".cc": "c", ".cpp": "c", ".cxx": "c", ".h": "c", ".hpp": "c",
+}
+
+# A one-component reference (e.g. "utils") is only trusted when it names few files
+_MAX_SHORT_KEY_MATCHES = 3
+
+
+def _strip_extension(path):
+    return os.path.splitext(path)[0]
+
+
+def module_keys(path):
+    """
+    Names under which other files may refer to `path`.
+
+    Every suffix of the extension-less path counts ("pkg/core/engine",
+    "core/engine", "engine"), as does the containing directory, since Go and
+    Python packages are imported by directory.
+    """
+    normalized = _strip_extension(path.replace("\\", "/"))
+    parts = [part for part in normalized.split("/") if part]
+    if parts and parts[-1] in ("__init__", "index", "mod"):
+        parts = parts[:-1]
+    keys = ["/".join(parts[i:]) for i in range(len(parts))]
+    directory_parts = parts[:-1] if parts else []
+    keys.extend(
+        "/".join(directory_parts[i:]) for i in range(len(directory_parts))
+    )
+    return keys
+
+
+def extract_import_refs(path, content):
+    """Return the module references (slash separated, without extension) imported by a file."""
+    language = _LANGUAGE_BY_EXTENSION.get(os.path.splitext(path)[1].lower())
+    if language is None:
+        return []
+    directory = os.path.dirname(path.replace("\\", "/"))
+    refs = []
+    for match in _IMPORT_PATTERNS[language].finditer(content):
+        if language == "python":
+            module, names, plain = match.groups()
+            if plain:
+                refs.extend(name.split(" as ")[0].strip().replace(".", "/") for name in plain.split(","))
+                continue
+            level = len(module) - len(module.lstrip("."))
+            module_path = module.lstrip(".").replace(".", "/")
+            if level:
+                base = directory
+                for _ in range(level - 1):
+                    base = os.path.dirname(base)
+                module_path = "/".join(p for p in (base, module_path) if p)
+            if module_path:
+                refs.append(module_path)
+            # `from pkg import module` imports submodules as well as symbols
+            for name in names.split(","):
+                name = name.split(" as ")[0].strip()
+                if name and name != "*":
+                    refs.append("/".join(p for p in (module_path, name) if p))
+        else:
+            ref = match.group(1)
+            if language == "java":
+                ref = ref.replace(".", "/")
+            elif ref.startswith("."):
+                ref = os.path.normpath(os.path.join(directory, ref)).replace("\\", "/")
+            refs.append(_strip_extension(ref).lstrip("/"))
+    return refs
+
+
+def build_import_graph(files_data):
+    """
+    Build the file-level import graph of a repository in linear time.
+
+    Args:
+        files_data (list): List of (path, content) tuples.
+
+    Returns:
+        list: For every file index, the sorted list of file indices it imports.
+    """
+    key_index = {}
+    for i, (path, _) in enumerate(files_data):
+        for key in module_keys(path):
+            key_index.setdefault(key, []).append(i)
+
+    edges = []
+    for i, (path, content) in enumerate(files_data):
+        targets = set()
+        for ref in extract_import_refs(path, content):
+            parts = [part for part in ref.split("/") if part and part != ".."]
+            # Try the most specific suffix first; each lookup is O(1)
+            for start in range(len(parts)):
+                matches = key_index.get("/".join(parts[start:]))
+                if not matches:
+                    continue
+                if len(parts) - start == 1 and len(matches) > _MAX_SHORT_KEY_MATCHES:
+                    break
+                targets.update(matches)
+                break
+        targets.discard(i)
+        edges.append(sorted(targets))
+    return edges
+
+
+def abstraction_edges(abstractions, import_graph, max_edges=None):
+    """
+    Derive dependencies between abstractions from the file-level import graph.
+
+    Abstraction A depends on abstraction B when one of A's files imports one of
+    B's files. Files shared by both abstractions do not create an edge.
+
+    Args:
+        abstractions (list): Abstractions with a `files` list of file indices.
+        import_graph (list): Output of `build_import_graph`.
+        max_edges (int, optional): Keep only the strongest edges.
+
+    Returns:
+        list: Dicts {"from", "to", "weight", "example"} sorted by descending weight,
+              where weight counts the importing file pairs and example is one
+              (importing file index, imported file index) pair.
+    """
+    owners = {}
+    for abstraction_index, abstraction in enumerate(abstractions):
+        for file_index in abstraction["files"]:
+            owners.setdefault(file_index, set()).add(abstraction_index)
+
+    edges = {}
+    for source_file, owning in owners.items():
+        if not 0 <= source_file < len(import_graph):
+            continue
+        for target_file in import_graph[source_file]:
+            for source in owning:
+                for target in owners.get(target_file, ()):
+                    if target in owning:
+                        continue
+                    edge = edges.setdefault(
+                        (source, target), {"from": source, "to": target, "weight": 0, "example": (source_file, target_file)}
+                    )
+                    edge["weight"] += 1
+
+    ranked = sorted(edges.values(), key=lambda e: (-e["weight"], e["from"], e["to"]))
+    return ranked[:max_edges] if max_edges else ranked
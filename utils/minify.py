@@ -0,0 +1,313 @@
+import os
+import re
+
+from utils.token_count import estimate_tokens
+
+# Minification modes, each including the previous one:
+# - "whitespace": drop the license header and comment banners, trailing whitespace and blank-line runs
+#   (lines inside multi-line strings are left as they are)
+# - "comments": also drop comments, keeping docstrings and doc comments (/** */, ///)
+# - "all": also drop docstrings and doc comments
+MODES = ("none", "whitespace", "comments", "all")
+
+# Comment syntax per language family: line comment markers, block comment delimiters,
+# string quotes, the comment prefixes that mark documentation, and the comment
+# openers of decoration-only banner lines ("# =======", "/**********/")
+_SYNTAX = {
+    "python": {"line": ("#",), "block": None, "quotes": "", "docs": (), "banner": r"#+"},
+    "c": {
+        "line": ("//",),
+        "block": ("/*", "*/"),
+        "quotes": "\"'`",
+        "docs": ("/**", "///", "//!"),
+        "banner": r"//+|/\*+|\*+",
+    },
+    "hash": {"line": ("#",), "block": None, "quotes": "\"'", "docs": (), "banner": r"#+"},
+    "dash": {"line": ("--",), "block": None, "quotes": "\"'", "docs": (), "banner": r"--"},
+    "markup": {"line": (), "block": ("<!--", "-->"), "quotes": "", "docs": (), "banner": r"<!--"},
+}
+_BANNER_PATTERNS = {
+    name: re.compile(rf"^[ \t]*(?:{syntax['banner']})[ \t]*[-=*#/~_+]{{8,}}[ \t]*(?:\*+/|-->)?[ \t]*$")
+    for name, syntax in _SYNTAX.items()
+}
+
+_SYNTAX_BY_EXTENSION = {
+    ".py": "python", ".pyi": "python", ".pyx": "python",
+    ".c": "c", ".cc": "c", ".cpp": "c", ".cxx": "c", ".h": "c", ".hpp": "c",
+    ".java": "c", ".kt": "c", ".scala": "c", ".cs": "c", ".go": "c", ".rs": "c", ".swift": "c",
+    ".js": "c", ".jsx": "c", ".ts": "c", ".tsx": "c", ".mjs": "c", ".cjs": "c", ".php": "c", ".dart": "c",
+    ".rb": "hash", ".sh": "hash", ".bash": "hash", ".zsh": "hash", ".pl": "hash", ".pm": "hash",
+    ".r": "hash", ".yml": "hash", ".yaml": "hash", ".toml": "hash", ".cmake": "hash",
+    ".sql": "dash", ".lua": "dash", ".hs": "dash",
+    ".html": "markup", ".htm": "markup", ".xml": "markup", ".svg": "markup",
+}
+_SYNTAX_BY_NAME = {"Makefile": "hash", "Dockerfile": "hash", "CMakeLists.txt": "hash"}
+
+_LICENSE_PATTERN = re.compile(
+    r"copyright|licen[cs]e|spdx-license-identifier|all rights reserved|permission is hereby granted",
+    re.I,
+)
+_CODING_PATTERN = re.compile(r"^[ \t\f]*#.*coding[:=]")
+_STRING_PATTERNS = {
+    '"': re.compile(r'"(?:[^"\\\n]|\\.)*"'),
+    "'": re.compile(r"'(?:[^'\\\n]|\\.)*'"),
+    "`": re.compile(r"`(?:[^`\\]|\\.)*`", re.S),  # Template and raw strings span lines
+}
+_PYTHON_TOKEN_PATTERN = re.compile(r"\"\"\"|'''|[\"'#()\[\]{}]")
+_PYTHON_STRING_PATTERNS = {
+    '"""': re.compile(r'"""(?:[^"\\]|\\.|"(?!""))*"""', re.S),
+    "'''": re.compile(r"'''(?:[^'\\]|\\.|'(?!''))*'''", re.S),
+    '"': re.compile(r'"(?:[^"\\\n]|\\.)*"', re.S),
+    "'": re.compile(r"'(?:[^'\\\n]|\\.)*'", re.S),
+}
+# Indentation and string prefix before a string statement, and what may follow it
+_STRING_PREFIX_PATTERN = re.compile(r"[ \t]*[rRbBuUfF]{0,2}")
+_LINE_REST_PATTERN = re.compile(r"[ \t]*(?:#[^\n]*)?(?:\n|$)")
+_TRAILING_COMMENT_PATTERN = re.compile(r"#[^'\"\n]*$")
+_NEXT_CODE_LINE_PATTERN = re.compile(r"^([ \t]*)[^ \t\n#]", re.M)
+# Marks the lines a removed comment touched; comment-only lines are dropped afterwards
+_REMOVED = "\x00"
+# Marks the lines that end inside a multi-line string, which are kept exactly as they are
+_KEEP = "\x01"
+
+
+def syntax_of(path):
+    """Language family of a file (a _SYNTAX key), or None when comments are not understood."""
+    name = os.path.basename(path)
+    return _SYNTAX_BY_NAME.get(name) or _SYNTAX_BY_EXTENSION.get(os.path.splitext(name)[1].lower())
+
+
+def _strip_license_header(content, syntax):
+    """Drop the first comment block of a file when it is a license or copyright notice."""
+    lines = content.split("\n")
+    i = 0
+    while i < len(lines) and (
+        not lines[i].strip() or (i == 0 and lines[i].startswith("#!")) or _CODING_PATTERN.match(lines[i])
+    ):
+        i += 1
+    if i == len(lines):
+        return content
+    first = lines[i].lstrip()
+    block = syntax["block"]
+    end = i
+    if block and first.startswith(block[0]):
+        while end < len(lines) and block[1] not in (first[len(block[0]):] if end == i else lines[end]):
+            end += 1
+        end += 1
+    else:
+        while end < len(lines) and lines[end].lstrip().startswith(syntax["line"] or "\n"):
+            end += 1
+    if end > i and _LICENSE_PATTERN.search("\n".join(lines[i:end])):
+        del lines[i:end]
+    return "\n".join(lines)
+
+
+def _comment_spans(content, syntax, keep_docs):
+    """
+    (start, end) offsets of the comments to remove, found with a string-aware scan,
+    and those of the multi-line strings passed over.
+    """
+    markers = list(syntax["line"]) + (list(syntax["block"][:1]) if syntax["block"] else [])
+    start_pattern = re.compile("|".join(re.escape(token) for token in markers + list(syntax["quotes"])))
+    spans = []
+    strings = []
+    pos = 0
+    while True:
+        match = start_pattern.search(content, pos)
+        if match is None:
+            return spans, strings
+        start, token = match.start(), match.group()
+        if token in syntax["quotes"]:
+            string = _STRING_PATTERNS[token].match(content, start)
+            if string:
+                pos = string.end()
+                if content.find("\n", start, pos) >= 0:
+                    strings.append((start, pos))
+            else:
+                # Unterminated on its line (an apostrophe, a Rust lifetime): skip the line
+                newline = content.find("\n", start)
+                pos = len(content) if newline < 0 else newline
+            continue
+        if syntax["block"] and token == syntax["block"][0]:
+            end = content.find(syntax["block"][1], start + len(token))
+            end = len(content) if end < 0 else end + len(syntax["block"][1])
+        else:
+            if token == "#" and start > 0 and content[start - 1] not in " \t\n":
+                pos = start + 1  # "$#", "a#b": not a comment
+                continue
+            end = content.find("\n", start)
+            end = len(content) if end < 0 else end
+        is_doc = any(content.startswith(prefix, start) for prefix in syntax["docs"]) and not content.startswith(
+            "/**/", start
+        )
+        if not (keep_docs and is_doc):
+            spans.append((start, end))
+        pos = end
+
+
+def _python_spans(content, keep_docs):
+    """
+    Spans of comments and, unless kept, docstrings and other bare string statements,
+    and the spans of the multi-line strings that stay.
+
+    A regex scan rather than the tokenize module, which is several times slower:
+    a string is a statement when it starts its line outside any brackets and
+    nothing but a comment follows it.
+    """
+    spans = []
+    strings = []
+    depth = 0
+    pos = 0
+    while True:
+        match = _PYTHON_TOKEN_PATTERN.search(content, pos)
+        if match is None:
+            return spans, strings
+        start, token = match.start(), match.group()
+        if token in "([{":
+            depth += 1
+            pos = match.end()
+        elif token in ")]}":
+            depth = max(depth - 1, 0)
+            pos = match.end()
+        elif token == "#":
+            end = content.find("\n", start)
+            end = len(content) if end < 0 else end
+            spans.append((start, end))
+            pos = end
+        else:
+            string = _PYTHON_STRING_PATTERNS[token].match(content, start)
+            if string is None:
+                newline = content.find("\n", start)
+                pos = len(content) if newline < 0 else newline
+                continue
+            pos = string.end()
+            line_start = content.rfind("\n", 0, start) + 1
+            if (
+                not keep_docs
+                and not depth
+                and _STRING_PREFIX_PATTERN.fullmatch(content, line_start, start)
+                and content[line_start - 2 : line_start] != "\\\n"
+                and _LINE_REST_PATTERN.match(content, pos)
+            ):
+                spans.append((start, pos, "..." if _is_only_statement(content, line_start, pos) else None))
+            elif content.find("\n", start, pos) >= 0:
+                strings.append((start, pos))
+
+
+def _is_only_statement(content, line_start, end):
+    """Whether the string statement ending at `end` is the whole body of its block."""
+    previous = ""
+    for line in reversed(content[max(line_start - 4000, 0) : line_start].split("\n")):
+        previous = _TRAILING_COMMENT_PATTERN.sub("", line).strip()
+        if previous and not previous.startswith("#"):
+            break
+    if not previous.endswith(":"):
+        return False
+    indent = len(content[line_start:end]) - len(content[line_start:end].lstrip())
+    following = _NEXT_CODE_LINE_PATTERN.search(content, end)
+    return following is None or len(following.group(1)) < indent
+
+
+def _remove_spans(content, spans, strings=()):
+    """
+    Blank out (start, end) spans; a third element, when set, is kept in place of the span.
+    The lines ending inside one of the `strings` spans are marked to be kept as they are.
+    """
+    pieces = []
+    pos = 0
+    kept = [(start, end, _KEEP) for start, end in strings]
+    for start, end, *replacement in sorted(list(spans) + kept, key=lambda span: span[0]):
+        pieces.append(content[pos:start])
+        if replacement and replacement[0] == _KEEP:
+            pieces.append(content[start:end].replace("\n", _KEEP + "\n"))
+        elif replacement and replacement[0]:
+            pieces.append(replacement[0])
+        else:
+            pieces.append(_REMOVED + ("\n" + _REMOVED) * content.count("\n", start, end))
+        pos = end
+    pieces.append(content[pos:])
+    return "".join(pieces)
+
+
+def _normalize_lines(content, syntax_name):
+    """
+    Drop comment-only and banner lines, trailing whitespace and repeated blank lines,
+    except on the lines marked as ending inside a string.
+    """
+    lines = []
+    for line in content.split("\n"):
+        if line.endswith(_KEEP):
+            lines.append(line[:-1].replace(_REMOVED, " "))
+            continue
+        if _REMOVED in line:
+            line = line.replace(_REMOVED, " ")
+            if not line.strip():
+                continue
+        elif syntax_name in _BANNER_PATTERNS and _BANNER_PATTERNS[syntax_name].match(line):
+            continue
+        line = line.rstrip()
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def minify_code(path, content, mode):
+    """
+    Shrink a source file for a prompt without changing what the code does.
+
+    Comments are only removed for languages whose comment and string syntax is
+    known (see _SYNTAX_BY_EXTENSION); other files only get whitespace cleanup.
+
+    Args:
+        path (str): File path, used to pick the language.
+        content (str): File content.
+        mode (str): One of MODES.
+
+    Returns:
+        str: The minified content (the input itself for "none").
+    """
+    if mode == "none" or not content:
+        return content
+    if mode not in MODES:
+        raise ValueError(f"Unknown minify mode: {mode}")
+    syntax_name = syntax_of(path)
+    syntax = _SYNTAX.get(syntax_name)
+    if syntax:
+        content = _strip_license_header(content, syntax)
+        if _REMOVED not in content and _KEEP not in content:
+            keep_docs = mode != "all"
+            if syntax_name == "python":
+                spans, strings = _python_spans(content, keep_docs)
+            else:
+                spans, strings = _comment_spans(content, syntax, keep_docs)
+            # "whitespace" only needs the strings, to leave their lines alone
+            content = _remove_spans(content, [] if mode == "whitespace" else spans, strings)
+    return _normalize_lines(content, syntax_name)
+
+
+def minify_files(files_data, mode):
+    """
+    Minify every file and measure the savings.
+
+    Args:
+        files_data (list): (path, content) tuples.
+        mode (str): One of MODES.
+
+    Returns:
+        tuple: (minified (path, content) tuples, savings) where savings maps each
+               file extension ("(none)" without one) to its file count and its
+               estimated tokens before and after.
+    """
+    minified = []
+    savings = {}
+    for path, content in files_data:
+        small = minify_code(path, content, mode)
+        minified.append((path, small))
+        extension = os.path.splitext(path)[1].lower() or "(none)"
+        stats = savings.setdefault(extension, {"files": 0, "raw_tokens": 0, "minified_tokens": 0})
+        stats["files"] += 1
+        stats["raw_tokens"] += estimate_tokens(content)
+        stats["minified_tokens"] += estimate_tokens(small)
+    return minified, savings
@@ -0,0 +1,237 @@
+import itertools
+import json
+import os
+import threading
+import time
+
+from pocketflow import BatchNode
+from utils.disk_cache import atomic_write_bytes
+from utils.telemetry import current_run, span
+
+TRACE_FILENAME = "profile_trace.json"
+SUMMARY_FILENAME = "profile_summary.txt"
+
+
+def approximate_size(value):
+    """
+    Rough size in bytes of a JSON-like value, without serializing it.
+
+    Strings count one byte per character; keys starting with "_" (runtime
+    objects such as the checkpoint) are skipped.
+    """
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(
+            len(str(key)) + approximate_size(item)
+            for key, item in value.items()
+            if not (isinstance(key, str) and key.startswith("_"))
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sum(approximate_size(item) for item in value)
+    return 8
+
+
+class FlowProfiler:
+    """
+    Records wall time, CPU time, LLM time and shared-store size for each step of a flow.
+
+    `instrument(node)` swaps the node's class for a subclass whose prep, _exec and
+    post (and exec, for every BatchNode item) are timed, so the shallow copies
+    pocketflow makes of nodes keep being profiled. Events can be exported as a
+    Chrome trace (chrome://tracing, Perfetto) and as a text summary.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._classes = {}
+        self._span_ids = itertools.count(1)
+        self.events = []
+        self.shared_bytes = {}  # Node name -> size of shared after its post
+
+    def instrument(self, node):
+        cls = type(node)
+        if getattr(cls, "_profiler", None) is self:
+            return node
+        if cls not in self._classes:
+            self._classes[cls] = self._profiled_class(cls)
+        node.__class__ = self._classes[cls]
+        return node
+
+    def _profiled_class(self, cls):
+        profiler = self
+        name = cls.__name__
+
+        class Profiled(cls):
+            _profiler = profiler
+
+            def prep(self, shared):
+                return profiler.measure(name, "prep", lambda: super(Profiled, self).prep(shared))
+
+            def _exec(self, prep_res):
+                return profiler.measure(name, "exec", lambda: super(Profiled, self)._exec(prep_res))
+
+            def post(self, shared, prep_res, exec_res):
+                result = profiler.measure(
+                    name, "post", lambda: super(Profiled, self).post(shared, prep_res, exec_res)
+                )
+                profiler.shared_bytes[name] = approximate_size(shared)
+                return result
+
+        if issubclass(cls, BatchNode):
+
+            def exec(self, item):
+                label = f"item {item['chapter_num']}" if isinstance(item, dict) and "chapter_num" in item else "item"
+                return profiler.measure(
+                    name, label, lambda: super(Profiled, self).exec(item), per_thread=True
+                )
+
+            Profiled.exec = exec
+
+        Profiled.__name__ = Profiled.__qualname__ = name
+        return Profiled
+
+    def measure(self, name, phase, func, per_thread=False):
+        """
+        Run `func` and record one event for it.
+
+        Per-thread events (BatchNode items) use the thread's CPU time and only the
+        LLM calls made for that item, including calls from the worker threads it
+        starts with map_concurrently (such as chapter sections); node phases use
+        process CPU time and every LLM call made while they ran.
+        """
+        telemetry = current_run()
+        first_call = telemetry.call_count()
+        thread = threading.get_ident()
+        span_id = next(self._span_ids) if per_thread else None
+        cpu_clock = time.thread_time if per_thread else time.process_time
+        start, cpu_start = time.perf_counter(), cpu_clock()
+        error = None
+        try:
+            if per_thread:
+                with span(span_id):
+                    return func()
+            return func()
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            wall = time.perf_counter() - start
+            cpu = cpu_clock() - cpu_start
+            llm_calls = [
+                call
+                for call in telemetry.calls_since(first_call)
+                if not per_thread or call.get("span") == span_id
+            ]
+            event = {
+                "node": name,
+                "phase": phase,
+                "start": start - self._origin,
+                "wall": wall,
+                "cpu": cpu,
+                "llm_seconds": sum(call.get("seconds") or 0.0 for call in llm_calls),
+                "llm_calls": len(llm_calls),
+                "thread": thread,
+            }
+            if error:
+                event["error"] = error
+            with self._lock:
+                self.events.append(event)
+
+    def summary(self):
+        """
+        Aggregate the events per node.
+
+        Returns:
+            dict: {"total_seconds", "nodes": {name: {wall, cpu, llm_seconds, llm_calls,
+                  items, shared_bytes, phases: {prep, exec, post}}}} in execution order.
+                  Item events are counted but their time is already part of exec.
+        """
+        with self._lock:
+            events = list(self.events)
+        nodes = {}
+        for event in events:
+            stats = nodes.setdefault(
+                event["node"],
+                {"wall": 0.0, "cpu": 0.0, "llm_seconds": 0.0, "llm_calls": 0, "items": 0, "phases": {}},
+            )
+            if not event["phase"].startswith("item"):
+                stats["wall"] += event["wall"]
+                stats["cpu"] += event["cpu"]
+                stats["llm_seconds"] += event["llm_seconds"]
+                stats["llm_calls"] += event["llm_calls"]
+                stats["phases"][event["phase"]] = round(
+                    stats["phases"].get(event["phase"], 0.0) + event["wall"], 3
+                )
+            else:
+                stats["items"] += 1
+        for name, stats in nodes.items():
+            stats["shared_bytes"] = self.shared_bytes.get(name)
+            for key in ("wall", "cpu", "llm_seconds"):
+                stats[key] = round(stats[key], 3)
+        total = round(sum(stats["wall"] for stats in nodes.values()), 3)
+        return {"total_seconds": total, "nodes": nodes}
+
+    def format_summary(self):
+        summary = self.summary()
+        total = summary["total_seconds"] or 1.0
+        lines = ["Profile (wall time, share of the run, CPU time, LLM time, size of shared afterwards):"]
+        for name, stats in summary["nodes"].items():
+            size = stats["shared_bytes"]
+            size_text = f"{size / 1024:.1f} KB" if size is not None else "-"
+            items = f", {stats['items']} items" if stats["items"] else ""
+            lines.append(
+                f"  - {name}: {stats['wall']:.2f}s ({stats['wall'] * 100 / total:.1f}%), "
+                f"cpu {stats['cpu']:.2f}s, llm {stats['llm_seconds']:.2f}s "
+                f"({stats['llm_calls']} calls{items}), shared {size_text}"
+            )
+        lines.append(f"  - Total: {summary['total_seconds']:.2f}s")
+
+        with self._lock:
+            items = [e for e in self.events if e["phase"].startswith("item")]
+        if items:
+            lines.append("Slowest items:")
+            for event in sorted(items, key=lambda e: -e["wall"])[:5]:
+                lines.append(
+                    f"  - {event['node']} {event['phase']}: {event['wall']:.2f}s "
+                    f"(llm {event['llm_seconds']:.2f}s)"
+                )
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """Events in the Chrome trace event format (complete events, microseconds)."""
+        with self._lock:
+            events = list(self.events)
+        thread_ids = {}
+        trace_events = []
+        for event in events:
+            tid = thread_ids.setdefault(event["thread"], len(thread_ids) + 1)
+            args = {
+                key: round(event[key], 4) if isinstance(event[key], float) else event[key]
+                for key in ("cpu", "llm_seconds", "llm_calls", "error")
+                if key in event
+            }
+            if event["phase"] == "post" and self.shared_bytes.get(event["node"]) is not None:
+                args["shared_bytes"] = self.shared_bytes[event["node"]]
+            trace_events.append(
+                {
+                    "name": f"{event['node']}.{event['phase']}",
+                    "cat": event["node"],
+                    "ph": "X",
+                    "ts": round(event["start"] * 1e6),
+                    "dur": round(event["wall"] * 1e6),
+                    "pid": 1,
+                    "tid": tid,
+                    "args": args,
+                }
+            )
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def write(self, output_dir):
+        """Write the Chrome trace and the text summary to `output_dir` and return their paths."""
+        trace_path = os.path.join(output_dir, TRACE_FILENAME)
+        summary_path = os.path.join(output_dir, SUMMARY_FILENAME)
+        atomic_write_bytes(trace_path, json.dumps(self.chrome_trace()).encode("utf-8"))
+        atomic_write_bytes(summary_path, (self.format_summary() + "\n").encode("utf-8"))
+        return trace_path, summary_path
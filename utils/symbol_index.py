@@ -0,0 +1,186 @@
+import os
+import re
+
+_IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# Declaration patterns per language; group 1 is the defined name
+_DEFINITION_PATTERNS = {
+    "python": [
+        re.compile(r"^[ \t]*(?:async[ \t]+)?(?:def|class)[ \t]+([A-Za-z_]\w*)", re.M),
+        re.compile(r"^([A-Z][A-Z0-9_]+)[ \t]*(?::[^=\n]*)?=", re.M),  # Module constants
+    ],
+    "js": [
+        re.compile(
+            r"^[ \t]*(?:export[ \t]+)?(?:default[ \t]+)?(?:declare[ \t]+)?(?:abstract[ \t]+)?(?:async[ \t]+)?"
+            r"(?:class|function\*?|interface|type|enum)[ \t]+([A-Za-z_$][\w$]*)",
+            re.M,
+        ),
+        re.compile(
+            r"^[ \t]*(?:export[ \t]+)?(?:const|let|var)[ \t]+([A-Za-z_$][\w$]*)[ \t]*=[ \t]*"
+            r"(?:async[ \t]*)?(?:\([^)\n]*\)|[A-Za-z_$][\w$]*)[ \t]*=>",
+            re.M,
+        ),
+    ],
+    "go": [
+        re.compile(r"^func[ \t]+(?:\([^)]*\)[ \t]*)?([A-Za-z_]\w*)", re.M),
+        re.compile(r"^(?:type[ \t]+|[ \t]+)([A-Za-z_]\w*)[ \t]+(?:struct|interface)\b", re.M),
+    ],
+    "java": [
+        re.compile(
+            r"^[ \t]*(?:(?:public|private|protected|internal|static|final|abstract|sealed|data|open)[ \t]+)*"
+            r"(?:class|interface|enum|record|object|@interface)[ \t]+([A-Za-z_]\w*)",
+            re.M,
+        ),
+    ],
+    "c": [
+        re.compile(r"^[ \t]*(?:typedef[ \t]+)?(?:struct|class|enum|union)[ \t]+([A-Za-z_]\w*)[ \t]*(?:[:{]|$)", re.M),
+        # Function definitions start at column 0 and are not prototypes
+        re.compile(r"^[A-Za-z_][\w \t\*&:<>,]*?\b([A-Za-z_]\w*)[ \t]*\([^;{}]*\)[ \t]*(?:const[ \t]*)?\{?[ \t]*$", re.M),
+    ],
+    "rust": [
+        re.compile(
+            r"^[ \t]*(?:pub(?:\([^)]*\))?[ \t]+)?(?:async[ \t]+)?(?:unsafe[ \t]+)?"
+            r"(?:fn|struct|enum|trait|type|union)[ \t]+([A-Za-z_]\w*)",
+            re.M,
+        ),
+    ],
+    "ruby": [
+        re.compile(r"^[ \t]*(?:class|module|def)[ \t]+(?:self\.)?([A-Za-z_]\w*)", re.M),
+    ],
+}
+
+_LANGUAGE_BY_EXTENSION = {
+    ".py": "python", ".pyi": "python", ".pyx": "python",
+    ".js": "js", ".jsx": "js", ".ts": "js", ".tsx": "js", ".mjs": "js", ".cjs": "js",
+    ".go": "go",
+    ".java": "java", ".kt": "java", ".scala": "java", ".cs": "java",
+    ".c": "c", ".cc": "c", ".cpp": "c", ".cxx": "c", ".h": "c", ".hpp": "c",
+    ".rs": "rust",
+    ".rb": "ruby",
+}
+
+# Words the C function pattern can mistake for a function name
+_KEYWORDS = {"if", "for", "while", "switch", "return", "sizeof", "catch", "else", "do", "case"}
+
+# Shorter names are too generic to point at one file
+MIN_SYMBOL_LENGTH = 3
+# A name defined in more files ("main", "run", "__init__") does not identify a file
+MAX_DEFINING_FILES = 3
+# A mentioned symbol outweighs this many symbols the abstraction's files merely use
+MENTION_WEIGHT = 2
+
+
+def extract_definitions(path, content):
+    """Return the names a file declares (classes, functions, types, module constants), in order."""
+    language = _LANGUAGE_BY_EXTENSION.get(os.path.splitext(path)[1].lower())
+    if language is None:
+        return []
+    names = {}
+    for pattern in _DEFINITION_PATTERNS[language]:
+        for match in pattern.finditer(content):
+            name = match.group(1)
+            if len(name) >= MIN_SYMBOL_LENGTH and name not in _KEYWORDS:
+                names.setdefault(name, None)
+    return list(names)
+
+
+def _looks_like_code(word):
+    return "_" in word or word[:1].isupper() or any(c.isupper() or c.isdigit() for c in word[1:])
+
+
+def _mentioned_names(text):
+    """
+    Code-like identifiers in free text (plain lowercase words are prose), plus
+    the CamelCase and snake_case forms of its word runs ("query engine").
+    """
+    names = {word for word in _IDENTIFIER_PATTERN.findall(text) if _looks_like_code(word)}
+    words = re.findall(r"[A-Za-z][A-Za-z0-9]*", text)
+    for size in (2, 3):
+        for start in range(len(words) - size + 1):
+            run = words[start : start + size]
+            names.add("".join(word[:1].upper() + word[1:] for word in run))
+            names.add("_".join(word.lower() for word in run))
+    return names
+
+
+class SymbolIndex:
+    """
+    Symbol table of a repository: which files define a name and which defined
+    names each file uses.
+
+    `definitions` maps a name to the indices of the files declaring it, and
+    `references` holds, per file, the names defined in other files that appear
+    in it. Both are precomputed dicts and sets, so every lookup is O(1). Names
+    declared in more than MAX_DEFINING_FILES files are dropped as ambiguous.
+    """
+
+    def __init__(self, definitions, references):
+        self.definitions = definitions
+        self.references = references
+
+    @classmethod
+    def build(cls, files_data):
+        """
+        Extract declarations with per-language patterns, then collect references.
+
+        Args:
+            files_data (list): (path, content) tuples.
+
+        Returns:
+            SymbolIndex: The index.
+        """
+        definitions = {}
+        for i, (path, content) in enumerate(files_data):
+            for name in extract_definitions(path, content):
+                definitions.setdefault(name, []).append(i)
+        definitions = {
+            name: files for name, files in definitions.items() if len(files) <= MAX_DEFINING_FILES
+        }
+
+        defined_names = definitions.keys()
+        references = []
+        for i, (_, content) in enumerate(files_data):
+            used = defined_names & set(_IDENTIFIER_PATTERN.findall(content))
+            references.append({name for name in used if i not in definitions[name]})
+        return cls(definitions, references)
+
+    def defining_files(self, name):
+        """Indices of the files that declare `name` (empty when unknown or ambiguous)."""
+        return self.definitions.get(name, [])
+
+    def suggest_files(self, text, file_indices, max_files):
+        """
+        Files an abstraction is missing: those defining a symbol named in its
+        name or description, then those defining several symbols its files use.
+
+        Args:
+            text (str): The abstraction's name and description.
+            file_indices (list): The files already listed for the abstraction.
+            max_files (int): Maximum number of files returned.
+
+        Returns:
+            list: (file index, sorted symbol names) pairs, best first.
+        """
+        listed = set(file_indices)
+        scores, symbols = {}, {}
+
+        def add(name, weight):
+            for file_index in self.definitions.get(name, ()):
+                if file_index in listed:
+                    continue
+                scores[file_index] = scores.get(file_index, 0) + weight
+                symbols.setdefault(file_index, set()).add(name)
+
+        for name in _mentioned_names(text):
+            add(name, MENTION_WEIGHT)
+        used = set()
+        for file_index in listed:
+            if 0 <= file_index < len(self.references):
+                used.update(self.references[file_index])
+        for name in used:
+            add(name, 1)
+
+        # A single used symbol is not enough: every file uses some shared helper
+        candidates = [f for f, score in scores.items() if score >= MENTION_WEIGHT]
+        candidates.sort(key=lambda f: (-scores[f], f))
+        return [(f, sorted(symbols[f])) for f in candidates[:max_files]]
@@ -0,0 +1,129 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class RunTelemetry:
+    """
+    Collects statistics about the LLM calls made during one tutorial run.
+
+    Every call to `call_llm` appends a record with the calling node, the
+    generation limits that were applied and the token counts reported by the
+    model server. Records are kept in memory so the caller can print or return
+    a summary when the flow finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.llm_calls = []
+
+    def record_llm_call(self, record):
+        with self._lock:
+            self.llm_calls.append(record)
+
+    def call_count(self):
+        with self._lock:
+            return len(self.llm_calls)
+
+    def tokens_used(self):
+        """Prompt and completion tokens of all recorded calls."""
+        with self._lock:
+            return sum(
+                (call.get("prompt_tokens") or 0) + (call.get("completion_tokens") or 0)
+                for call in self.llm_calls
+            )
+
+    def calls_since(self, start):
+        """Records appended after the first `start` calls."""
+        with self._lock:
+            return self.llm_calls[start:]
+
+    def summary(self):
+        """
+        Aggregate the recorded calls per node.
+
+        Returns:
+            dict: {"total": {...}, "nodes": {node_name: {...}}} where each entry
+                  holds calls, prompt_tokens, completion_tokens, seconds and
+                  truncated (calls that stopped because they hit `num_predict`).
+        """
+        with self._lock:
+            calls = list(self.llm_calls)
+
+        def empty():
+            return {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "seconds": 0.0,
+                "truncated": 0,
+            }
+
+        total = empty()
+        nodes = {}
+        for call in calls:
+            node_stats = nodes.setdefault(call.get("node") or "unknown", empty())
+            for stats in (total, node_stats):
+                stats["calls"] += 1
+                stats["prompt_tokens"] += call.get("prompt_tokens") or 0
+                stats["completion_tokens"] += call.get("completion_tokens") or 0
+                stats["seconds"] += call.get("seconds") or 0.0
+                stats["truncated"] += 1 if call.get("truncated") else 0
+
+        for stats in [total] + list(nodes.values()):
+            stats["seconds"] = round(stats["seconds"], 2)
+        return {"total": total, "nodes": nodes}
+
+    def format_summary(self):
+        """Human readable version of `summary()` for the CLI."""
+        summary = self.summary()
+        lines = ["LLM usage:"]
+        for name, stats in list(summary["nodes"].items()) + [("Total", summary["total"])]:
+            line = (
+                f"  - {name}: {stats['calls']} calls, "
+                f"{stats['prompt_tokens']} prompt / {stats['completion_tokens']} completion tokens, "
+                f"{stats['seconds']}s"
+            )
+            if stats["truncated"]:
+                line += f", {stats['truncated']} truncated by num_predict"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+# Telemetry of the run executing in the current context. The API server runs
+# every job in its own worker context, so concurrent jobs do not mix records.
+_current_run = ContextVar("tutorial_run_telemetry", default=None)
+_default_run = RunTelemetry()
+
+
+def start_run():
+    """Start collecting telemetry for a new run in the current context."""
+    telemetry = RunTelemetry()
+    _current_run.set(telemetry)
+    return telemetry
+
+
+def current_run():
+    """Return the telemetry of the active run (a process-wide default otherwise)."""
+    return _current_run.get() or _default_run
+
+
+# Profiler span (one BatchNode item) active in the current context. map_concurrently
+# copies the context into its worker threads, so calls made there keep the span of
+# the item that started them.
+_current_span = ContextVar("profiler_span", default=None)
+
+
+@contextmanager
+def span(span_id):
+    """Tag the LLM calls recorded inside the block, and in tasks it starts, with `span_id`."""
+    token = _current_span.set(span_id)
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+
+
+def current_span():
+    """Return the profiler span of the current context, or None."""
+    return _current_span.get()
@@ -0,0 +1,147 @@
+import math
+import threading
+
+# Share of the budget for the planning prompts (abstractions, relationships, order)
+PLANNING_SHARE = 0.3
+# Planning prompts that include file content: IdentifyAbstractions and AnalyzeRelationships,
+# plus some room for OrderChapters and the planning answers
+PLANNING_PROMPTS = 3
+# Chapter prompt tokens besides the source code: instructions, chapter list, previous context
+CHAPTER_OVERHEAD_TOKENS = 2500
+# Smallest useful chapter: below this the budget buys fewer chapters instead
+MIN_CHAPTER_CONTEXT_TOKENS = 2000
+MIN_CHAPTER_TOKENS = 1500
+# Share of a chapter's allowance spent on the chapter itself rather than its source context
+CHAPTER_OUTPUT_SHARE = 0.35
+# A translation reads the page and writes it again
+TRANSLATION_COST = 2
+
+
+class TokenBudgetExceeded(RuntimeError):
+    """Raised before a planning LLM call once the budget is spent; a plan has no partial form."""
+
+
+class TokenBudget:
+    """
+    Token budget of one job, checked against the tokens reported in the run telemetry.
+
+    `spent_before` carries the spend of an interrupted run over to its resume.
+    Nodes check `exhausted()` before each LLM call they can skip, and `check()`
+    before the planning calls they cannot. Concurrent calls `reserve()` their
+    estimated cost before they start, so they cannot all start on the last of
+    the budget; the calls already in flight finish, so the final spend may still
+    exceed the limit by a few calls.
+    """
+
+    def __init__(self, limit, telemetry, spent_before=0):
+        self.limit = limit
+        self.telemetry = telemetry
+        self.spent_before = spent_before
+        # Estimated cost of the calls started with reserve() and not yet finished
+        self.reserved = 0
+        self._lock = threading.Lock()
+
+    def spent(self):
+        return self.spent_before + self.telemetry.tokens_used()
+
+    def remaining(self):
+        return max(self.limit - self.spent(), 0)
+
+    def exhausted(self):
+        return self.spent() >= self.limit
+
+    def check(self, step):
+        """Raise TokenBudgetExceeded when the budget is spent before `step`."""
+        spent = self.spent()
+        if spent >= self.limit:
+            raise TokenBudgetExceeded(
+                f"Token budget of {self.limit} tokens spent ({spent} used) before {step}"
+            )
+
+    def reserve(self, tokens):
+        """
+        Set aside the estimated cost of a call about to start.
+
+        Returns False when the call does not fit next to the calls in flight. While
+        none is in flight, a call only needs the budget not to be spent, as when
+        the calls run one by one. Pair each successful reserve() with release().
+        """
+        with self._lock:
+            spent = self.spent()
+            if spent >= self.limit or (self.reserved and spent + self.reserved + tokens > self.limit):
+                return False
+            self.reserved += tokens
+            return True
+
+    def release(self, tokens):
+        """Return a reservation once its call finished and its tokens are in the telemetry."""
+        with self._lock:
+            self.reserved -= tokens
+
+    def usage(self):
+        """Spend report stored in shared["token_usage"] and returned with the job result."""
+        spent = self.spent()
+        return {
+            "budget": self.limit,
+            "spent": spent,
+            "remaining": max(self.limit - spent, 0),
+            "exhausted": spent >= self.limit,
+        }
+
+
+def plan_token_budget(budget, codebase_tokens, options):
+    """
+    Scale the run's settings down so the expected spend fits a token budget.
+
+    Settings are only ever lowered. The planning prompts get PLANNING_SHARE of
+    the budget for file content; the rest is split over the chapters, first by
+    writing fewer chapters when even the smallest useful chapter would not fit,
+    then by shrinking each chapter's source context and length.
+
+    Args:
+        budget (int): Tokens (prompt and completion) the job may spend.
+        codebase_tokens (int): Estimated tokens of all crawled files.
+        options (dict): Current values of max_abstraction_num, max_context_tokens,
+                        chapter_context_tokens, chapter_max_tokens, summarize_files,
+                        shard_tokens and languages.
+
+    Returns:
+        dict: The settings to change, by shared key.
+    """
+    changes = {}
+    planning_tokens = int(budget * PLANNING_SHARE)
+    context_tokens = planning_tokens // PLANNING_PROMPTS
+    if codebase_tokens > context_tokens and (
+        options.get("max_context_tokens") is None or options["max_context_tokens"] > context_tokens
+    ):
+        changes["max_context_tokens"] = context_tokens
+    # Both pre-passes read every file, which the budget cannot afford
+    if options.get("summarize_files") and codebase_tokens > planning_tokens // 2:
+        changes["summarize_files"] = False
+    if options.get("shard_tokens") and codebase_tokens > planning_tokens:
+        changes["shard_tokens"] = None
+
+    # Every extra language translates each chapter once more
+    translation_factor = 1 + TRANSLATION_COST * max(len(options.get("languages") or []) - 1, 0)
+    chapter_tokens = budget - planning_tokens
+    smallest_chapter = (
+        CHAPTER_OVERHEAD_TOKENS + MIN_CHAPTER_CONTEXT_TOKENS + MIN_CHAPTER_TOKENS * translation_factor
+    )
+    max_abstractions = options.get("max_abstraction_num") or 10
+    affordable = max(chapter_tokens // smallest_chapter, 1)
+    if affordable < max_abstractions:
+        changes["max_abstraction_num"] = affordable
+        max_abstractions = affordable
+
+    allowance = chapter_tokens / max_abstractions - CHAPTER_OVERHEAD_TOKENS
+    chapter_max_tokens = max(
+        math.floor(allowance * CHAPTER_OUTPUT_SHARE / translation_factor), MIN_CHAPTER_TOKENS
+    )
+    if chapter_max_tokens < (options.get("chapter_max_tokens") or math.inf):
+        changes["chapter_max_tokens"] = chapter_max_tokens
+    chapter_context_tokens = max(
+        math.floor(allowance - chapter_max_tokens * translation_factor), MIN_CHAPTER_CONTEXT_TOKENS
+    )
+    if chapter_context_tokens < (options.get("chapter_context_tokens") or math.inf):
+        changes["chapter_context_tokens"] = chapter_context_tokens
+    return changes
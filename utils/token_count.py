@@ -0,0 +1,45 @@
+import re
+
+# CJK characters are usually a token each; other text averages about four characters per token
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate for prompt budgeting, without loading a tokenizer.
+
+    Args:
+        text (str): Text to measure.
+
+    Returns:
+        int: Approximate number of tokens.
+    """
+    if not text:
+        return 0
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Longest prefix of `text` whose estimate_tokens() fits in `max_tokens`.
+
+    The estimate only grows as text is added, so the cut point is found by binary search.
+
+    Args:
+        text (str): Text to shorten.
+        max_tokens (int): Token budget.
+
+    Returns:
+        str: `text` itself when it fits, otherwise its longest fitting prefix.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
@@ -0,0 +1,78 @@
+import difflib
+import gzip
+import json
+import os
+
+from utils.disk_cache import atomic_write_bytes, content_hash
+
+MANIFEST_VERSION = 1
+MANIFEST_FILENAME = ".manifest.json"
+# Source snapshots live in the disk cache, never next to the published tutorial
+SOURCE_SNAPSHOT_NAMESPACE = "source_snapshots"
+
+
+def load_manifest(output_path):
+    """Return the manifest written next to a generated tutorial, or None if there is none."""
+    try:
+        with open(os.path.join(output_path, MANIFEST_FILENAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def write_manifest(output_path, manifest):
+    """Atomically write the manifest of a generated tutorial."""
+    data = json.dumps({"version": MANIFEST_VERSION, **manifest}, ensure_ascii=False, indent=1)
+    atomic_write_bytes(os.path.join(output_path, MANIFEST_FILENAME), data.encode("utf-8"))
+
+
+def changed_paths(previous_hashes, current_hashes):
+    """Paths that were added, removed or modified between two {path: content hash} maps."""
+    return {
+        path
+        for path in previous_hashes.keys() | current_hashes.keys()
+        if previous_hashes.get(path) != current_hashes.get(path)
+    }
+
+
+def source_snapshot_path(output_path, cache_dir=None):
+    """
+    File holding the source snapshot of the tutorial in `output_path`: under the
+    cache directory (CACHE_DIR, ".cache"), keyed by the tutorial's absolute path.
+    """
+    return os.path.join(
+        cache_dir or os.getenv("CACHE_DIR", ".cache"),
+        SOURCE_SNAPSHOT_NAMESPACE,
+        content_hash(os.path.abspath(output_path)) + ".json.gz",
+    )
+
+
+def write_source_snapshot(output_path, sources):
+    """Atomically store the {path: content} of the files the tutorial in `output_path` was written from."""
+    data = json.dumps(sources, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    atomic_write_bytes(source_snapshot_path(output_path), gzip.compress(data, compresslevel=6))
+
+
+def load_source_snapshot(output_path):
+    """Return the {path: content} snapshot of the previous run, or an empty dict."""
+    try:
+        with open(source_snapshot_path(output_path), "rb") as f:
+            return json.loads(gzip.decompress(f.read()).decode("utf-8"))
+    except (OSError, EOFError, ValueError):
+        return {}
+
+
+def unified_diff(path, old_content, new_content, context_lines=3):
+    """Unified diff of one file between two versions ("" when unchanged)."""
+    return "".join(
+        difflib.unified_diff(
+            old_content.splitlines(keepends=True),
+            new_content.splitlines(keepends=True),
+            fromfile=f"a/{path}",
+            tofile=f"b/{path}",
+            n=context_lines,
+        )
+    )
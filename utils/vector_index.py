@@ -0,0 +1,140 @@
+import base64
+
+import numpy as np
+
+from utils.chunking import split_into_chunks
+from utils.disk_cache import DiskCache, content_hash
+from utils.embeddings import embed_texts, get_embedding_model_name
+
+# Bump when chunking or the embedded text changes so stale cache entries are not reused
+INDEX_VERSION = "1"
+
+# Added to the similarity of chunks from files an abstraction already lists
+OWN_FILE_BOOST = 0.05
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _encode(matrix):
+    return base64.b64encode(np.ascontiguousarray(matrix, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode(data, dim):
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32).reshape(-1, dim)
+
+
+def _line_text(lines, first, last):
+    return "".join(lines[first - 1 : last])
+
+
+class VectorIndex:
+    """
+    Embedding index over code chunks, searched with batched cosine similarity.
+
+    `chunks` holds (file index, first line, last line) per chunk and `texts`
+    their text; `matrix` holds one L2-normalised float32 row per chunk, so a
+    single matrix product scores every query against every chunk. Chunk
+    embeddings are cached per file content hash, so only changed files are
+    embedded again.
+    """
+
+    def __init__(self, chunks, texts, matrix, embed=embed_texts):
+        self.chunks = chunks
+        self.texts = texts
+        self.matrix = matrix
+        self.chunk_files = np.array([file_index for file_index, _, _ in chunks], dtype=np.int64)
+        self.embed = embed
+
+    @classmethod
+    def build(cls, files_data, file_hashes=None, embed=embed_texts, chunk_tokens=400, use_cache=True):
+        """
+        Chunk every file and embed the chunks that are not cached yet.
+
+        Args:
+            files_data (list): (path, content) tuples.
+            file_hashes (list, optional): Content hashes aligned with files_data.
+            embed (callable): Function turning a list of texts into a list of vectors.
+            chunk_tokens (int): Approximate chunk size.
+            use_cache (bool): Whether to read cached chunk embeddings.
+
+        Returns:
+            tuple: (VectorIndex, number of files whose embeddings came from the cache)
+        """
+        cache = DiskCache("chunk_embeddings")
+        model = get_embedding_model_name()
+        per_file = [None] * len(files_data)  # (line ranges, vectors) per file
+        pending = []  # (file index, cache key, line ranges, texts)
+        hits = 0
+        for i, (path, content) in enumerate(files_data):
+            file_hash = file_hashes[i] if file_hashes else content_hash(content)
+            cache_key = f"{INDEX_VERSION}:{model}:{chunk_tokens}:{file_hash}"
+            cached = cache.get(cache_key) if use_cache else None
+            if cached is not None:
+                per_file[i] = (cached["lines"], _decode(cached["vectors"], cached["dim"]))
+                hits += 1
+                continue
+            chunks = split_into_chunks(content, chunk_tokens)
+            ranges = [[first, last] for first, last, _ in chunks]
+            # The path tells the model what the code belongs to
+            texts = [f"{path}\n{text}" for _, _, text in chunks]
+            pending.append((i, cache_key, ranges, texts))
+
+        all_texts = [text for *_, texts in pending for text in texts]
+        if all_texts:
+            vectors = _normalize(np.asarray(embed(all_texts, node="RetrievalIndex"), dtype=np.float32))
+            offset = 0
+            for i, cache_key, ranges, texts in pending:
+                file_vectors = vectors[offset : offset + len(texts)]
+                offset += len(texts)
+                per_file[i] = (ranges, file_vectors)
+                cache.set(
+                    cache_key,
+                    {"lines": ranges, "dim": vectors.shape[1], "vectors": _encode(file_vectors)},
+                )
+        else:
+            for i, _, ranges, _ in pending:
+                per_file[i] = (ranges, None)
+
+        chunks, texts, blocks = [], [], []
+        for i, (ranges, file_vectors) in enumerate(per_file):
+            if not ranges:
+                continue
+            lines = files_data[i][1].splitlines(keepends=True)
+            for first, last in ranges:
+                chunks.append((i, first, last))
+                texts.append(_line_text(lines, first, last))
+            blocks.append(file_vectors)
+        matrix = np.vstack(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+        return cls(chunks, texts, matrix, embed=embed), hits
+
+    def search(self, queries, top_k, boost_files=None):
+        """
+        Rank chunks for several queries at once.
+
+        Args:
+            queries (list of str): Query texts, embedded in one batch.
+            top_k (int): Number of best chunks returned per query.
+            boost_files (list, optional): Per query, file indices whose chunks get a small
+                                          bonus (the files an abstraction already lists).
+
+        Returns:
+            list: Per query, [(chunk index, score)] best first.
+        """
+        if not queries or not self.chunks:
+            return [[] for _ in queries]
+        query_vectors = _normalize(np.asarray(self.embed(list(queries), node="RetrievalIndex"), dtype=np.float32))
+        scores = query_vectors @ self.matrix.T  # (queries, chunks) cosine similarities
+        if boost_files:
+            for row, files in zip(scores, boost_files):
+                if files:
+                    row[np.isin(self.chunk_files, list(files))] += OWN_FILE_BOOST
+        k = min(top_k, scores.shape[1])
+        results = []
+        for row in scores:
+            best = np.argpartition(-row, k - 1)[:k]
+            best = best[np.argsort(-row[best], kind="stable")]
+            results.append([(int(i), float(row[i])) for i in best])
+        return results